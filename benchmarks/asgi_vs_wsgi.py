@@ -0,0 +1,88 @@
+"""
+Compare redirect throughput of the WSGI stack (DRF redirect_to_original)
+with the ASGI stack (async_redirect_to_original) at equal concurrency.
+
+Each stack runs in its own process against a freshly seeded SQLite file
+and an in-process cache, driving Django's handlers directly so only the
+framework and view code is measured:
+
+    python benchmarks/asgi_vs_wsgi.py --workers 8 --requests 5000
+
+RedirectFastPathMiddleware answers redirects before either view runs, so it
+is off unless --fast-path is given; then both stacks measure the middleware.
+
+Expect ASGI to trail WSGI here. Django's built-in middleware runs its
+process_request/process_response hooks through sync_to_async on the one
+shared sync thread, a few thread hops per request, and the in-process cache
+and SQLite never leave the event loop idle waiting on the network, which is
+where the async view would gain.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import harness  # noqa: E402
+
+def redirect_requests(codes, count, seed_value=1):
+    """Skewed towards a few hot codes, like real redirect traffic"""
+    rng = random.Random(seed_value)
+    return [
+        (f'/{codes[int(rng.paretovariate(1.2)) % len(codes)]}/', 'GET', None, b'', '')
+        for _ in range(count)
+    ]
+
+def measure(mode, args):
+    os.environ['SHORTENIT_ASYNC_REDIRECT'] = '1' if mode == 'asgi' else '0'
+    harness.setup()
+    codes, _ = harness.seed(args.accounts, args.urls, 0)
+    requests = redirect_requests(codes, args.requests)
+
+    if mode == 'asgi':
+        from django.core.handlers.asgi import ASGIHandler
+        run, application = harness.run_asgi, harness.handler(ASGIHandler, args.fast_path)
+    else:
+        from django.core.handlers.wsgi import WSGIHandler
+        run, application = harness.run_wsgi, harness.handler(WSGIHandler, args.fast_path)
+
+    run(application, requests[:args.warmup], args.workers)
+    return harness.summarize(*run(application, requests, args.workers))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent requests for both stacks')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--warmup', type=int, default=500)
+    parser.add_argument('--accounts', type=int, default=10)
+    parser.add_argument('--urls', type=int, default=1000)
+    parser.add_argument('--fast-path', action='store_true', help='Serve redirects from RedirectFastPathMiddleware')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args)))
+        return
+
+    results = {'workers': args.workers, 'fast_path': args.fast_path}
+    for mode in ['wsgi', 'asgi']:
+        output = subprocess.run(
+            [sys.executable, __file__, '--mode', mode] + sys.argv[1:],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+    results['asgi_speedup'] = round(
+        results['asgi']['requests_per_second'] / results['wsgi']['requests_per_second'], 2
+    )
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare the development and production database profiles (see
+shortenit/database.py) under concurrent redirect and create load.
+
+Each profile runs in its own process against a freshly seeded SQLite file
+and an in-process cache. Redirects and link creations are interleaved and
+sent from a thread pool through Django's WSGI handler, so connection
+setup, locking and journaling costs show up in latency, throughput and
+error statuses:
+
+    python benchmarks/db_profiles.py --workers 8 --requests 4000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import harness  # noqa: E402
+from benchmarks.suite import create_requests, redirect_requests  # noqa: E402
+
+PROFILES = ['development', 'production']
+
+def mixed_requests(context, count, create_share, seed_value=1):
+    rng = random.Random(seed_value)
+    creates = int(count * create_share)
+    requests = redirect_requests(context, rng, count - creates) + create_requests(context, rng, creates)
+    rng.shuffle(requests)
+    return requests
+
+def measure(profile, args):
+    os.environ['SHORTENIT_DB_PROFILE'] = profile
+    harness.setup()
+    codes, tokens = harness.seed(args.accounts, args.urls, 0)
+    from django.core.handlers.wsgi import WSGIHandler
+    application = harness.handler(WSGIHandler)
+    context = {'codes': codes, 'tokens': tokens}
+    harness.run_wsgi(application, mixed_requests(context, args.warmup, args.create_share, 0), args.workers)
+    return harness.summarize(
+        *harness.run_wsgi(application, mixed_requests(context, args.requests, args.create_share), args.workers)
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent requests for both profiles')
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--warmup', type=int, default=400)
+    parser.add_argument('--create-share', type=float, default=0.2, help='Fraction of requests that create a link')
+    parser.add_argument('--accounts', type=int, default=10)
+    parser.add_argument('--urls', type=int, default=1000)
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(measure(args.profile, args)))
+        return
+
+    results = {'workers': args.workers, 'create_share': args.create_share}
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', profile] + sys.argv[1:],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[profile] = json.loads(output.strip().splitlines()[-1])
+    results['production_speedup'] = round(
+        results['production']['requests_per_second'] / results['development']['requests_per_second'], 2
+    )
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Shared helpers for the benchmark scripts: setup, seeding, request drivers and statistics."""
+import asyncio
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def setup(settings_module='benchmarks.settings', fresh=True):
+    """Configure Django against a fresh benchmark database"""
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    from django.conf import settings
+    if fresh:
+        db_name = Path(settings.DATABASES['default']['NAME'])
+        for suffix in ['', '-wal', '-shm']:
+            Path(f'{db_name}{suffix}').unlink(missing_ok=True)
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+def handler(handler_class, fast_path=False):
+    """A WSGI or ASGI handler, with RedirectFastPathMiddleware in front only when fast_path is set"""
+    from django.conf import settings
+    from django.test import override_settings
+    # The middleware decides whether it is used when the handler loads it
+    with override_settings(URL_SHORTENER_SETTINGS={**settings.URL_SHORTENER_SETTINGS, 'REDIRECT_FAST_PATH': fast_path}):
+        return handler_class()
+
+def seed(accounts, urls, clicks, seed_value=0):
+    """Create `accounts` users with `urls` links in total and `clicks` access logs; returns (codes, tokens)"""
+    from datetime import timedelta
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from rest_framework.authtoken.models import Token
+    from url_shortener.models import Account, ShortenedURL, URLAccess
+    from url_shortener.codes import generate_short_code
+    from url_shortener.agents import intern_user_agent
+
+    rng = random.Random(seed_value)
+    users = User.objects.bulk_create([
+        User(username=f'bench{index}', password='!') for index in range(accounts)
+    ])
+    account_objs = Account.objects.bulk_create([
+        Account(user=user, daily_limit=10 ** 9) for user in users
+    ])
+    tokens = Token.objects.bulk_create([
+        Token(user=user, key=Token.generate_key()) for user in users
+    ])
+    links = ShortenedURL.objects.bulk_create([
+        ShortenedURL(
+            account=account_objs[index % accounts],
+            original_url=f'https://example.com/{index}',
+            short_code=generate_short_code()
+        )
+        for index in range(urls)
+    ], batch_size=1000)
+    now = timezone.now()
+    agent_id = intern_user_agent('benchmark')
+    clicked = [rng.choice(links) for _ in range(clicks)]
+    URLAccess.objects.bulk_create([
+        URLAccess(
+            url=link,
+            account_id=link.account_id,
+            accessed_at=now - timedelta(seconds=rng.randrange(30 * 86400)),
+            ip_address='127.0.0.1',
+            agent_id=agent_id
+        )
+        for link in clicked
+    ], batch_size=1000)
+    return [link.short_code for link in links], [token.key for token in tokens]
+
+def environ(path, method='GET', headers=None, body=b'', content_type=''):
+    """Minimal WSGI environ for `path` (which may carry a query string)"""
+    path_info, _, query = path.partition('?')
+    env = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'benchmark',
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'benchmark',
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.version': (1, 0),
+    }
+    for name, value in (headers or {}).items():
+        env['HTTP_' + name.upper().replace('-', '_')] = value
+    return env
+
+def run_wsgi(application, requests, workers):
+    """Send (path, method, headers, body, content_type) tuples through a WSGI app from `workers` threads"""
+    def call(request):
+        statuses = []
+        started = time.perf_counter()
+        body = application(environ(*request), lambda status, headers, exc_info=None: statuses.append(status))
+        for _ in body:
+            pass
+        if hasattr(body, 'close'):
+            body.close()
+        return time.perf_counter() - started, int(statuses[0][:3])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(call, requests))
+    return results, time.perf_counter() - started
+
+def run_asgi(application, requests, workers):
+    """Send the same request tuples through an ASGI app with `workers` concurrent tasks"""
+    async def call(request):
+        path, method, headers, body, content_type = request
+        path_info, _, query = path.partition('?')
+        header_list = [(b'host', b'benchmark')]
+        header_list += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        if content_type:
+            header_list.append((b'content-type', content_type.encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path_info, 'raw_path': path_info.encode(),
+            'query_string': query.encode(), 'root_path': '', 'headers': header_list,
+            'client': ('127.0.0.1', 50000), 'server': ('benchmark', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        return time.perf_counter() - started, status[0]
+
+    async def main():
+        queue = list(reversed(requests))
+        results = []
+
+        async def worker():
+            while queue:
+                results.append(await call(queue.pop()))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+def summarize(results, elapsed):
+    """Latency percentiles in milliseconds plus throughput for a list of (seconds, status)"""
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(results),
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'max_ms': round(latencies[-1], 3),
+        'statuses': statuses,
+    }
+
+def login_cookies(usernames):
+    """Session cookie headers for already seeded users, so views behind login can be measured"""
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+
+    headers = []
+    for user in User.objects.filter(username__in=usernames).order_by('id'):
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        headers.append({'Cookie': f'{settings.SESSION_COOKIE_NAME}={session.session_key}'})
+    return headers
@@ -0,0 +1,50 @@
+"""
+Settings for the benchmark scripts: a local SQLite file and an in-process
+cache stand-in, so runs are reproducible without Redis or PostgreSQL.
+The database uses the production profile of shortenit/database.py unless
+SHORTENIT_DB_PROFILE says otherwise.
+"""
+import os
+import tempfile
+
+from shortenit.settings import *  # noqa: F401,F403
+from shortenit.database import database_settings
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+DATABASES, SQLITE_PRAGMAS = database_settings({
+    **os.environ,
+    'SHORTENIT_DB_ENGINE': 'sqlite',
+    'SHORTENIT_DB_PROFILE': os.environ.get('SHORTENIT_DB_PROFILE', 'production'),
+    'SHORTENIT_DB_NAME': os.environ.get(
+        'BENCHMARK_DB', os.path.join(tempfile.gettempdir(), 'shortenit-benchmark.sqlite3')
+    ),
+}, BASE_DIR)  # noqa: F405
+DATABASE_REPLICAS = []
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Redirect benchmarks measure the views; scripts that measure
+# RedirectFastPathMiddleware turn it on for their own handler
+URL_SHORTENER_SETTINGS = {
+    **URL_SHORTENER_SETTINGS,  # noqa: F405
+    'REDIRECT_FAST_PATH': False,
+}
+
+# Seeding thousands of users should not be dominated by password hashing
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Every benchmark request comes from one address; keep the limiter in the path
+# so its cost is measured, but never let it reject
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    'DEFAULT_THROTTLE_RATES': {
+        scope: '1000000000/minute' for scope in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']  # noqa: F405
+    },
+}
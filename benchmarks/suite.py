@@ -0,0 +1,148 @@
+"""
+Load and latency benchmarks for the hot paths: redirects, link creation,
+the analytics API and the home page. `redirect` measures the redirect view
+and `redirect_fast_path` the same requests served by
+RedirectFastPathMiddleware.
+
+Seeds a fresh SQLite database with the given number of accounts, links and
+clicks, drives each scenario through Django's WSGI handler from a thread
+pool and reports p50/p95/p99 latency and requests per second as JSON:
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json --tolerance 0.2
+
+With --baseline the run is compared scenario by scenario and the script
+exits with status 1 when throughput dropped or p95 latency grew by more
+than the tolerance, so CI can fail on regressions.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import harness  # noqa: E402
+
+def redirect_requests(context, rng, count):
+    codes = context['codes']
+    return [
+        (f'/{codes[int(rng.paretovariate(1.2)) % len(codes)]}/', 'GET', None, b'', '')
+        for _ in range(count)
+    ]
+
+def create_requests(context, rng, count):
+    return [
+        (
+            '/api/urls/', 'POST',
+            {'Authorization': f'Token {rng.choice(context["tokens"])}'},
+            json.dumps({'original_url': f'https://example.org/{rng.randrange(10 ** 9)}'}).encode(),
+            'application/json'
+        )
+        for _ in range(count)
+    ]
+
+def analytics_requests(context, rng, count):
+    return [
+        ('/api/analytics/', 'GET', {'Authorization': f'Token {rng.choice(context["tokens"])}'}, b'', '')
+        for _ in range(count)
+    ]
+
+def home_requests(context, rng, count):
+    return [('/', 'GET', rng.choice(context['cookies']), b'', '') for _ in range(count)]
+
+SCENARIOS = {
+    'redirect': redirect_requests,
+    'redirect_fast_path': redirect_requests,
+    'create': create_requests,
+    'analytics': analytics_requests,
+    'home': home_requests,
+}
+
+def compare(results, baseline, tolerance, min_delta_ms=1.0):
+    """
+    Per scenario ratios against `baseline`. A scenario regressed when its
+    throughput fell, or its p95 grew by more than `tolerance` and by at least
+    `min_delta_ms`, which keeps sub-millisecond jitter from failing a run.
+    """
+    comparison = {}
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        throughput = current['requests_per_second'] / previous['requests_per_second']
+        latency = current['p95_ms'] / previous['p95_ms'] if previous['p95_ms'] else 1.0
+        slower = latency > 1 + tolerance and current['p95_ms'] - previous['p95_ms'] >= min_delta_ms
+        comparison[name] = {
+            'requests_per_second_ratio': round(throughput, 3),
+            'p95_ratio': round(latency, 3),
+            'regressed': throughput < 1 - tolerance or slower,
+        }
+    return comparison
+
+def run(args):
+    from django import get_version
+    from django.core.handlers.wsgi import WSGIHandler
+
+    harness.setup()
+    codes, tokens = harness.seed(args.accounts, args.urls, args.clicks)
+    context = {
+        'codes': codes,
+        'tokens': tokens,
+        'cookies': harness.login_cookies([f'bench{index}' for index in range(args.accounts)]),
+    }
+    application = harness.handler(WSGIHandler)
+    fast_path_application = harness.handler(WSGIHandler, fast_path=True)
+    results = {
+        'parameters': {
+            'accounts': args.accounts, 'urls': args.urls, 'clicks': args.clicks,
+            'requests': args.requests, 'workers': args.workers, 'seed': args.seed,
+        },
+        'environment': {'python': platform.python_version(), 'django': get_version()},
+        'scenarios': {},
+    }
+    for name in args.scenarios:
+        rng = random.Random(args.seed)
+        build = SCENARIOS[name]
+        handler = fast_path_application if name == 'redirect_fast_path' else application
+        harness.run_wsgi(handler, build(context, rng, args.warmup), args.workers)
+        results['scenarios'][name] = harness.summarize(
+            *harness.run_wsgi(handler, build(context, rng, args.requests), args.workers)
+        )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=10)
+    parser.add_argument('--urls', type=int, default=1000)
+    parser.add_argument('--clicks', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=2000, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative change before a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Smallest p95 increase counted as a regression')
+    args = parser.parse_args()
+
+    results = run(args)
+    regressed = []
+    if args.baseline:
+        results['comparison'] = compare(
+            results, json.loads(Path(args.baseline).read_text()), args.tolerance, args.min_delta_ms
+        )
+        regressed = [name for name, change in results['comparison'].items() if change['regressed']]
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+    if regressed:
+        print(f'Regressed: {", ".join(regressed)}', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shortenit.settings')
+os.environ.setdefault('SHORTENIT_ASYNC_REDIRECT', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,110 @@
+"""
+Database settings built from SHORTENIT_DB_* environment variables, which
+settings.py loads from a .env file when present.
+
+SHORTENIT_DB_PROFILE picks the tuning: 'development' (the default) opens a
+plain connection per request, 'production' keeps connections alive:
+
+- PostgreSQL: a psycopg connection pool (SHORTENIT_DB_POOL_MIN_SIZE,
+  SHORTENIT_DB_POOL_MAX_SIZE, SHORTENIT_DB_POOL_TIMEOUT) whose connections are
+  checked before use, or, with SHORTENIT_DB_POOL=0, persistent connections
+  (SHORTENIT_DB_CONN_MAX_AGE seconds) with health checks.
+- SQLite: persistent connections in WAL mode with synchronous=NORMAL, a
+  memory map of SHORTENIT_SQLITE_MMAP_SIZE bytes and a busy timeout of
+  SHORTENIT_SQLITE_BUSY_TIMEOUT milliseconds, applied by
+  url_shortener.sqlite when each connection opens.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ['development', 'production']
+
+def _int(environ, name, default):
+    return int(environ.get(name, default))
+
+def sqlite_pragmas(environ):
+    """PRAGMA name -> value for each new SQLite connection of the production profile"""
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': _int(environ, 'SHORTENIT_SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'busy_timeout': _int(environ, 'SHORTENIT_SQLITE_BUSY_TIMEOUT', 5000),
+        'temp_store': 'MEMORY',
+    }
+
+def _postgresql(environ, production):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('SHORTENIT_DB_NAME', 'shortenit'),
+        'USER': environ.get('SHORTENIT_DB_USER', ''),
+        'PASSWORD': environ.get('SHORTENIT_DB_PASSWORD', ''),
+        'HOST': environ.get('SHORTENIT_DB_HOST', ''),
+        'PORT': environ.get('SHORTENIT_DB_PORT', ''),
+    }
+    if not production:
+        return database
+    if environ.get('SHORTENIT_DB_POOL', '1') == '1':
+        pool = {
+            'min_size': _int(environ, 'SHORTENIT_DB_POOL_MIN_SIZE', 2),
+            'max_size': _int(environ, 'SHORTENIT_DB_POOL_MAX_SIZE', 20),
+            'timeout': _int(environ, 'SHORTENIT_DB_POOL_TIMEOUT', 10),
+        }
+        try:
+            from psycopg_pool import ConnectionPool
+            # Hands out only connections that answer, e.g. after a failover
+            pool['check'] = ConnectionPool.check_connection
+        except (ImportError, AttributeError):
+            pass
+        # Django's pool replaces persistent connections; CONN_MAX_AGE must stay 0
+        database['OPTIONS'] = {'pool': pool}
+    else:
+        database['CONN_MAX_AGE'] = _int(environ, 'SHORTENIT_DB_CONN_MAX_AGE', 60)
+        database['CONN_HEALTH_CHECKS'] = True
+    return database
+
+def _sqlite(environ, production, base_dir):
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('SHORTENIT_DB_NAME', str(base_dir / 'db.sqlite3')),
+    }
+    if production:
+        database['CONN_MAX_AGE'] = _int(environ, 'SHORTENIT_DB_CONN_MAX_AGE', 60)
+        database['CONN_HEALTH_CHECKS'] = True
+        database['OPTIONS'] = {
+            # Seconds the sqlite3 module waits for a lock, matching busy_timeout
+            'timeout': _int(environ, 'SHORTENIT_SQLITE_BUSY_TIMEOUT', 5000) / 1000,
+            # Take the write lock when a transaction starts, so concurrent
+            # writers wait for it instead of failing to upgrade a read lock
+            'transaction_mode': 'IMMEDIATE',
+        }
+    return database
+
+def database_settings(environ, base_dir):
+    """
+    (DATABASES, SQLITE_PRAGMAS) for the configured engine and profile.
+    SHORTENIT_DB_REPLICA_HOSTS, a comma-separated list of PostgreSQL hosts,
+    adds aliases replica1, replica2, ... for DATABASE_REPLICAS.
+    """
+    profile = environ.get('SHORTENIT_DB_PROFILE', 'development')
+    if profile not in PROFILES:
+        raise ImproperlyConfigured(f'SHORTENIT_DB_PROFILE must be one of {", ".join(PROFILES)}, not {profile!r}')
+    production = profile == 'production'
+    engine = environ.get('SHORTENIT_DB_ENGINE', 'sqlite')
+
+    if engine == 'postgresql':
+        default = _postgresql(environ, production)
+        pragmas = {}
+    elif engine == 'sqlite':
+        default = _sqlite(environ, production, base_dir)
+        pragmas = sqlite_pragmas(environ) if production else {}
+    else:
+        raise ImproperlyConfigured(f"SHORTENIT_DB_ENGINE must be 'sqlite' or 'postgresql', not {engine!r}")
+
+    databases = {'default': default}
+    if engine == 'postgresql':
+        hosts = [host.strip() for host in environ.get('SHORTENIT_DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+        for index, host in enumerate(hosts, 1):
+            databases[f'replica{index}'] = {
+                **default, 'OPTIONS': dict(default.get('OPTIONS', {})), 'HOST': host, 'TEST': {'MIRROR': 'default'}
+            }
+    return databases, pragmas
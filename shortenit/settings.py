@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
+from dotenv import load_dotenv
+from .database import database_settings
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# SHORTENIT_* variables may also come from a .env file; real ones take precedence
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -44,6 +50,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Read-your-writes for replica reads; removes itself without replicas
+    'url_shortener.middleware.ReplicaPinMiddleware',
+    # Per-request query, cache and latency metrics; removes itself when disabled
+    'url_shortener.middleware.MetricsMiddleware',
+    # Answers short code redirects before the rest of the stack runs
+    'url_shortener.middleware.RedirectFastPathMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,12 +89,19 @@ WSGI_APPLICATION = 'shortenit.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Engine, connection and tuning profile come from SHORTENIT_DB_* variables;
+# see shortenit/database.py. Without any, this is a plain SQLite file.
+DATABASES, SQLITE_PRAGMAS = database_settings(os.environ, BASE_DIR)
+
+# Aliases in DATABASES that replicate 'default'. Redirect lookups, the
+# analytics API and the link list read from them; writes and all other
+# reads use 'default'. After a write, the link it touched and the user who
+# made it read from 'default' for REPLICA_PIN_SECONDS. A redirect lookup
+# that misses on a replica is retried on 'default'.
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+REPLICA_PIN_SECONDS = 5
+
+DATABASE_ROUTERS = ['url_shortener.routers.ReplicaRouter']
 
 
 # Password validation
@@ -129,16 +148,38 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'url_shortener.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Reverse proxies in front of the app; client IPs for rate limits are read
+    # from X-Forwarded-For only when this is set
+    'NUM_PROXIES': int(os.environ.get('SHORTENIT_NUM_PROXIES', '0')),
+    'DEFAULT_THROTTLE_CLASSES': [
+        'url_shortener.ratelimit.APIRateThrottle',
+    ],
+    # Sliding window limits, shared through Redis (see url_shortener.ratelimit);
+    # a scope set to None is not limited
+    'DEFAULT_THROTTLE_RATES': {
+        'api_key': '1200/minute',
+        'api_user': '1200/minute',
+        'api_anon': '60/minute',
+        'redirect_ip': '300/minute',
+        # Shared by every client of a link, so a set rate would throttle hot links for everyone
+        'redirect_code': None,
+    },
 }
 
 # URL Shortener settings
 URL_SHORTENER_SETTINGS = {
     'DAILY_LIMIT': 50,  # Maximum number of URLs that can be shortened per day
+    'BULK_MAX_ITEMS': 1000,  # Maximum number of URLs per bulk shorten request
+    'PAGE_SIZE': 100,  # Rows per page of the URL and analytics lists
+    'MAX_PAGE_SIZE': 1000,  # Upper bound for the ?page_size= list parameter
+    'REDIRECT_FAST_PATH': True,  # Serve redirects from RedirectFastPathMiddleware
+    'EXPORT_CHUNK_SIZE': 2000,  # Rows fetched and written per chunk by the export endpoints
+    'DEDUPLICATE': False,  # Return an account's existing link when it shortens the same URL again
 }
 
 # Swagger settings
@@ -163,5 +204,122 @@ CACHES = {
     }
 }
 
-# Cache time for shortened URLs (1 day)
+# Serve redirects from the native async view; shortenit/asgi.py turns this on
+ASYNC_REDIRECT = os.environ.get('SHORTENIT_ASYNC_REDIRECT') == '1'
+
+# Cache time for shortened URLs (1 day), shortened at random by up to
+# URL_CACHE_TTL_JITTER so entries cached together do not expire together
 URL_CACHE_TTL = 60 * 60 * 24
+URL_CACHE_TTL_JITTER = 0.1
+
+# Expired URLs stay cached this much longer (5 minutes) and are served while
+# a single request, holding a lease for up to URL_CACHE_LEASE_TTL seconds,
+# reloads them. Requests missing a URL another worker is loading wait up to
+# URL_CACHE_LEASE_WAIT seconds for it before querying themselves.
+URL_CACHE_STALE_TTL = 60 * 5
+URL_CACHE_LEASE_TTL = 5
+URL_CACHE_LEASE_WAIT = 0.2
+
+# Cache time for short codes that do not exist (1 minute)
+URL_NEGATIVE_CACHE_TTL = 60
+
+# Set to False to switch off every rate limit, e.g. behind an edge rate limiter
+RATE_LIMITING = True
+
+# Cache time for API tokens with their user and account fields (5 minutes); entries
+# are also dropped whenever the token, user or account changes
+AUTH_TOKEN_CACHE_TTL = 60 * 5
+
+# Click logging: redirects queue access logs which a background thread
+# writes in batches. QUEUE is 'memory' (per process) or 'redis' (shared).
+CLICK_LOG = {
+    'ASYNC': True,
+    'QUEUE': 'memory',
+    'REDIS_KEY': 'click_events',
+    'FLUSH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,  # seconds
+    'MAX_QUEUE_SIZE': 100000,
+    # Failed writes in a row before a batch is dropped (memory queue) or moved
+    # to the '<REDIS_KEY>:dead' list (redis queue) instead of being retried
+    'MAX_RETRIES': 5,
+}
+
+# Live click counters: redirects bump access_count and last_accessed in a
+# Redis hash (HINCRBY), API reads add the pending clicks, and a background
+# thread per worker writes them back every FLUSH_INTERVAL seconds with one
+# UPDATE per FLUSH_BATCH_SIZE links (None leaves it to
+# `manage.py flush_click_counters`). BACKEND is 'redis', 'memory' (per
+# process) or 'database', which updates the columns with the access logs,
+# as 'redis' also does while no Redis cache is configured.
+CLICK_COUNTERS = {
+    'BACKEND': 'redis',
+    'REDIS_KEY': 'click_counters',
+    'FLUSH_INTERVAL': 10.0,  # seconds
+    'FLUSH_BATCH_SIZE': 500,
+}
+
+# Per-worker LRU in front of the shared URL cache. Entries live at most TTL
+# seconds; deletions are broadcast to other workers over Redis pub/sub.
+URL_LOCAL_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+    'TTL': 30,  # seconds
+    'INVALIDATION_CHANNEL': 'url_invalidate',
+}
+
+# Distinct user agents whose UserAgent id each worker keeps in memory
+USER_AGENT_CACHE_SIZE = 10000
+
+# Preloading of the most clicked links, by `manage.py warm_url_cache` or, with
+# ON_STARTUP, by each worker in the background when it serves its first request.
+# SOURCE is 'access_count', 'last_accessed' or 'rollups' (clicks in the last DAYS)
+URL_CACHE_WARMUP = {
+    'ON_STARTUP': False,
+    'LIMIT': 1000,
+    'SOURCE': 'access_count',
+    'DAYS': 7,
+    'BATCH_SIZE': 500,  # keys per set_many call
+}
+
+# Bloom filter over all short codes, checked before the URL cache so codes
+# that were never issued (bot probes) get a 404 without any lookup. BACKEND
+# is 'redis' (shared and kept across restarts) or 'memory' (per process, for
+# a single worker). Size follows from CAPACITY and ERROR_RATE: 1M codes at
+# 0.1% take about 1.8 MB. Each worker builds a missing filter in the
+# background on its first request; `manage.py rebuild_short_code_filter`
+# rebuilds it to drop deleted codes and reports its size and fill.
+SHORT_CODE_FILTER = {
+    'ENABLED': os.environ.get('SHORTENIT_SHORT_CODE_FILTER') == '1',
+    'BACKEND': 'redis',
+    'CAPACITY': 1000000,
+    'ERROR_RATE': 0.001,
+    'KEY': 'short_code_filter',
+    'BATCH_SIZE': 10000,  # codes read per query while building
+    'BUILD_LOCK_TTL': 60 * 10,  # seconds
+}
+
+# Short code generation. GENERATOR is one of the classes in
+# url_shortener.codes; collisions are retried up to MAX_ATTEMPTS times.
+SHORT_CODES = {
+    'GENERATOR': 'url_shortener.codes.BlockCodeGenerator',
+    'LENGTH': 6,
+    'BLOCK_SIZE': 1000,  # ids reserved per worker at a time
+    'WORKER_ID': None,  # SnowflakeCodeGenerator only; defaults to the pid
+    'MAX_ATTEMPTS': 10,
+}
+
+# Access log retention, applied by `manage.py prune_access_logs`
+ACCESS_LOG_RETENTION = {
+    'DAYS': 90,
+    'BATCH_SIZE': 5000,
+    'ARCHIVE_DIR': None,  # directory for gzip archives; None deletes without archiving
+    'FORMAT': 'ndjson',  # or 'csv'
+    'PAUSE': 0.05,  # seconds between batches
+}
+
+# Per-request metrics, exposed at /api/metrics/ (admin users only). Totals are
+# kept per worker process, so scrape each worker.
+METRICS = {
+    'ENABLED': os.environ.get('SHORTENIT_METRICS') == '1',
+    'SERVER_TIMING': True,  # add a Server-Timing header to every response
+}
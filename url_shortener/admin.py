@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Account, ShortenedURL, URLAccess
+from .models import Account, ShortenedURL, URLAccess, UserAgent, DailyUsage
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
@@ -14,6 +14,21 @@ class ShortenedURLAdmin(admin.ModelAdmin):
 
 @admin.register(URLAccess)
 class URLAccessAdmin(admin.ModelAdmin):
-    list_display = ('url', 'accessed_at', 'ip_address')
-    list_filter = ('accessed_at',)
-    search_fields = ('ip_address', 'user_agent')
+    list_display = ('url', 'accessed_at', 'ip_address', 'agent')
+    ordering = ('-accessed_at',)
+    list_filter = ('accessed_at', 'agent__browser', 'agent__device')
+    search_fields = ('agent__user_agent',)
+    list_select_related = ('url', 'agent')
+    raw_id_fields = ('url', 'agent')
+
+@admin.register(UserAgent)
+class UserAgentAdmin(admin.ModelAdmin):
+    list_display = ('browser', 'os', 'device', 'user_agent')
+    list_filter = ('browser', 'os', 'device')
+    search_fields = ('user_agent',)
+
+@admin.register(DailyUsage)
+class DailyUsageAdmin(admin.ModelAdmin):
+    list_display = ('account', 'date', 'count')
+    list_filter = ('date',)
+    search_fields = ('account__user__username',)
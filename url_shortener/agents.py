@@ -0,0 +1,100 @@
+import hashlib
+import re
+from django.conf import settings
+from django.db import transaction
+from .models import UserAgent
+from .cache import LocalCache
+
+# First match wins, so more specific families come before the ones they imitate
+BROWSERS = [
+    ('Bot', re.compile(r'bot|crawl|spider|slurp|facebookexternalhit|preview', re.I)),
+    ('curl', re.compile(r'^curl/')),
+    ('Python', re.compile(r'python-requests|python-urllib|aiohttp|httpx', re.I)),
+    ('Edge', re.compile(r'Edg(e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Safari', re.compile(r'Version/[\d.]+.*Safari/')),
+    ('Internet Explorer', re.compile(r'MSIE |Trident/')),
+]
+OPERATING_SYSTEMS = [
+    ('Android', re.compile(r'Android')),
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Windows', re.compile(r'Windows')),
+    ('ChromeOS', re.compile(r'CrOS')),
+    ('macOS', re.compile(r'Mac OS X|Macintosh')),
+    ('Linux', re.compile(r'Linux|X11')),
+]
+TABLET = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+MOBILE = re.compile(r'Mobi|iPhone|iPod|Android')
+
+def _family(patterns, user_agent):
+    for name, pattern in patterns:
+        if pattern.search(user_agent):
+            return name
+    return 'Other'
+
+def parse_user_agent(user_agent):
+    """Browser, OS and device families of a user agent string"""
+    browser = _family(BROWSERS, user_agent)
+    os = _family(OPERATING_SYSTEMS, user_agent)
+    if browser == 'Bot':
+        device = 'bot'
+    elif TABLET.search(user_agent):
+        device = 'tablet'
+    elif MOBILE.search(user_agent):
+        device = 'mobile'
+    elif os in ('Windows', 'macOS', 'Linux', 'ChromeOS'):
+        device = 'desktop'
+    else:
+        device = 'other'
+    return {'browser': browser, 'os': os, 'device': device}
+
+def user_agent_hash(user_agent):
+    return hashlib.sha256(user_agent.encode()).hexdigest()
+
+# User agent string -> UserAgent id; rows are never changed, so entries only age out
+agent_ids = LocalCache(settings.USER_AGENT_CACHE_SIZE, ttl=60 * 60 * 24)
+
+def intern_user_agents(user_agents):
+    """
+    Map each distinct, non-empty user agent string to the id of its
+    UserAgent row, creating missing rows. Strings seen before in this
+    process cost nothing; the rest cost one or two queries per call.
+    """
+    ids = {}
+    missing = {}
+    for user_agent in set(user_agents):
+        if not user_agent:
+            continue
+        agent_id = agent_ids.get(user_agent)
+        if agent_id is None:
+            missing[user_agent_hash(user_agent)] = user_agent
+        else:
+            ids[user_agent] = agent_id
+    if not missing:
+        return ids
+
+    found = dict(UserAgent.objects.filter(hash__in=missing).values_list('hash', 'id'))
+    new = [
+        UserAgent(hash=digest, user_agent=user_agent, **parse_user_agent(user_agent))
+        for digest, user_agent in missing.items() if digest not in found
+    ]
+    if new:
+        # Another worker may insert the same agents concurrently
+        UserAgent.objects.bulk_create(new, ignore_conflicts=True)
+        found.update(UserAgent.objects.filter(hash__in=[agent.hash for agent in new]).values_list('hash', 'id'))
+
+    loaded = {missing[digest]: agent_id for digest, agent_id in found.items()}
+    ids.update(loaded)
+
+    def remember():
+        for user_agent, agent_id in loaded.items():
+            agent_ids.set(user_agent, agent_id)
+    # Rows created in a transaction that rolls back must not be remembered
+    transaction.on_commit(remember)
+    return ids
+
+def intern_user_agent(user_agent):
+    return intern_user_agents([user_agent]).get(user_agent)
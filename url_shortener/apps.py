@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class UrlShortenerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'url_shortener'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.SQLITE_PRAGMAS:
+            from .sqlite import apply_pragmas
+            connection_created.connect(apply_pragmas, dispatch_uid='url_shortener.sqlite')
+
+        if settings.URL_CACHE_WARMUP['ON_STARTUP']:
+            # Deferred to the first request: the database should not be
+            # queried while apps load, and management commands skip it
+            from .warmup import warm_on_first_request
+            request_started.connect(warm_on_first_request, dispatch_uid='url_shortener.warmup')
+
+        if settings.SHORT_CODE_FILTER['ENABLED']:
+            from .bloom import build_on_first_request
+            request_started.connect(build_on_first_request, dispatch_uid='url_shortener.bloom')
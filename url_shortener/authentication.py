@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from .models import Account
+
+def token_cache_key(key):
+    # Not auth_token_<key>, which held whole pickled Token objects
+    return f'auth_token_fields_{key}'
+
+# The only fields cached per token; the password hash never leaves the database
+USER_FIELDS = ['id', 'username', 'is_active', 'is_staff', 'is_superuser']
+ACCOUNT_FIELDS = ['id', 'daily_limit']
+
+def _instance(model, values):
+    """
+    A model instance as if loaded with .only(*values): other fields load
+    lazily, and save() writes back only the loaded ones.
+    """
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+def token_entry(token):
+    """The cached form of a token: the fields a request needs from its user and account"""
+    user = token.user
+    account = getattr(user, 'account', None)
+    return {
+        'user': {field: getattr(user, field) for field in USER_FIELDS},
+        'account': None if account is None else {field: getattr(account, field) for field in ACCOUNT_FIELDS},
+    }
+
+def token_from_entry(key, entry):
+    user = _instance(User, entry['user'])
+    if entry['account'] is not None:
+        user.account = _instance(Account, {**entry['account'], 'user_id': user.pk})
+    token = _instance(Token, {'key': key, 'user_id': user.pk})
+    token.user = user
+    return token
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the token's user and account fields in
+    the cache, so an authenticated API call needs no query before the view
+    runs and request.user.account is already loaded.
+
+    Entries are dropped by the signal handlers whenever the token, the
+    user or the account is saved or deleted.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        entry = cache.get(cache_key)
+        if entry is None:
+            try:
+                token = Token.objects.select_related('user__account').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            cache.set(cache_key, token_entry(token), timeout=settings.AUTH_TOKEN_CACHE_TTL)
+        else:
+            token = token_from_entry(key, entry)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (token.user, token)
+
+def _evict_tokens(keys):
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+def invalidate_tokens(keys):
+    """Drop cached tokens now and again once the surrounding transaction commits"""
+    keys = list(keys)
+    if not keys:
+        return
+    _evict_tokens(keys)
+    transaction.on_commit(lambda: _evict_tokens(keys))
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
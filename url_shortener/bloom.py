@@ -0,0 +1,356 @@
+import hashlib
+import logging
+import math
+import threading
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db import connection, transaction
+from .models import ShortenedURL
+from .startup import on_first_request
+
+logger = logging.getLogger(__name__)
+
+def optimal_size(capacity, error_rate):
+    """(bits, hashes) for a Bloom filter holding `capacity` items at the given false positive rate"""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+def positions(item, bits, hashes):
+    # Double hashing: the two halves of one digest give all `hashes` positions
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], 'little')
+    step = int.from_bytes(digest[8:], 'little') | 1
+    return [(first + index * step) % bits for index in range(hashes)]
+
+def estimate(bits, hashes, bits_set):
+    """Approximate item count and current false positive rate from the number of set bits"""
+    fill = bits_set / bits
+    items = -bits / hashes * math.log(1 - fill) if fill < 1 else float('inf')
+    return {
+        'fill_ratio': round(fill, 6),
+        'estimated_items': round(items) if fill < 1 else None,
+        'false_positive_rate': fill ** hashes,
+    }
+
+class MemoryBloomFilter:
+    """Bit array in this process, for a single worker and for tests"""
+
+    def __init__(self, bits, hashes):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray((bits + 7) // 8)
+        # Filled by a rebuild; adds made meanwhile go to both arrays
+        self.pending = None
+        self.is_ready = False
+        self.lock = threading.Lock()
+
+    def _set(self, array, items):
+        for item in items:
+            for position in positions(item, self.bits, self.hashes):
+                array[position >> 3] |= 1 << (position & 7)
+
+    def add(self, items):
+        with self.lock:
+            self._set(self.array, items)
+            if self.pending is not None:
+                self._set(self.pending, items)
+
+    def might_contain(self, item):
+        if not self.is_ready:
+            return True
+        array = self.array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in positions(item, self.bits, self.hashes))
+
+    async def amight_contain(self, item):
+        return self.might_contain(item)
+
+    def ready(self):
+        return self.is_ready
+
+    def rebuild(self, batches):
+        with self.lock:
+            self.pending = bytearray(len(self.array))
+        for batch in batches:
+            with self.lock:
+                self._set(self.pending, batch)
+        with self.lock:
+            self.array, self.pending = self.pending, None
+            self.is_ready = True
+
+    def bits_set(self):
+        return int.from_bytes(self.array, 'little').bit_count()
+
+    def clear(self):
+        with self.lock:
+            self.array = bytearray(len(self.array))
+            self.pending = None
+            self.is_ready = False
+
+# Sets the bits of every item in KEYS[1] and, while a rebuild is running, in KEYS[2]
+ADD_SCRIPT = """
+for i = 1, #KEYS do
+    if i == 1 or redis.call('EXISTS', KEYS[i]) == 1 then
+        for j = 1, #ARGV do
+            redis.call('SETBIT', KEYS[i], ARGV[j], 1)
+        end
+    end
+end
+"""
+
+# 1 when the item may be present: the filter is not built for these
+# parameters yet, or every bit is set. ARGV[1] holds the parameters.
+CHECK_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 1
+end
+for i = 2, #ARGV do
+    if redis.call('GETBIT', KEYS[1], ARGV[i]) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+class RedisBloomFilter:
+    """
+    Bitmap in Redis shared by all workers and kept across restarts. A ready
+    marker holding the filter's size is written when a rebuild completes,
+    so a missing or differently sized filter is never trusted.
+    """
+
+    def __init__(self, redis, key, bits, hashes):
+        self.redis = redis
+        # The hash tag keeps all three keys in one cluster slot for the scripts
+        self.key = f'{{{key}}}'
+        self.building_key = f'{{{key}}}:building'
+        self.ready_key = f'{{{key}}}:ready'
+        self.bits = bits
+        self.hashes = hashes
+        self.marker = f'{bits}:{hashes}'
+        self.add_script = redis.register_script(ADD_SCRIPT)
+        self.check_script = redis.register_script(CHECK_SCRIPT)
+
+    def _positions(self, items):
+        return [position for item in items for position in positions(item, self.bits, self.hashes)]
+
+    def add(self, items, keys=None):
+        args = self._positions(items)
+        if args:
+            self.add_script(keys=keys or [self.key, self.building_key], args=args)
+
+    def might_contain(self, item):
+        args = [self.marker] + positions(item, self.bits, self.hashes)
+        return bool(self.check_script(keys=[self.key, self.ready_key], args=args))
+
+    async def amight_contain(self, item):
+        from .cache import async_cache
+        args = [self.marker] + positions(item, self.bits, self.hashes)
+        script = async_cache.redis().register_script(CHECK_SCRIPT)
+        return bool(await script(keys=[self.key, self.ready_key], args=args))
+
+    def ready(self):
+        marker = self.redis.get(self.ready_key)
+        return marker is not None and marker.decode() == self.marker
+
+    def rebuild(self, batches):
+        # Allocate the new bitmap first so concurrent adds land in it too
+        self.redis.delete(self.building_key)
+        self.redis.setbit(self.building_key, self.bits - 1, 0)
+        for batch in batches:
+            self.add(batch, keys=[self.building_key])
+        with self.redis.pipeline() as pipe:
+            pipe.rename(self.building_key, self.key)
+            pipe.set(self.ready_key, self.marker)
+            pipe.execute()
+
+    def bits_set(self):
+        return self.redis.bitcount(self.key)
+
+    def clear(self):
+        self.redis.delete(self.key, self.building_key, self.ready_key)
+
+class ShortCodeFilter:
+    """
+    Membership filter over every issued short code, consulted before the
+    URL cache so codes that were never issued are rejected without a
+    lookup. Never gives a false negative once built: new codes are added as
+    their transaction commits, while a filter that is not built yet (or
+    cannot be reached) answers "maybe" for everything. Deleted codes stay
+    in the filter as false positives until the next rebuild.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.lock = threading.Lock()
+        # Set when an add failed and the filter could not be cleared either
+        self.needs_clear = False
+        self.checks = 0
+        self.rejections = 0
+
+    def enabled(self):
+        return settings.SHORT_CODE_FILTER['ENABLED'] and self.get_backend() is not None
+
+    def get_backend(self):
+        """The filter backend, or None when the configured one is unavailable"""
+        if self.backend is None:
+            with self.lock:
+                if self.backend is None:
+                    self.backend = self.create_backend()
+        return self.backend or None
+
+    def create_backend(self):
+        from .cache import get_redis
+        config = settings.SHORT_CODE_FILTER
+        bits, hashes = optimal_size(config['CAPACITY'], config['ERROR_RATE'])
+        if config['BACKEND'] != 'redis':
+            return MemoryBloomFilter(bits, hashes)
+        redis = get_redis()
+        if redis is None:
+            # A per-process filter would miss codes created by other processes
+            # and turn their redirects into 404s
+            logger.warning("SHORT_CODE_FILTER['BACKEND'] is 'redis' but the default cache is not django_redis; "
+                           'the short code filter is disabled')
+            # False: looked up and there is none
+            return False
+        return RedisBloomFilter(redis, config['KEY'], bits, hashes)
+
+    def reset(self):
+        """Forget the backend so it is created again from the current settings"""
+        with self.lock:
+            self.backend = None
+        self.needs_clear = False
+        self.checks = self.rejections = 0
+
+    def might_contain(self, short_code):
+        if not self.enabled():
+            return True
+        if self.needs_clear:
+            self.invalidate()
+            return True
+        try:
+            found = self.get_backend().might_contain(short_code)
+        except Exception:
+            logger.warning('Short code filter unavailable', exc_info=True)
+            return True
+        self._count(found)
+        return found
+
+    async def amight_contain(self, short_code):
+        if not self.enabled():
+            return True
+        if self.needs_clear:
+            self.invalidate()
+            return True
+        try:
+            found = await self.get_backend().amight_contain(short_code)
+        except Exception:
+            logger.warning('Short code filter unavailable', exc_info=True)
+            return True
+        self._count(found)
+        return found
+
+    def _count(self, found):
+        self.checks += 1
+        if not found:
+            self.rejections += 1
+
+    def add(self, short_codes):
+        if not self.enabled() or not short_codes:
+            return
+        try:
+            self.get_backend().add(short_codes)
+        except Exception:
+            # A lost add would turn into a 404 for a real link; stop trusting the filter
+            logger.exception('Could not add short codes to the filter, it needs a rebuild')
+            self.invalidate()
+
+    def add_on_commit(self, short_codes):
+        """Add codes once the surrounding transaction commits, when they become resolvable"""
+        short_codes = list(short_codes)
+        transaction.on_commit(lambda: self.add(short_codes))
+
+    def invalidate(self):
+        try:
+            backend = self.get_backend()
+            if backend is not None:
+                backend.clear()
+            self.needs_clear = False
+        except Exception:
+            self.needs_clear = True
+            logger.exception('Could not clear the short code filter')
+
+    def ready(self):
+        backend = self.get_backend()
+        return backend is not None and backend.ready()
+
+    def rebuild(self, batch_size=None):
+        """Fill a new filter from the database and swap it in. Returns the number of codes added."""
+        backend = self.get_backend()
+        if backend is None:
+            raise ImproperlyConfigured("SHORT_CODE_FILTER['BACKEND'] is 'redis' but the default cache is not django_redis")
+        batch_size = batch_size or settings.SHORT_CODE_FILTER['BATCH_SIZE']
+        added = 0
+
+        def batches():
+            nonlocal added
+            last_id = 0
+            while True:
+                rows = list(
+                    ShortenedURL.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'short_code')[:batch_size]
+                )
+                if not rows:
+                    return
+                added += len(rows)
+                last_id = rows[-1][0]
+                yield [short_code for _, short_code in rows]
+
+        backend.rebuild(batches())
+        return added
+
+    def stats(self):
+        backend = self.get_backend()
+        config = settings.SHORT_CODE_FILTER
+        return {
+            'backend': 'redis' if isinstance(backend, RedisBloomFilter) else 'memory',
+            'ready': backend.ready(),
+            'capacity': config['CAPACITY'],
+            'target_false_positive_rate': config['ERROR_RATE'],
+            'bits': backend.bits,
+            'hashes': backend.hashes,
+            'memory_bytes': (backend.bits + 7) // 8,
+            **estimate(backend.bits, backend.hashes, backend.bits_set()),
+            'checks': self.checks,
+            'rejections': self.rejections,
+        }
+
+short_codes = ShortCodeFilter()
+
+BUILD_LOCK_KEY = 'short_code_filter_build'
+
+def build_in_background():
+    """Build the filter from a daemon thread unless it is ready or another worker is building it"""
+
+    def run():
+        try:
+            if not short_codes.enabled() or short_codes.ready():
+                return
+            if not cache.add(BUILD_LOCK_KEY, 1, timeout=settings.SHORT_CODE_FILTER['BUILD_LOCK_TTL']):
+                return
+            try:
+                added = short_codes.rebuild()
+                logger.info('Built the short code filter with %d codes', added)
+            finally:
+                cache.delete(BUILD_LOCK_KEY)
+        except Exception:
+            logger.exception('Short code filter build failed')
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name='short-code-filter', daemon=True)
+    thread.start()
+    return thread
+
+# request_started receiver: build once per process
+build_on_first_request = on_first_request(build_in_background)
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .models import ShortenedURL
+from .normalize import url_hash
+from .codes import generate_short_code, save_with_short_code
+from .cache import invalidate_urls
+from .bloom import short_codes
+from . import quota
+
+def deduplicating():
+    return settings.URL_SHORTENER_SETTINGS['DEDUPLICATE']
+
+def find_existing(account, original_url):
+    """The account's oldest link to the same normalized URL, found through the (account, url_hash) index"""
+    return ShortenedURL.objects.filter(account=account, url_hash=url_hash(original_url)).order_by('id').first()
+
+def shorten_many(account, original_urls):
+    """
+    Create ShortenedURLs for a list of already validated URLs.
+
+    Quota is reserved once for the whole batch; URLs beyond what is left
+    for today are returned as None. With DEDUPLICATE on, URLs the account
+    already shortened, and repeats within the batch, reuse one link and
+    use no quota. Returns a list of ShortenedURL or None in input order.
+    """
+    if not deduplicating():
+        return _create(account, original_urls)
+
+    hashes = [url_hash(url) for url in original_urls]
+    links = {}
+    # Oldest first wins, matching find_existing
+    for shortened in ShortenedURL.objects.filter(account=account, url_hash__in=set(hashes)).order_by('-id'):
+        links[shortened.url_hash] = shortened
+    pending = {}
+    for url, digest in zip(original_urls, hashes):
+        if digest not in links and digest not in pending:
+            pending[digest] = url
+    for digest, shortened in zip(pending, _create(account, list(pending.values()))):
+        if shortened is not None:
+            links[digest] = shortened
+    return [links.get(digest) for digest in hashes]
+
+def _create(account, original_urls):
+    granted = quota.reserve_up_to(account, len(original_urls))
+    accepted = original_urls[:granted]
+    try:
+        created = _insert(account, accepted)
+    except Exception:
+        quota.release(account, granted)
+        raise
+    invalidate_urls([shortened.short_code for shortened in created])
+    short_codes.add_on_commit([shortened.short_code for shortened in created])
+    return created + [None] * (len(original_urls) - granted)
+
+def _insert(account, original_urls):
+    objs = [
+        # bulk_create skips save(), which fills url_hash
+        ShortenedURL(account=account, original_url=url, url_hash=url_hash(url), short_code=generate_short_code())
+        for url in original_urls
+    ]
+    try:
+        with transaction.atomic():
+            return ShortenedURL.objects.bulk_create(objs)
+    except IntegrityError:
+        # A code was already taken; fall back to inserting one at a time
+        return [
+            save_with_short_code(ShortenedURL.objects.create, account=account, original_url=url)
+            for url in original_urls
+        ]
@@ -0,0 +1,446 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from .models import ShortenedURL
+from .bloom import short_codes
+from .routers import replica_first, areplica_first
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Stored in place of a URL for short codes that are known not to exist
+NOT_FOUND = '!'
+
+# Seconds between shared cache reads while waiting for another worker's load
+LEASE_POLL_INTERVAL = 0.01
+
+SHORT_CODE_MAX_LENGTH = ShortenedURL._meta.get_field('short_code').max_length
+
+def get_redis():
+    """Return the raw Redis client behind the default cache, or None for other backends"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+def uses_django_redis():
+    return type(caches['default']).__module__.startswith('django_redis')
+
+class LocalCache:
+    """Bounded LRU map with per-entry expiry, shared by the threads of one worker"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + min(ttl or self.ttl, self.ttl)
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'max_size': self.max_size,
+        }
+
+local_cache = LocalCache(settings.URL_LOCAL_CACHE['MAX_SIZE'], settings.URL_LOCAL_CACHE['TTL'])
+
+class InvalidationListener:
+    """Evicts local entries when any worker publishes an invalidated short code"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.started = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+            if get_redis() is None:
+                # Local cache or dummy backends have no other workers to hear from
+                return
+            self.thread = threading.Thread(target=self.run, name='url-invalidation', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    local_cache.delete(message['data'].decode())
+            except Exception:
+                logger.exception('URL invalidation listener disconnected')
+            # Messages may have been missed while disconnected
+            local_cache.clear()
+            time.sleep(1)
+
+    def publish(self, *short_codes):
+        redis = get_redis()
+        if redis is not None:
+            with redis.pipeline(transaction=False) as pipe:
+                for short_code in short_codes:
+                    pipe.publish(self.channel, short_code)
+                pipe.execute()
+
+invalidation_listener = InvalidationListener(settings.URL_LOCAL_CACHE['INVALIDATION_CHANNEL'])
+
+def local_cache_enabled():
+    if not settings.URL_LOCAL_CACHE['ENABLED']:
+        return False
+    if not invalidation_listener.started:
+        invalidation_listener.start()
+    return True
+
+class AsyncCacheClient:
+    """
+    Non-blocking access to the shared cache for async views.
+
+    With django_redis this talks to Redis through redis.asyncio, using
+    django_redis' own key and value encoding so both clients share entries.
+    Other backends go through Django's async cache API.
+    """
+
+    def __init__(self):
+        # redis.asyncio connections belong to the event loop that opened them
+        self.clients = weakref.WeakKeyDictionary()
+
+    def redis(self):
+        if not uses_django_redis():
+            return None
+        loop = asyncio.get_running_loop()
+        client = self.clients.get(loop)
+        if client is None:
+            from redis.asyncio import Redis
+            location = settings.CACHES['default']['LOCATION']
+            if not isinstance(location, str):
+                location = location[0]
+            client = self.clients[loop] = Redis.from_url(location)
+        return client
+
+    async def get(self, key):
+        redis = self.redis()
+        if redis is None:
+            return await cache.aget(key)
+        value = await redis.get(cache.client.make_key(key))
+        return None if value is None else cache.client.decode(value)
+
+    async def set(self, key, value, timeout):
+        redis = self.redis()
+        if redis is None:
+            await cache.aset(key, value, timeout=timeout)
+            return
+        await redis.set(cache.client.make_key(key), cache.client.encode(value), ex=timeout)
+
+    async def add(self, key, value, timeout):
+        redis = self.redis()
+        if redis is None:
+            return await cache.aadd(key, value, timeout=timeout)
+        return bool(await redis.set(cache.client.make_key(key), cache.client.encode(value), ex=timeout, nx=True))
+
+    async def delete(self, key):
+        redis = self.redis()
+        if redis is None:
+            await cache.adelete(key)
+            return
+        await redis.delete(cache.client.make_key(key))
+
+async_cache = AsyncCacheClient()
+
+class SingleFlight:
+    """
+    Runs one call per key at a time within this process; threads asking
+    for a key that is already being loaded wait for that call and share
+    its result instead of running their own query.
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, function):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = self.Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent tasks on one event loop await a shared future"""
+
+    def __init__(self):
+        self.calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, function):
+        loop = asyncio.get_running_loop()
+        calls = self.calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = calls[key] = loop.create_future()
+        try:
+            result = await function()
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception retrieved when no follower was waiting
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled; followers are cancelled with it
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del calls[key]
+        return result
+
+url_loads = SingleFlight()
+async_url_loads = AsyncSingleFlight()
+
+def url_cache_key(short_code):
+    return f'url_{short_code}'
+
+def lease_key(short_code):
+    return f'url_lease_{short_code}'
+
+def jittered(ttl):
+    """Shorten ttl by up to URL_CACHE_TTL_JITTER of itself so entries written together expire apart"""
+    return ttl * (1 - settings.URL_CACHE_TTL_JITTER * random.random())
+
+def url_entry(url_id, original_url):
+    """
+    Shared cache value for a link: (id, original_url, fresh_until). Entries
+    are fresh for a jittered URL_CACHE_TTL and kept URL_CACHE_STALE_TTL
+    longer, during which they are still served while one request refreshes them.
+    """
+    return (url_id, original_url, time.time() + jittered(settings.URL_CACHE_TTL))
+
+def entry_timeout(entry):
+    return int(entry[2] - time.time()) + settings.URL_CACHE_STALE_TTL
+
+def split_entry(entry):
+    """Return (value, stale) for a shared cache entry; value is (id, original_url), NOT_FOUND or None"""
+    if entry is None or entry == NOT_FOUND:
+        return entry, False
+    if len(entry) == 2:
+        # Written before entries carried a freshness time
+        return tuple(entry), False
+    return tuple(entry[:2]), entry[2] < time.time()
+
+def get_cached_url(short_code):
+    return split_entry(cache.get(url_cache_key(short_code)))[0]
+
+def cache_url(short_code, url_id, original_url):
+    entry = url_entry(url_id, original_url)
+    cache.set(url_cache_key(short_code), entry, timeout=entry_timeout(entry))
+    if local_cache_enabled():
+        local_cache.set(short_code, (url_id, original_url))
+
+def cache_missing(short_code):
+    cache.set(url_cache_key(short_code), NOT_FOUND, timeout=settings.URL_NEGATIVE_CACHE_TTL)
+    if local_cache_enabled():
+        local_cache.set(short_code, NOT_FOUND, ttl=settings.URL_NEGATIVE_CACHE_TTL)
+
+def _evict(short_code):
+    cache.delete(url_cache_key(short_code))
+    local_cache.delete(short_code)
+    invalidation_listener.publish(short_code)
+
+def invalidate_url(short_code):
+    """Drop the cached entry now and again once the surrounding transaction commits"""
+    _evict(short_code)
+    transaction.on_commit(lambda: _evict(short_code))
+
+def invalidate_urls(short_codes):
+    """Bulk variant of invalidate_url for writes that bypass model signals"""
+    if not short_codes:
+        return
+    cache.delete_many([url_cache_key(short_code) for short_code in short_codes])
+    for short_code in short_codes:
+        local_cache.delete(short_code)
+    invalidation_listener.publish(*short_codes)
+
+def resolve_short_code(short_code):
+    """
+    Return (id, original_url) for a short code, or None if it does not exist.
+
+    Reads go local cache, shared cache, database. On a local cache miss,
+    codes the short code filter has never seen are rejected before the
+    shared cache is asked. Database loads are
+    coalesced: one per short code within a worker (single-flight) and,
+    through a lease in the shared cache, one across workers; the others
+    wait up to URL_CACHE_LEASE_WAIT for its result or keep serving the
+    stale entry while it is refreshed.
+    """
+    if len(short_code) > SHORT_CODE_MAX_LENGTH:
+        return None
+
+    use_local = local_cache_enabled()
+    cached = local_cache.get(short_code) if use_local else None
+    if cached is None:
+        # Local hits skip the filter, which may cost a Redis round trip
+        if not short_codes.might_contain(short_code):
+            return None
+        cached, stale = split_entry(cache.get(url_cache_key(short_code)))
+        if stale and cache.add(lease_key(short_code), 1, timeout=settings.URL_CACHE_LEASE_TTL):
+            metrics.record_cache(False)
+            return url_loads.do(short_code, lambda: load_with_lease(short_code))
+        if cached is not None and use_local and not stale:
+            local_cache.set(short_code, cached)
+    metrics.record_cache(cached is not None)
+    if cached == NOT_FOUND:
+        return None
+    if cached is not None:
+        return cached
+
+    return url_loads.do(short_code, lambda: fetch_url(short_code))
+
+def fetch_url(short_code):
+    """Load a short code missing from the cache, unless another worker already is"""
+    if cache.add(lease_key(short_code), 1, timeout=settings.URL_CACHE_LEASE_TTL):
+        return load_with_lease(short_code)
+    deadline = time.monotonic() + settings.URL_CACHE_LEASE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LEASE_POLL_INTERVAL)
+        cached = get_cached_url(short_code)
+        if cached is not None:
+            return None if cached == NOT_FOUND else cached
+    # The lease holder is slow or gone; query without it
+    return load_url(short_code)
+
+def load_with_lease(short_code):
+    try:
+        return load_url(short_code)
+    finally:
+        cache.delete(lease_key(short_code))
+
+def load_url(short_code):
+    """Read a short code from the database and cache the outcome either way"""
+    row = replica_first(
+        ShortenedURL.objects.filter(short_code=short_code).values_list('id', 'original_url'), f'url:{short_code}'
+    )
+    if row is None:
+        cache_missing(short_code)
+        return None
+
+    cache_url(short_code, *row)
+    return row
+
+async def aresolve_short_code(short_code):
+    """Async resolve_short_code using the async cache client and the async ORM"""
+    if len(short_code) > SHORT_CODE_MAX_LENGTH:
+        return None
+
+    use_local = local_cache_enabled()
+    cached = local_cache.get(short_code) if use_local else None
+    if cached is None:
+        if not await short_codes.amight_contain(short_code):
+            return None
+        cached, stale = split_entry(await async_cache.get(url_cache_key(short_code)))
+        if stale and await async_cache.add(lease_key(short_code), 1, settings.URL_CACHE_LEASE_TTL):
+            metrics.record_cache(False)
+            return await async_url_loads.do(short_code, lambda: aload_with_lease(short_code, use_local))
+        if cached is not None and use_local and not stale:
+            local_cache.set(short_code, cached)
+    metrics.record_cache(cached is not None)
+    if cached == NOT_FOUND:
+        return None
+    if cached is not None:
+        return cached
+
+    return await async_url_loads.do(short_code, lambda: afetch_url(short_code, use_local))
+
+async def afetch_url(short_code, use_local):
+    if await async_cache.add(lease_key(short_code), 1, settings.URL_CACHE_LEASE_TTL):
+        return await aload_with_lease(short_code, use_local)
+    deadline = time.monotonic() + settings.URL_CACHE_LEASE_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LEASE_POLL_INTERVAL)
+        cached, _ = split_entry(await async_cache.get(url_cache_key(short_code)))
+        if cached is not None:
+            return None if cached == NOT_FOUND else cached
+    return await aload_url(short_code, use_local)
+
+async def aload_with_lease(short_code, use_local):
+    try:
+        return await aload_url(short_code, use_local)
+    finally:
+        await async_cache.delete(lease_key(short_code))
+
+async def aload_url(short_code, use_local):
+    row = await areplica_first(
+        ShortenedURL.objects.filter(short_code=short_code).values_list('id', 'original_url'), f'url:{short_code}'
+    )
+    if row is None:
+        await async_cache.set(url_cache_key(short_code), NOT_FOUND, settings.URL_NEGATIVE_CACHE_TTL)
+        if use_local:
+            local_cache.set(short_code, NOT_FOUND, ttl=settings.URL_NEGATIVE_CACHE_TTL)
+        return None
+
+    entry = url_entry(*row)
+    await async_cache.set(url_cache_key(short_code), entry, entry_timeout(entry))
+    if use_local:
+        local_cache.set(short_code, row)
+    return row
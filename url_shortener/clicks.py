@@ -0,0 +1,252 @@
+import atexit
+import json
+import logging
+import threading
+from collections import deque, namedtuple
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import ShortenedURL, URLAccess
+from .rollups import record_clicks
+from .agents import intern_user_agents
+from .counters import counters
+
+logger = logging.getLogger(__name__)
+
+# counted: access_count and last_accessed were already bumped in the click counters
+ClickEvent = namedtuple(
+    'ClickEvent', ['url_id', 'accessed_at', 'ip_address', 'user_agent', 'counted'], defaults=[False]
+)
+
+def write_clicks(events):
+    """Insert access logs in bulk and apply access counters in aggregate"""
+    if not events:
+        return
+
+    totals = {}
+    for event in events:
+        if event.counted:
+            continue
+        count, last = totals.get(event.url_id, (0, event.accessed_at))
+        totals[event.url_id] = (count + 1, max(last, event.accessed_at))
+
+    with transaction.atomic():
+        # Links deleted since the click was recorded are skipped
+        existing = dict(
+            ShortenedURL.objects.filter(pk__in={event.url_id for event in events}).values_list('pk', 'account_id')
+        )
+        agent_ids = intern_user_agents(event.user_agent for event in events if event.url_id in existing)
+        URLAccess.objects.bulk_create([
+            URLAccess(
+                url_id=event.url_id,
+                account_id=existing[event.url_id],
+                accessed_at=event.accessed_at,
+                ip_address=event.ip_address,
+                agent_id=agent_ids.get(event.user_agent)
+            )
+            for event in events if event.url_id in existing
+        ], batch_size=settings.CLICK_LOG['FLUSH_SIZE'])
+        record_clicks((event.url_id, event.accessed_at) for event in events if event.url_id in existing)
+
+        for url_id in existing.keys() & totals.keys():
+            count, last = totals[url_id]
+            ShortenedURL.objects.filter(pk=url_id).update(
+                access_count=F('access_count') + count,
+                last_accessed=Greatest(Coalesce('last_accessed', last), last)
+            )
+
+class MemoryClickQueue:
+    """Per-process queue; the oldest events are dropped once max_size is reached"""
+    blocking = False
+
+    def __init__(self, max_size):
+        self.events = deque(maxlen=max_size)
+
+    def push(self, event):
+        """Queue an event; returns the queue length"""
+        self.events.append(event)
+        return len(self.events)
+
+    def push_back(self, batch):
+        """
+        Return a popped batch to the front of the queue, oldest first. Its
+        events are the oldest queued, so they are the ones dropped when the
+        queue has no room for all of them.
+        """
+        room = self.events.maxlen - len(self.events)
+        kept = batch[len(batch) - room:] if room < len(batch) else batch
+        if len(kept) < len(batch):
+            logger.warning('Click queue full, dropped %d requeued events', len(batch) - len(kept))
+        self.events.extendleft(reversed(kept))
+
+    def dead_letter(self, batch):
+        logger.error('Dropped %d click events that could not be written', len(batch))
+
+    def pop_many(self, count):
+        batch = []
+        while len(batch) < count:
+            try:
+                batch.append(self.events.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def __len__(self):
+        return len(self.events)
+
+class RedisClickQueue:
+    """Queue shared by all workers through a Redis list"""
+    blocking = True
+
+    def __init__(self, redis, key):
+        self.redis = redis
+        self.key = key
+        self.dead_key = f'{key}:dead'
+
+    def encode(self, event):
+        return json.dumps([
+            event.url_id,
+            event.accessed_at.isoformat(),
+            event.ip_address,
+            event.user_agent,
+            event.counted,
+        ])
+
+    def push(self, event):
+        """Queue an event; returns the queue length"""
+        return self.redis.rpush(self.key, self.encode(event))
+
+    def push_back(self, batch):
+        """Return a popped batch to the front of the list, oldest first"""
+        self.redis.lpush(self.key, *[self.encode(event) for event in reversed(batch)])
+
+    def dead_letter(self, batch):
+        """Set aside a batch that could not be written, in a list next to the queue"""
+        self.redis.rpush(self.dead_key, *[self.encode(event) for event in batch])
+        logger.error('Moved %d click events that could not be written to %s', len(batch), self.dead_key)
+
+    def pop_many(self, count):
+        items = self.redis.lpop(self.key, count) or []
+        batch = []
+        for item in items:
+            # Items queued before the counted flag existed have four fields
+            url_id, accessed_at, ip_address, user_agent, *counted = json.loads(item)
+            batch.append(ClickEvent(url_id, datetime.fromisoformat(accessed_at), ip_address, user_agent, *counted))
+        return batch
+
+    def __len__(self):
+        return self.redis.llen(self.key)
+
+class ClickBuffer:
+    """Collects click events and flushes them from a background thread"""
+
+    def __init__(self, queue, flush_size=500, flush_interval=1.0, max_retries=5):
+        self.queue = queue
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        # Failed writes in a row; the batch that fails once more is dead-lettered
+        self.failures = 0
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def put(self, event):
+        length = self.queue.push(event)
+        if self.thread is None:
+            self.start()
+        if length >= self.flush_size:
+            self.wakeup.set()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='click-flusher', daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush click events')
+
+    def flush(self):
+        """Write every queued event, flush_size events per transaction"""
+        flushed = 0
+        while True:
+            batch = self.queue.pop_many(self.flush_size)
+            if not batch:
+                return flushed
+            try:
+                write_clicks(batch)
+            except Exception:
+                self.failures += 1
+                if self.failures <= self.max_retries:
+                    # Keep the events for the next flush instead of dropping them
+                    self.queue.push_back(batch)
+                    raise
+                # Give up on this batch so it does not block the events behind it
+                logger.exception('Failed to write click events %d times in a row', self.failures)
+                self.failures = 0
+                self.queue.dead_letter(batch)
+                continue
+            self.failures = 0
+            flushed += len(batch)
+
+    def stop(self, timeout=5.0):
+        """Stop the flusher thread and drain what is left"""
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.flush()
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def get_click_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = settings.CLICK_LOG
+                if config['QUEUE'] == 'redis':
+                    from django_redis import get_redis_connection
+                    queue = RedisClickQueue(get_redis_connection('default'), config['REDIS_KEY'])
+                else:
+                    queue = MemoryClickQueue(config['MAX_QUEUE_SIZE'])
+                _buffer = ClickBuffer(queue, config['FLUSH_SIZE'], config['FLUSH_INTERVAL'], config['MAX_RETRIES'])
+    return _buffer
+
+def log_click(url_id, ip_address, user_agent):
+    """Record a redirect without writing to the database on the request path"""
+    accessed_at = timezone.now()
+    event = ClickEvent(url_id, accessed_at, ip_address, user_agent, counters.record(url_id, accessed_at))
+    if not settings.CLICK_LOG['ASYNC']:
+        write_clicks([event])
+        return
+    get_click_buffer().put(event)
+
+async def alog_click(url_id, ip_address, user_agent):
+    """log_click for async views; only awaits when the queue itself does I/O"""
+    accessed_at = timezone.now()
+    event = ClickEvent(url_id, accessed_at, ip_address, user_agent, await counters.arecord(url_id, accessed_at))
+    if not settings.CLICK_LOG['ASYNC']:
+        await sync_to_async(write_clicks)([event])
+        return
+    buffer = get_click_buffer()
+    if buffer.queue.blocking:
+        await sync_to_async(buffer.put, thread_sensitive=False)(event)
+    else:
+        buffer.put(event)
@@ -0,0 +1,160 @@
+import os
+import random
+import string
+import threading
+import time
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from .models import Sequence
+
+ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
+BASE = len(ALPHABET)
+
+def base62_encode(number, length=1):
+    """Encode a non-negative integer, left padded to at least `length` characters"""
+    chars = []
+    while number:
+        number, remainder = divmod(number, BASE)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars)).rjust(length, ALPHABET[0])
+
+def base62_decode(code):
+    number = 0
+    for char in code:
+        number = number * BASE + ALPHABET.index(char)
+    return number
+
+class RandomCodeGenerator:
+    """The original strategy: random characters, relying on retries for collisions"""
+
+    def __init__(self, length=6, **kwargs):
+        self.length = length
+
+    def generate(self):
+        return ''.join(random.choices(ALPHABET, k=self.length))
+
+class BlockCodeGenerator:
+    """
+    Encodes ids from a block reserved for this worker with a single UPDATE.
+
+    Ids are spread over the code space by multiplying with a constant that is
+    coprime to 62, so consecutive links do not get guessable neighbouring
+    codes. Once the space for `length` characters is used up codes grow longer.
+    """
+    MULTIPLIER = 1580030173
+
+    def __init__(self, length=6, block_size=1000, sequence='short_code', **kwargs):
+        self.length = length
+        self.block_size = block_size
+        self.sequence = sequence
+        self.space = BASE ** length
+        self.next_id = 0
+        self.end_id = 0
+        self.lock = threading.Lock()
+
+    def reserve_block(self):
+        with transaction.atomic():
+            updated = Sequence.objects.filter(name=self.sequence).update(
+                next_value=F('next_value') + self.block_size
+            )
+            if not updated:
+                Sequence.objects.get_or_create(name=self.sequence)
+                return self.reserve_block()
+            end = Sequence.objects.get(name=self.sequence).next_value
+        return end - self.block_size, end
+
+    def allocate_id(self):
+        with self.lock:
+            if self.next_id >= self.end_id:
+                self.next_id, self.end_id = self.reserve_block()
+            allocated = self.next_id
+            self.next_id += 1
+            return allocated
+
+    def generate(self):
+        number = self.allocate_id()
+        if number < self.space:
+            return base62_encode(number * self.MULTIPLIER % self.space, self.length)
+        return base62_encode(number, self.length + 1)
+
+class SnowflakeCodeGenerator:
+    """
+    Time ordered ids built from seconds since EPOCH, a worker id and a
+    per-second sequence. Needs no database access, but codes are 9-10
+    characters long and worker ids must be unique across processes.
+    """
+    EPOCH = 1704067200  # 2024-01-01 UTC
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+
+    def __init__(self, worker_id=None, **kwargs):
+        if worker_id is None:
+            worker_id = os.getpid()
+        self.worker_id = worker_id % (1 << self.WORKER_BITS)
+        self.last_second = -1
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def next_value(self):
+        with self.lock:
+            second = int(time.time()) - self.EPOCH
+            if second == self.last_second:
+                self.counter += 1
+                if self.counter >> self.SEQUENCE_BITS:
+                    # Sequence exhausted for this second
+                    while second <= self.last_second:
+                        time.sleep(0.001)
+                        second = int(time.time()) - self.EPOCH
+                    self.counter = 0
+            else:
+                self.counter = 0
+            self.last_second = second
+            return (
+                (second << (self.WORKER_BITS + self.SEQUENCE_BITS))
+                | (self.worker_id << self.SEQUENCE_BITS)
+                | self.counter
+            )
+
+    def generate(self):
+        return base62_encode(self.next_value())
+
+_generator = None
+_generator_lock = threading.Lock()
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                config = settings.SHORT_CODES
+                generator_class = import_string(config['GENERATOR'])
+                _generator = generator_class(
+                    length=config['LENGTH'],
+                    block_size=config['BLOCK_SIZE'],
+                    worker_id=config['WORKER_ID'],
+                )
+    return _generator
+
+def generate_short_code():
+    return get_generator().generate()
+
+def save_with_short_code(save, **kwargs):
+    """
+    Call save(short_code=..., **kwargs) with a freshly generated code.
+
+    The unique constraint on short_code is the only collision check; a
+    clash rolls back to a savepoint and is retried with the next code.
+    """
+    attempts = settings.SHORT_CODES['MAX_ATTEMPTS']
+    for attempt in range(attempts):
+        # Outside the savepoint: a rollback must not undo a block reservation
+        # while this worker keeps handing out ids from it
+        short_code = generate_short_code()
+        try:
+            with transaction.atomic():
+                return save(short_code=short_code, **kwargs)
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
@@ -0,0 +1,317 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from .models import Sequence, ShortenedURL
+
+logger = logging.getLogger(__name__)
+
+# Sequence row holding the next write-back batch number not applied yet
+FLUSH_SEQUENCE = 'click_counter_flush'
+
+def _timestamp(moment):
+    return moment.timestamp()
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc)
+
+# Adds ARGV[3i-1] clicks to url id ARGV[3i-2] and keeps the latest click time ARGV[3i]
+INCR_SCRIPT = """
+for i = 1, #ARGV, 3 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    local last = redis.call('HGET', KEYS[2], ARGV[i])
+    if not last or tonumber(last) < tonumber(ARGV[i + 2]) then
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 2])
+    end
+end
+"""
+
+# Moves the live hashes aside under a new batch number, unless an earlier
+# batch is still there because its write-back did not finish, and returns
+# the batch to write back. ARGV[1] is the lowest batch number not applied yet.
+BEGIN_FLUSH_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[3])
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('RENAME', KEYS[2], KEYS[4])
+    end
+    local batch = math.max(tonumber(redis.call('GET', KEYS[5]) or '0') + 1, tonumber(ARGV[1]))
+    redis.call('SET', KEYS[5], batch)
+    redis.call('HSET', KEYS[3], '_batch', batch)
+end
+return {redis.call('HGETALL', KEYS[3]), redis.call('HGETALL', KEYS[4])}
+"""
+
+# Drops a written-back batch, but never one started since
+END_FLUSH_SCRIPT = """
+if redis.call('HGET', KEYS[1], '_batch') == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+"""
+
+class RedisCounterStore:
+    """
+    Click counts and last click times per url id in Redis hashes, shared by
+    all workers and kept across restarts. A write-back first renames the
+    hashes, so clicks that arrive meanwhile go to fresh ones.
+    """
+    # A batch outlives the process that began writing it back
+    persistent = True
+
+    def __init__(self, redis, key):
+        self.redis = redis
+        # The hash tag keeps every key in one cluster slot for the scripts
+        self.counts_key = f'{{{key}}}:counts'
+        self.last_key = f'{{{key}}}:last'
+        self.flushing_counts_key = f'{{{key}}}:flushing:counts'
+        self.flushing_last_key = f'{{{key}}}:flushing:last'
+        self.batch_key = f'{{{key}}}:batch'
+        self.incr_script = redis.register_script(INCR_SCRIPT)
+        self.begin_script = redis.register_script(BEGIN_FLUSH_SCRIPT)
+        self.end_script = redis.register_script(END_FLUSH_SCRIPT)
+
+    def arguments(self, clicks):
+        args = []
+        for url_id, (count, last) in clicks.items():
+            args += [url_id, count, _timestamp(last)]
+        return args
+
+    def incr(self, clicks):
+        self.incr_script(keys=[self.counts_key, self.last_key], args=self.arguments(clicks))
+
+    async def aincr(self, clicks, client):
+        script = client.register_script(INCR_SCRIPT)
+        await script(keys=[self.counts_key, self.last_key], args=self.arguments(clicks))
+
+    def pending(self, url_ids):
+        fields = [str(url_id) for url_id in url_ids]
+        with self.redis.pipeline(transaction=False) as pipe:
+            for key in [self.counts_key, self.last_key, self.flushing_counts_key, self.flushing_last_key]:
+                pipe.hmget(key, fields)
+            counts, lasts, flushing_counts, flushing_lasts = pipe.execute()
+        pending = {}
+        for url_id, *values in zip(url_ids, counts, lasts, flushing_counts, flushing_lasts):
+            count = int(values[0] or 0) + int(values[2] or 0)
+            if count:
+                pending[url_id] = (count, _datetime(max(float(values[1] or 0), float(values[3] or 0))))
+        return pending
+
+    def begin_flush(self, next_batch):
+        counts, lasts = self.begin_script(
+            keys=[self.counts_key, self.last_key, self.flushing_counts_key, self.flushing_last_key, self.batch_key],
+            args=[next_batch]
+        )
+        counts = dict(zip(counts[::2], counts[1::2]))
+        batch = counts.pop(b'_batch', None)
+        if batch is None:
+            return None, {}
+        lasts = dict(zip(lasts[::2], lasts[1::2]))
+        return int(batch), {
+            int(url_id): (int(count), _datetime(lasts[url_id])) for url_id, count in counts.items()
+        }
+
+    def end_flush(self, batch):
+        self.end_script(keys=[self.flushing_counts_key, self.flushing_last_key], args=[batch])
+
+class MemoryCounterStore:
+    """The same counters for a single process; counts not written back are lost if it is killed"""
+    persistent = False
+
+    def __init__(self):
+        self.live = {}
+        self.flushing = {}
+        self.batch = None
+        self.last_batch = 0
+        self.lock = threading.Lock()
+
+    def incr(self, clicks):
+        with self.lock:
+            for url_id, (count, last) in clicks.items():
+                current, previous = self.live.get(url_id, (0, last))
+                self.live[url_id] = (current + count, max(previous, last))
+
+    async def aincr(self, clicks, client=None):
+        self.incr(clicks)
+
+    def pending(self, url_ids):
+        pending = {}
+        with self.lock:
+            for url_id in url_ids:
+                entries = [store[url_id] for store in (self.live, self.flushing) if url_id in store]
+                if entries:
+                    pending[url_id] = (sum(count for count, _ in entries), max(last for _, last in entries))
+        return pending
+
+    def begin_flush(self, next_batch):
+        with self.lock:
+            if self.batch is None and self.live:
+                self.flushing, self.live = self.live, {}
+                self.batch = self.last_batch = self.last_batch + 1
+            return self.batch, dict(self.flushing)
+
+    def end_flush(self, batch):
+        with self.lock:
+            if self.batch == batch:
+                self.flushing, self.batch = {}, None
+
+    def clear(self):
+        with self.lock:
+            self.live, self.flushing, self.batch = {}, {}, None
+
+def write_back(clicks, batch_size=500):
+    """Add click counts and last click times to ShortenedURL rows with one UPDATE per batch_size links"""
+    url_ids = sorted(clicks)
+    for start in range(0, len(url_ids), batch_size):
+        chunk = url_ids[start:start + batch_size]
+        counts = Case(
+            *[When(pk=url_id, then=Value(clicks[url_id][0])) for url_id in chunk],
+            output_field=IntegerField()
+        )
+        lasts = Case(*[When(pk=url_id, then=Value(clicks[url_id][1])) for url_id in chunk])
+        ShortenedURL.objects.filter(pk__in=chunk).update(
+            access_count=F('access_count') + counts,
+            last_accessed=Greatest(Coalesce('last_accessed', lasts), lasts)
+        )
+
+class ClickCounters:
+    """
+    Live access_count and last_accessed deltas kept outside the database,
+    so hot links do not serialize on row locks.
+
+    Write-backs from Redis are exactly once: each batch is numbered, and the
+    number is recorded in the same transaction as the UPDATEs, so a batch
+    whose write-back was interrupted is retried but never applied twice.
+    Without a store (BACKEND 'database', or 'redis' without a Redis cache)
+    record() returns False and the click log writer updates the columns.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.lock = threading.Lock()
+        # One write-back at a time per process, so the thread and stop() never share a batch
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def get_store(self):
+        if self.store is None:
+            with self.lock:
+                if self.store is None:
+                    self.store = self.create_store()
+        return self.store or None
+
+    def create_store(self):
+        from .cache import get_redis
+        config = settings.CLICK_COUNTERS
+        if config['BACKEND'] == 'memory':
+            return MemoryCounterStore()
+        redis = get_redis() if config['BACKEND'] == 'redis' else None
+        # False: looked up and there is none
+        return RedisCounterStore(redis, config['REDIS_KEY']) if redis is not None else False
+
+    def reset(self):
+        with self.lock:
+            self.store = None
+
+    def record(self, url_id, accessed_at):
+        """Count one click; returns False when the caller has to update the database itself"""
+        store = self.get_store()
+        if store is None:
+            return False
+        try:
+            store.incr({url_id: (1, accessed_at)})
+        except Exception:
+            logger.warning('Click counter store unavailable, counting in the database', exc_info=True)
+            return False
+        self.start()
+        return True
+
+    async def arecord(self, url_id, accessed_at):
+        from .cache import async_cache
+        store = self.get_store()
+        if store is None:
+            return False
+        try:
+            await store.aincr({url_id: (1, accessed_at)}, async_cache.redis())
+        except Exception:
+            logger.warning('Click counter store unavailable, counting in the database', exc_info=True)
+            return False
+        self.start()
+        return True
+
+    def pending(self, url_ids):
+        """url id -> (clicks, last click time) not written back yet"""
+        store = self.get_store()
+        if store is None or not url_ids:
+            return {}
+        try:
+            return store.pending(list(url_ids))
+        except Exception:
+            logger.warning('Click counter store unavailable, reading written-back counts', exc_info=True)
+            return {}
+
+    def flush(self):
+        """Write back pending counts; returns the number of links updated"""
+        store = self.get_store()
+        if store is None:
+            return 0
+        batch_size = settings.CLICK_COUNTERS['FLUSH_BATCH_SIZE']
+        updated = 0
+        with self.flush_lock:
+            while True:
+                next_batch = 1
+                if store.persistent:
+                    next_batch = Sequence.objects.get_or_create(name=FLUSH_SEQUENCE)[0].next_value
+                batch, clicks = store.begin_flush(next_batch)
+                if batch is None:
+                    return updated
+                with transaction.atomic():
+                    # Zero rows when an interrupted write-back of this batch did commit
+                    if not store.persistent or Sequence.objects.filter(
+                        name=FLUSH_SEQUENCE, next_value__lte=batch
+                    ).update(next_value=batch + 1):
+                        write_back(clicks, batch_size)
+                        updated += len(clicks)
+                store.end_flush(batch)
+
+    def start(self):
+        """Write back every FLUSH_INTERVAL seconds from a daemon thread, and once more at exit"""
+        if self.thread is not None or settings.CLICK_COUNTERS['FLUSH_INTERVAL'] is None:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='click-counter-flusher', daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def run(self):
+        while not self.stopping.wait(settings.CLICK_COUNTERS['FLUSH_INTERVAL']):
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write back click counters')
+
+    def stop(self):
+        self.stopping.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Failed to write back click counters')
+
+counters = ClickCounters()
+
+def add_pending(urls):
+    """Add the clicks not written back yet to access_count and last_accessed of ShortenedURLs, in place"""
+    pending = counters.pending([url.pk for url in urls])
+    for url in urls:
+        if url.pk in pending:
+            count, last = pending[url.pk]
+            url.access_count += count
+            url.last_accessed = last if url.last_accessed is None else max(url.last_accessed, last)
+    return urls
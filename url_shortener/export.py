@@ -0,0 +1,82 @@
+import csv
+import itertools
+import json
+from django.utils.text import compress_sequence
+from .models import ShortenedURL, URLAccess
+
+# (header, values_list lookup) pairs for each export
+LINK_COLUMNS = [
+    ('short_code', 'short_code'),
+    ('original_url', 'original_url'),
+    ('created_at', 'created_at'),
+    ('last_accessed', 'last_accessed'),
+    ('access_count', 'access_count'),
+]
+CLICK_COLUMNS = [
+    ('short_code', 'url__short_code'),
+    ('accessed_at', 'accessed_at'),
+    ('ip_address', 'ip_address'),
+    ('user_agent', 'agent__user_agent'),
+    ('browser', 'agent__browser'),
+    ('os', 'agent__os'),
+    ('device', 'agent__device'),
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+def link_rows(account, start=None, end=None):
+    rows = ShortenedURL.objects.filter(account=account)
+    if start:
+        rows = rows.filter(created_at__gte=start)
+    if end:
+        rows = rows.filter(created_at__lt=end)
+    return rows.order_by('id').values_list(*[lookup for _, lookup in LINK_COLUMNS])
+
+def click_rows(account, start=None, end=None):
+    rows = URLAccess.objects.filter(account=account)
+    if start:
+        rows = rows.filter(accessed_at__gte=start)
+    if end:
+        rows = rows.filter(accessed_at__lt=end)
+    return rows.order_by('id').values_list(*[lookup for _, lookup in CLICK_COLUMNS])
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+def _chunks(lines, rows_per_chunk):
+    # One yield per row makes tiny writes and gzip members; batch them instead
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode()
+
+def stream(columns, rows, format='csv', chunk_size=2000, compress=False):
+    """
+    Encode rows from a values_list queryset as CSV or NDJSON, reading them
+    with .iterator() so memory use does not grow with the number of rows.
+    """
+    names = [name for name, _ in columns]
+    rows = rows.iterator(chunk_size=chunk_size)
+    if format == 'csv':
+        writer = csv.writer(_Echo())
+        lines = itertools.chain(
+            [writer.writerow(names)],
+            (writer.writerow([_value(value) for value in row]) for row in rows)
+        )
+    else:
+        lines = (json.dumps(dict(zip(names, map(_value, row)))) + '\n' for row in rows)
+    chunks = _chunks(lines, chunk_size)
+    return compress_sequence(chunks) if compress else chunks
@@ -0,0 +1,38 @@
+import ipaddress
+from django.db import models
+
+class PackedIPAddressField(models.BinaryField):
+    """
+    IPv4 or IPv6 address stored as its 4 or 16 packed bytes instead of text.
+    Values are read and written in the usual string form; strings that are
+    not valid addresses are stored as NULL.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', 16)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('max_length') == 16:
+            del kwargs['max_length']
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return str(ipaddress.ip_address(bytes(value)))
+
+    def get_prep_value(self, value):
+        if isinstance(value, str):
+            try:
+                value = ipaddress.ip_address(value).packed
+            except ValueError:
+                value = None
+        return super().get_prep_value(value)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from url_shortener.models import URLAccess
+from url_shortener.rollups import rebuild, start_of_day
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the hourly and daily click rollups from the URLAccess log, one UTC day '
+        'per transaction. Days that already have rollups are recomputed from scratch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=datetime.fromisoformat,
+                            help='First day to rebuild (YYYY-MM-DD); defaults to the oldest click')
+        parser.add_argument('--until', type=datetime.fromisoformat,
+                            help='Day to stop before (YYYY-MM-DD); defaults to tomorrow')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if since is None:
+            oldest = URLAccess.objects.aggregate(oldest=Min('accessed_at'))['oldest']
+            if oldest is None:
+                self.stdout.write('No clicks to backfill')
+                return
+            since = oldest
+        until = options['until'] or timezone.now() + timedelta(days=1)
+
+        day = since.date()
+        last_day = until.date()
+        if day >= last_day:
+            raise CommandError('--since must be before --until')
+
+        total = 0
+        while day < last_day:
+            start = start_of_day(day)
+            with transaction.atomic():
+                written = rebuild(start, start + timedelta(days=1), options['batch_size'])
+            total += written
+            self.stdout.write(f'{day}: {written} hourly buckets')
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} hourly buckets'))
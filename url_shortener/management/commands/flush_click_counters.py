@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from url_shortener.counters import MemoryCounterStore, counters
+
+class Command(BaseCommand):
+    help = (
+        'Write the click counts and last click times held in the click counters back to '
+        'the links, e.g. from cron when FLUSH_INTERVAL is None or before a deploy.'
+    )
+
+    def handle(self, *args, **options):
+        if counters.get_store() is None:
+            self.stdout.write(self.style.WARNING('Click counters are kept in the database; nothing to write back'))
+            return
+        if isinstance(counters.get_store(), MemoryCounterStore):
+            self.stdout.write(self.style.WARNING('The memory backend lives in each worker; only this process was affected'))
+        updated = counters.flush()
+        self.stdout.write(self.style.SUCCESS(f'Wrote back clicks of {updated} links'))
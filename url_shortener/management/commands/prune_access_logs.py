@@ -0,0 +1,57 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from url_shortener import retention
+
+class Command(BaseCommand):
+    help = (
+        'Delete URLAccess rows older than the retention period in small id-range batches, '
+        'optionally archiving them to gzip files partitioned by day. On PostgreSQL with a '
+        'monthly partitioned URLAccess table, whole expired partitions are dropped instead.'
+    )
+
+    def add_arguments(self, parser):
+        config = settings.ACCESS_LOG_RETENTION
+        parser.add_argument('--days', type=int, default=config['DAYS'],
+                            help='Keep this many days of access logs')
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'],
+                            help='Ids per delete transaction')
+        parser.add_argument('--archive-dir', default=config['ARCHIVE_DIR'],
+                            help='Write removed rows here before deleting them')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default=config['FORMAT'])
+        parser.add_argument('--pause', type=float, default=config['PAUSE'],
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--create-partitions', type=int, default=0, metavar='MONTHS',
+                            help='PostgreSQL only: create partitions for this many months ahead')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archive = None
+        if options['archive_dir']:
+            archive = retention.Archive(options['archive_dir'], options['format'])
+
+        try:
+            if retention.is_partitioned():
+                self.prune_partitions(cutoff, archive, options)
+            elif options['create_partitions']:
+                raise CommandError('--create-partitions needs a partitioned PostgreSQL table')
+            total = 0
+            for deleted in retention.prune(cutoff, options['batch_size'], archive, options['pause']):
+                total += deleted
+                self.stdout.write(f'Removed {deleted} rows', ending='\r')
+        finally:
+            if archive is not None:
+                archive.close()
+        self.stdout.write(self.style.SUCCESS(f'Removed {total} access logs older than {cutoff:%Y-%m-%d %H:%M}'))
+
+    def prune_partitions(self, cutoff, archive, options):
+        if options['create_partitions']:
+            retention.create_partitions(timezone.now(), options['create_partitions'])
+        for name, start, end in retention.expired_partitions(cutoff):
+            if archive is not None:
+                retention.archive_range(archive, start, end, options['batch_size'])
+            retention.drop_partition(name)
+            self.stdout.write(f'Dropped partition {name} ({start:%Y-%m})')
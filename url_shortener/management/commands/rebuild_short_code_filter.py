@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache
+from url_shortener.bloom import BUILD_LOCK_KEY, short_codes
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the short code filter from the database, dropping codes of deleted links, '
+        'and report its size, fill and false positive rate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SHORT_CODE_FILTER['BATCH_SIZE'])
+        parser.add_argument('--stats', action='store_true', help='Only report on the current filter')
+
+    def handle(self, *args, **options):
+        if short_codes.get_backend() is None:
+            raise CommandError("SHORT_CODE_FILTER['BACKEND'] is 'redis' but the default cache is not django_redis")
+        if not options['stats']:
+            if not cache.add(BUILD_LOCK_KEY, 1, timeout=settings.SHORT_CODE_FILTER['BUILD_LOCK_TTL']):
+                raise CommandError('The filter is already being built')
+            try:
+                added = short_codes.rebuild(options['batch_size'])
+            finally:
+                cache.delete(BUILD_LOCK_KEY)
+            self.stdout.write(self.style.SUCCESS(f'Added {added} short codes to the filter'))
+        stats = short_codes.stats()
+        if stats['backend'] == 'memory':
+            self.stdout.write(self.style.WARNING('The memory backend lives in each worker; only this process was affected'))
+        for name, value in stats.items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from url_shortener.warmup import SOURCES, warm
+
+class Command(BaseCommand):
+    help = (
+        'Preload the most clicked short codes into the URL cache, e.g. right after a deploy '
+        'or a cache flush, so the first requests do not all hit the database.'
+    )
+
+    def add_arguments(self, parser):
+        config = settings.URL_CACHE_WARMUP
+        parser.add_argument('--limit', type=int, default=config['LIMIT'], help='Number of short codes to load')
+        parser.add_argument('--source', choices=SOURCES, default=config['SOURCE'],
+                            help='How to rank links: lifetime clicks, most recent click or recent rollups')
+        parser.add_argument('--days', type=int, default=config['DAYS'],
+                            help='Days of rollups to rank by with --source rollups')
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'])
+
+    def handle(self, *args, **options):
+        loaded = warm(options['limit'], options['source'], options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Loaded {loaded} short codes into the cache'))
@@ -0,0 +1,159 @@
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+# Upper bounds in seconds for the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = ContextVar('request_metrics', default=None)
+
+def enabled():
+    return settings.METRICS['ENABLED']
+
+class RequestMetrics:
+    """Counters for the request being served, reachable from any code it calls"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, elapsed):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={elapsed * 1000:.2f}',
+        ])
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+def finish(token):
+    _current.reset(token)
+
+def set_view(name):
+    """Name the view for requests answered before URL resolution"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.view = name
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+def query_timer(execute, sql, params, many, context):
+    """connection.execute_wrapper that charges each query to the current request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+def install_query_timer(sender=None, connection=None, **kwargs):
+    """
+    Add query_timer to a database connection. Connected to connection_created,
+    so it also covers the threads sync_to_async runs ORM calls in.
+    """
+    connection = connection or connections['default']
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+class Registry:
+    """Totals per view for this worker process"""
+
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+
+    def record(self, metrics, elapsed):
+        with self.lock:
+            stats = self.views.get(metrics.view)
+            if stats is None:
+                stats = self.views[metrics.view] = ViewStats()
+            stats.requests += 1
+            stats.queries += metrics.queries
+            stats.db_time += metrics.db_time
+            stats.cache_hits += metrics.cache_hits
+            stats.cache_misses += metrics.cache_misses
+            stats.latency += elapsed
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[index] += 1
+
+    def clear(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self):
+        """Prometheus text exposition format, version 0.0.4"""
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = []
+
+            def family(name, kind, help_text, samples):
+                lines.append(f'# HELP shortenit_{name} {help_text}')
+                lines.append(f'# TYPE shortenit_{name} {kind}')
+                lines.extend(samples)
+
+            def label(view, **extra):
+                pairs = [('view', view)] + list(extra.items())
+                return ','.join(f'{key}="{escape(value)}"' for key, value in pairs)
+
+            family('requests_total', 'counter', 'Requests served per view.', [
+                f'shortenit_requests_total{{{label(view)}}} {stats.requests}' for view, stats in views
+            ])
+            family('db_queries_total', 'counter', 'Database queries run per view.', [
+                f'shortenit_db_queries_total{{{label(view)}}} {stats.queries}' for view, stats in views
+            ])
+            family('db_seconds_total', 'counter', 'Time spent in database queries per view.', [
+                f'shortenit_db_seconds_total{{{label(view)}}} {stats.db_time:.6f}' for view, stats in views
+            ])
+            family('cache_requests_total', 'counter', 'URL cache lookups per view and result.', [
+                f'shortenit_cache_requests_total{{{label(view, result=result)}}} {count}'
+                for view, stats in views
+                for result, count in [('hit', stats.cache_hits), ('miss', stats.cache_misses)]
+            ])
+            samples = []
+            for view, stats in views:
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    samples.append(f'shortenit_request_duration_seconds_bucket{{{label(view, le=str(bound))}}} {count}')
+                samples.append(
+                    f'shortenit_request_duration_seconds_bucket{{{label(view, le="+Inf")}}} {stats.requests}'
+                )
+                samples.append(f'shortenit_request_duration_seconds_sum{{{label(view)}}} {stats.latency:.6f}')
+                samples.append(f'shortenit_request_duration_seconds_count{{{label(view)}}} {stats.requests}')
+            family('request_duration_seconds', 'histogram', 'Request latency per view.', samples)
+        return '\n'.join(lines) + '\n'
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+registry = Registry()
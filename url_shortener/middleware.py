@@ -0,0 +1,178 @@
+import re
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.http import HttpResponseRedirect
+from django.urls import URLResolver, get_resolver
+from django.urls.resolvers import RoutePattern
+from .cache import resolve_short_code, aresolve_short_code
+from .clicks import log_click, alog_click
+from . import metrics
+from . import routers
+from .ratelimit import limiter, redirect_limits, throttled_response
+
+SHORT_CODE_PATH = re.compile(r'^/([^/]+)/$')
+
+def reserved_segments(patterns):
+    """First path segments claimed by routes other than the short code catch-all"""
+    reserved = set()
+    for pattern in patterns:
+        route = str(pattern.pattern) if isinstance(pattern.pattern, RoutePattern) else None
+        if route is None or route.startswith('<'):
+            continue
+        if route == '' and isinstance(pattern, URLResolver):
+            reserved |= reserved_segments(pattern.url_patterns)
+        elif route:
+            reserved.add(route.split('/')[0])
+    return reserved
+
+class RedirectFastPathMiddleware:
+    """
+    Serves GET /<short_code>/ before sessions, CSRF, auth, URL resolution and
+    DRF run, so a cache hit costs one lookup and one response object. Place
+    it first in MIDDLEWARE.
+
+    Paths claimed by other routes, other methods and unknown codes fall
+    through to the regular stack, which keeps every status code and error
+    body as before; unknown codes are negatively cached, so that second
+    lookup is cheap.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.URL_SHORTENER_SETTINGS['REDIRECT_FAST_PATH']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.reserved = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def short_code(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        match = SHORT_CODE_PATH.match(request.path_info)
+        if match is None:
+            return None
+        if self.reserved is None:
+            self.reserved = reserved_segments(get_resolver().url_patterns)
+        short_code = match.group(1)
+        return None if short_code in self.reserved else short_code
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        short_code = self.short_code(request)
+        if short_code is not None:
+            wait = limiter.hit(redirect_limits(request, short_code))
+            if wait is not None:
+                return throttled_response(wait)
+            resolved = resolve_short_code(short_code)
+            if resolved is not None:
+                url_id, original_url = resolved
+                metrics.set_view('redirect')
+                log_click(url_id, request.META.get('REMOTE_ADDR'), request.META.get('HTTP_USER_AGENT', ''))
+                return HttpResponseRedirect(original_url)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        short_code = self.short_code(request)
+        if short_code is not None:
+            wait = await limiter.ahit(redirect_limits(request, short_code))
+            if wait is not None:
+                return throttled_response(wait)
+            resolved = await aresolve_short_code(short_code)
+            if resolved is not None:
+                url_id, original_url = resolved
+                metrics.set_view('redirect')
+                await alog_click(url_id, request.META.get('REMOTE_ADDR'), request.META.get('HTTP_USER_AGENT', ''))
+                return HttpResponseRedirect(original_url)
+        return await self.get_response(request)
+
+class MetricsMiddleware:
+    """
+    Records query count, query time, URL cache hits and misses and latency
+    for each request, adds them as a Server-Timing header and totals them
+    per view for the Prometheus endpoint. Place it before the redirect fast
+    path so fast redirects are measured too.
+
+    When METRICS['ENABLED'] is off the middleware removes itself and no
+    query wrapper is installed, so there is no per-request cost.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = settings.METRICS['SERVER_TIMING']
+        connection_created.connect(metrics.install_query_timer, dispatch_uid='url_shortener.metrics')
+        # The connection of the loading thread may already be open
+        metrics.install_query_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def finish(self, request, response, current, token):
+        metrics.finish(token)
+        elapsed = current.elapsed()
+        if current.view is None:
+            match = getattr(request, 'resolver_match', None)
+            current.view = match.view_name if match else 'unresolved'
+        metrics.registry.record(current, elapsed)
+        if self.server_timing:
+            response['Server-Timing'] = current.server_timing(elapsed)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current, token = metrics.start()
+        return self.finish(request, self.get_response(request), current, token)
+
+    async def __acall__(self, request):
+        current, token = metrics.start()
+        return self.finish(request, await self.get_response(request), current, token)
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for replica reads: once a signed-in user's request
+    writes one of routers.PINNING_MODELS, that user's replica reads go to
+    the primary for REPLICA_PIN_SECONDS. Place it first so every request resets the flag.
+    Removes itself when DATABASE_REPLICAS is empty.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not routers.replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def finish(self, request, wrote):
+        user = getattr(request, 'user', None)
+        if wrote and user is not None and user.is_authenticated:
+            routers.pin(f'user:{user.pk}')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        self.finish(request, wrote)
+        return response
+
+    async def __acall__(self, request):
+        token = routers.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        self.finish(request, wrote)
+        return response
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def backfill_today(apps, schema_editor):
+    # Quotas used to be counted from ShortenedURL rows; carry over today's usage
+    ShortenedURL = apps.get_model('url_shortener', 'ShortenedURL')
+    DailyUsage = apps.get_model('url_shortener', 'DailyUsage')
+    db_alias = schema_editor.connection.alias
+    today = timezone.now().date()
+    usage = (
+        ShortenedURL.objects.using(db_alias).filter(created_at__date=today)
+        .values('account_id')
+        .annotate(count=Count('id'))
+    )
+    DailyUsage.objects.using(db_alias).bulk_create([
+        DailyUsage(account_id=row['account_id'], date=today, count=row['count'])
+        for row in usage
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0004_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='url_shortener.account')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'date'), name='unique_daily_usage')],
+            },
+        ),
+        migrations.RunPython(backfill_today, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0005_dailyusage'),
+    ]
+
+    operations = [
+        # Build the composite indexes before dropping the single column ones
+        migrations.AddIndex(
+            model_name='shortenedurl',
+            index=models.Index(fields=['account', 'created_at'], name='url_account_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlaccess',
+            index=models.Index(fields=['url', '-accessed_at'], name='access_url_accessed_idx'),
+        ),
+        migrations.AlterModelOptions(
+            name='urlaccess',
+            options={},
+        ),
+        migrations.AlterField(
+            model_name='shortenedurl',
+            name='account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='urls', to='url_shortener.account'),
+        ),
+        migrations.AlterField(
+            model_name='urlaccess',
+            name='url',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='access_logs', to='url_shortener.shortenedurl'),
+        ),
+    ]
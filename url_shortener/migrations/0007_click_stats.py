@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0006_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClickStatDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('url', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='url_shortener.shortenedurl')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('url', 'date'), name='unique_click_stat_date')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClickStatHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('url', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='hourly_stats', to='url_shortener.shortenedurl')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('url', 'hour'), name='unique_click_stat_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# url_shortener.normalize as of this migration, frozen so later changes to
+# normalization do not change what the backfill computes
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    url = url.strip()
+    if not url.lower().startswith(('http://', 'https://')):
+        url = f'https://{url}'
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    netloc = f'[{host}]' if ':' in host else host
+    if parts.username:
+        credentials = parts.username + (f':{parts.password}' if parts.password else '')
+        netloc = f'{credentials}@{netloc}'
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{port}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def url_hash(url):
+    return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+
+def backfill_url_hash(apps, schema_editor):
+    ShortenedURL = apps.get_model('url_shortener', 'ShortenedURL')
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        batch = list(
+            ShortenedURL.objects.using(db_alias).filter(id__gt=last_id).order_by('id').only('id', 'original_url')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for shortened in batch:
+            shortened.url_hash = url_hash(shortened.original_url)
+        ShortenedURL.objects.using(db_alias).bulk_update(batch, ['url_hash'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0007_click_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shortenedurl',
+            name='url_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        # Fill the column before indexing it
+        migrations.RunPython(backfill_url_hash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='shortenedurl',
+            index=models.Index(fields=['account', 'url_hash'], name='url_account_hash_idx'),
+        ),
+    ]
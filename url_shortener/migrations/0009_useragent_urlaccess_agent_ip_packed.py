@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:37
+
+import django.db.models.deletion
+import url_shortener.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0008_shortenedurl_url_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=64, unique=True)),
+                ('user_agent', models.TextField()),
+                ('browser', models.CharField(max_length=50)),
+                ('os', models.CharField(max_length=50)),
+                ('device', models.CharField(max_length=20)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='urlaccess',
+            name='agent',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='accesses', to='url_shortener.useragent'),
+        ),
+        migrations.AddField(
+            model_name='urlaccess',
+            name='ip_packed',
+            field=url_shortener.fields.PackedIPAddressField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:37
+
+import hashlib
+import re
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+# User agent parsing from url_shortener.agents as of this migration, frozen
+# so the families stored for old clicks do not depend on later changes
+BROWSERS = [
+    ('Bot', re.compile(r'bot|crawl|spider|slurp|facebookexternalhit|preview', re.I)),
+    ('curl', re.compile(r'^curl/')),
+    ('Python', re.compile(r'python-requests|python-urllib|aiohttp|httpx', re.I)),
+    ('Edge', re.compile(r'Edg(e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Safari', re.compile(r'Version/[\d.]+.*Safari/')),
+    ('Internet Explorer', re.compile(r'MSIE |Trident/')),
+]
+OPERATING_SYSTEMS = [
+    ('Android', re.compile(r'Android')),
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Windows', re.compile(r'Windows')),
+    ('ChromeOS', re.compile(r'CrOS')),
+    ('macOS', re.compile(r'Mac OS X|Macintosh')),
+    ('Linux', re.compile(r'Linux|X11')),
+]
+TABLET = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+MOBILE = re.compile(r'Mobi|iPhone|iPod|Android')
+
+
+def family(patterns, user_agent):
+    for name, pattern in patterns:
+        if pattern.search(user_agent):
+            return name
+    return 'Other'
+
+
+def parse_user_agent(user_agent):
+    browser = family(BROWSERS, user_agent)
+    os = family(OPERATING_SYSTEMS, user_agent)
+    if browser == 'Bot':
+        device = 'bot'
+    elif TABLET.search(user_agent):
+        device = 'tablet'
+    elif MOBILE.search(user_agent):
+        device = 'mobile'
+    elif os in ('Windows', 'macOS', 'Linux', 'ChromeOS'):
+        device = 'desktop'
+    else:
+        device = 'other'
+    return {'browser': browser, 'os': os, 'device': device}
+
+
+def user_agent_hash(user_agent):
+    return hashlib.sha256(user_agent.encode()).hexdigest()
+
+
+def batches(URLAccess, db_alias, fields):
+    last_id = 0
+    while True:
+        batch = list(URLAccess.objects.using(db_alias).filter(id__gt=last_id).order_by('id').only('id', *fields)[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def compact_rows(apps, schema_editor):
+    URLAccess = apps.get_model('url_shortener', 'URLAccess')
+    UserAgent = apps.get_model('url_shortener', 'UserAgent')
+    db_alias = schema_editor.connection.alias
+    agent_ids = {}
+    for batch in batches(URLAccess, db_alias, ['ip_address', 'user_agent']):
+        new = {access.user_agent for access in batch if access.user_agent and access.user_agent not in agent_ids}
+        if new:
+            UserAgent.objects.using(db_alias).bulk_create([
+                UserAgent(hash=user_agent_hash(user_agent), user_agent=user_agent, **parse_user_agent(user_agent))
+                for user_agent in new
+            ], ignore_conflicts=True)
+            hashes = {user_agent_hash(user_agent): user_agent for user_agent in new}
+            for digest, agent_id in UserAgent.objects.using(db_alias).filter(hash__in=hashes).values_list('hash', 'id'):
+                agent_ids[hashes[digest]] = agent_id
+        for access in batch:
+            access.agent_id = agent_ids.get(access.user_agent)
+            access.ip_packed = access.ip_address or None
+        with transaction.atomic(using=db_alias):
+            URLAccess.objects.using(db_alias).bulk_update(batch, ['agent', 'ip_packed'])
+
+
+def expand_rows(apps, schema_editor):
+    URLAccess = apps.get_model('url_shortener', 'URLAccess')
+    UserAgent = apps.get_model('url_shortener', 'UserAgent')
+    db_alias = schema_editor.connection.alias
+    user_agents = dict(UserAgent.objects.using(db_alias).values_list('id', 'user_agent'))
+    for batch in batches(URLAccess, db_alias, ['ip_packed', 'agent']):
+        for access in batch:
+            access.user_agent = user_agents.get(access.agent_id)
+            access.ip_address = access.ip_packed
+        with transaction.atomic(using=db_alias):
+            URLAccess.objects.using(db_alias).bulk_update(batch, ['user_agent', 'ip_address'])
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so the access log is not converted in
+    # one long transaction and the columns are dropped by a later migration
+    atomic = False
+
+    dependencies = [
+        ('url_shortener', '0009_useragent_urlaccess_agent_ip_packed'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_rows, expand_rows),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0010_compact_access_log'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='urlaccess',
+            name='user_agent',
+        ),
+        migrations.RemoveField(
+            model_name='urlaccess',
+            name='ip_address',
+        ),
+        migrations.RenameField(
+            model_name='urlaccess',
+            old_name='ip_packed',
+            new_name='ip_address',
+        ),
+    ]
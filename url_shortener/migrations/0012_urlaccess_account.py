@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0011_remove_urlaccess_user_agent_ip_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlaccess',
+            name='account',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='access_logs', to='url_shortener.account'),
+        ),
+    ]
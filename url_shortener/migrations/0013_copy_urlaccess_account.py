@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def copy_account(apps, schema_editor):
+    URLAccess = apps.get_model('url_shortener', 'URLAccess')
+    ShortenedURL = apps.get_model('url_shortener', 'ShortenedURL')
+    db_alias = schema_editor.connection.alias
+    rows = URLAccess.objects.using(db_alias)
+    last_id = rows.order_by('-id').values_list('id', flat=True).first() or 0
+    # One id range per UPDATE and transaction keeps each batch's locks short
+    for start in range(0, last_id, BATCH_SIZE):
+        with transaction.atomic(using=db_alias):
+            rows.filter(id__gt=start, id__lte=start + BATCH_SIZE).update(
+                account_id=Subquery(ShortenedURL.objects.filter(pk=OuterRef('url_id')).values('account_id')[:1])
+            )
+
+
+class Migration(migrations.Migration):
+    # Each id range commits on its own; the column is made NOT NULL by a later migration
+    atomic = False
+
+    dependencies = [
+        ('url_shortener', '0012_urlaccess_account'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_account, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0013_copy_urlaccess_account'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='urlaccess',
+            name='account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='access_logs', to='url_shortener.account'),
+        ),
+        migrations.AddIndex(
+            model_name='urlaccess',
+            index=models.Index(fields=['account', '-accessed_at', '-id'], name='access_account_accessed_idx'),
+        ),
+    ]
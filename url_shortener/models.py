@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 import uuid
 from django.utils import timezone
 from django.conf import settings
+from .normalize import url_hash
+from .fields import PackedIPAddressField
 
 class Account(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -15,21 +17,118 @@ class Account(models.Model):
         return f"{self.user.username}'s Account"
 
 class ShortenedURL(models.Model):
-    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='urls')
+    # Covered by the (account, created_at) index
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='urls', db_index=False)
     original_url = models.URLField(max_length=2048)
     short_code = models.CharField(max_length=10, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_accessed = models.DateTimeField(null=True, blank=True)
     access_count = models.IntegerField(default=0)
+    # SHA-256 of the normalized original_url, for finding an account's existing link
+    url_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'created_at'], name='url_account_created_idx'),
+            models.Index(fields=['account', 'url_hash'], name='url_account_hash_idx'),
+        ]
 
     def __str__(self):
         return f"{self.short_code} -> {self.original_url}"
 
+    def save(self, *args, **kwargs):
+        self.url_hash = url_hash(self.original_url)
+        super().save(*args, **kwargs)
+
+class UserAgent(models.Model):
+    """Distinct user agent strings, stored once and referenced by every click"""
+    hash = models.CharField(max_length=64, unique=True)
+    user_agent = models.TextField()
+    browser = models.CharField(max_length=50)
+    os = models.CharField(max_length=50)
+    device = models.CharField(max_length=20)
+
+    def __str__(self):
+        return f"{self.browser} on {self.os} ({self.device})"
+
 class URLAccess(models.Model):
-    url = models.ForeignKey(ShortenedURL, on_delete=models.CASCADE, related_name='access_logs')
+    # Covered by the (url, -accessed_at) index
+    url = models.ForeignKey(ShortenedURL, on_delete=models.CASCADE, related_name='access_logs', db_index=False)
+    # The link's account, copied so an account's clicks are one index range newest first
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='access_logs', db_index=False)
     accessed_at = models.DateTimeField(auto_now_add=True)
-    ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(null=True, blank=True)
+    ip_address = PackedIPAddressField(null=True, blank=True)
+    # User agent rows are never deleted, so no index is needed for cascades
+    agent = models.ForeignKey(
+        UserAgent, on_delete=models.PROTECT, null=True, blank=True, related_name='accesses', db_index=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['url', '-accessed_at'], name='access_url_accessed_idx'),
+            models.Index(fields=['account', '-accessed_at', '-id'], name='access_account_accessed_idx'),
+        ]
+
+    @property
+    def user_agent(self):
+        if hasattr(self, '_user_agent'):
+            return self._user_agent
+        return self.agent.user_agent if self.agent_id else None
+
+    @user_agent.setter
+    def user_agent(self, value):
+        # Interned into UserAgent on save
+        self._user_agent = value
+
+    def save(self, *args, **kwargs):
+        if self.account_id is None:
+            self.account_id = self.url.account_id
+        if hasattr(self, '_user_agent'):
+            from .agents import intern_user_agent
+            self.agent_id = intern_user_agent(self._user_agent)
+            del self._user_agent
+        super().save(*args, **kwargs)
+
+class Sequence(models.Model):
+    """Named counter that workers reserve id blocks from"""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} @ {self.next_value}"
+
+class DailyUsage(models.Model):
+    """Number of URLs an account has shortened on a given (UTC) day"""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_usage')
+    date = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'date'], name='unique_daily_usage'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.date}: {self.count}"
+
+class ClickStatHourly(models.Model):
+    """Clicks per link per UTC hour, maintained as click batches are written"""
+    url = models.ForeignKey(ShortenedURL, on_delete=models.CASCADE, related_name='hourly_stats', db_index=False)
+    hour = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['url', 'hour'], name='unique_click_stat_hour'),
+        ]
+
+class ClickStatDaily(models.Model):
+    """Clicks per link per UTC day, maintained as click batches are written"""
+    url = models.ForeignKey(ShortenedURL, on_delete=models.CASCADE, related_name='daily_stats', db_index=False)
+    date = models.DateField()
+    count = models.IntegerField(default=0)
 
     class Meta:
-        ordering = ['-accessed_at']
+        constraints = [
+            models.UniqueConstraint(fields=['url', 'date'], name='unique_click_stat_date'),
+        ]
@@ -0,0 +1,37 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def validate_and_format_url(url):
+    """Add https:// prefix if not present and validate URL format"""
+    if not url.lower().startswith(('http://', 'https://')):
+        url = f'https://{url}'
+    return url
+
+def normalize_url(url):
+    """
+    Canonical form used to recognise the same long URL: formatted as by
+    validate_and_format_url, with a lower case scheme and host, no default
+    port, no fragment and '/' for an empty path. Query strings are kept
+    as given since parameter order can matter to the target site.
+    """
+    url = validate_and_format_url(url.strip())
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    netloc = f'[{host}]' if ':' in host else host
+    if parts.username:
+        credentials = parts.username + (f':{parts.password}' if parts.password else '')
+        netloc = f'{credentials}@{netloc}'
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{port}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+def url_hash(url):
+    """SHA-256 hex digest of the normalized URL"""
+    return hashlib.sha256(normalize_url(url).encode()).hexdigest()
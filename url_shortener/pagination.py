@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class InvalidCursor(Exception):
+    pass
+
+def encode_cursor(timestamp, pk, reverse=False):
+    payload = json.dumps([timestamp.isoformat(), pk, int(reverse)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk, reverse = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(pk), bool(reverse)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+class KeysetPaginator:
+    """
+    Newest-first pagination over (field, id).
+
+    A cursor names the row at the edge of the previous page, so each page
+    is one index range scan of page_size + 1 rows no matter how deep it is,
+    and rows inserted meanwhile never shift later pages.
+    """
+
+    def __init__(self, field, page_size):
+        self.field = field
+        self.page_size = page_size
+
+    def page(self, queryset, cursor=None):
+        """Return (rows, next_cursor, previous_cursor); cursors are None at either end"""
+        reverse = False
+        if cursor:
+            timestamp, pk, reverse = decode_cursor(cursor)
+            if reverse:
+                after = Q(**{f'{self.field}__gt': timestamp}) | Q(**{self.field: timestamp, 'id__gt': pk})
+                queryset = queryset.filter(after).order_by(self.field, 'id')
+            else:
+                before = Q(**{f'{self.field}__lt': timestamp}) | Q(**{self.field: timestamp, 'id__lt': pk})
+                queryset = queryset.filter(before).order_by(f'-{self.field}', '-id')
+        else:
+            queryset = queryset.order_by(f'-{self.field}', '-id')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        if not rows:
+            return rows, None, None
+
+        first, last = rows[0], rows[-1]
+        next_cursor = previous_cursor = None
+        if has_more or reverse:
+            next_cursor = encode_cursor(getattr(last, self.field), last.pk)
+        if cursor and (has_more or not reverse):
+            previous_cursor = encode_cursor(getattr(first, self.field), first.pk, reverse=True)
+        return rows, next_cursor, previous_cursor
+
+def get_page_size(value, default=None):
+    """Clamp a requested page size to MAX_PAGE_SIZE, falling back to PAGE_SIZE"""
+    default = default or settings.URL_SHORTENER_SETTINGS['PAGE_SIZE']
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    if page_size < 1:
+        return default
+    return min(page_size, settings.URL_SHORTENER_SETTINGS['MAX_PAGE_SIZE'])
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination for API list views.
+
+    The response body stays a plain list; next/previous pages are given in
+    an RFC 8288 Link header.
+    """
+    ordering_field = 'created_at'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(
+            self.ordering_field,
+            get_page_size(request.query_params.get(self.page_size_query_param))
+        )
+        try:
+            rows, self.next_cursor, self.previous_cursor = paginator.page(
+                queryset, request.query_params.get(self.cursor_query_param)
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return rows
+
+    def get_link(self, cursor):
+        url = self.request.build_absolute_uri()
+        if cursor is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        links = []
+        if self.next_cursor:
+            links.append(f'<{self.get_link(self.next_cursor)}>; rel="next"')
+        if self.previous_cursor:
+            links.append(f'<{self.get_link(self.previous_cursor)}>; rel="prev"')
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor from the Link header of the previous response',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+class ShortenedURLPagination(KeysetPagination):
+    ordering_field = 'created_at'
+
+class URLAccessPagination(KeysetPagination):
+    ordering_field = 'accessed_at'
@@ -0,0 +1,47 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import DailyUsage
+
+def today():
+    return timezone.now().date()
+
+def used_today(account):
+    count = DailyUsage.objects.filter(account=account, date=today()).values_list('count', flat=True).first()
+    return count or 0
+
+def remaining(account):
+    return max(account.daily_limit - used_today(account), 0)
+
+def reserve(account, amount=1):
+    """
+    Atomically take `amount` units of today's quota.
+
+    The limit is checked inside the UPDATE itself, so concurrent requests
+    cannot both take the last unit. Returns False when the limit would be
+    exceeded.
+    """
+    date = today()
+    ceiling = account.daily_limit - amount
+    if ceiling < 0:
+        return False
+    usage = DailyUsage.objects.filter(account=account, date=date)
+    if usage.filter(count__lte=ceiling).update(count=F('count') + amount):
+        return True
+    # Either the limit is reached or this is the first URL of the day
+    DailyUsage.objects.get_or_create(account=account, date=date)
+    return bool(usage.filter(count__lte=ceiling).update(count=F('count') + amount))
+
+def reserve_up_to(account, amount):
+    """Reserve as much of `amount` as today's quota allows and return how much that was"""
+    while amount > 0:
+        if reserve(account, amount):
+            return amount
+        amount = min(amount, remaining(account))
+    return 0
+
+def release(account, amount=1, date=None):
+    """Give back quota taken by reserve(), e.g. when the insert failed"""
+    DailyUsage.objects.filter(account=account, date=date or today()).update(
+        count=Greatest(F('count') - amount, 0)
+    )
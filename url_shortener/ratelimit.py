@@ -0,0 +1,286 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from .cache import get_redis, async_cache
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# A single check: at most `limit` requests per `window` seconds for `key`
+Limit = namedtuple('Limit', ['key', 'limit', 'window'])
+
+def parse_rate(rate):
+    """'<count>/<period>' as in DRF's DEFAULT_THROTTLE_RATES; returns (count, seconds) or None"""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+def get_limit(scope, ident):
+    rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+    if rate is None:
+        return None
+    return Limit(f'{scope}:{ident}', *rate)
+
+def retry_after(limit, window, current, previous, elapsed):
+    """
+    Seconds until one more request fits a sliding window counter.
+
+    The window estimate is previous * (1 - elapsed / window) + current, i.e.
+    the previous fixed window's count decays linearly as the current one fills.
+    """
+    if current + 1 > limit:
+        return window - elapsed
+    if not previous:
+        return 0
+    needed = window * (1 - (limit - 1 - current) / previous)
+    return max(needed - elapsed, 0)
+
+# Checks one limit and counts the request if it fits. KEYS holds the
+# current and previous window key, ARGV the time, limit and window.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local elapsed = now % window
+if previous * (window - elapsed) / window + current + 1 > limit then
+    return {1, current, previous}
+end
+redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {0, current, previous}
+"""
+
+class RedisRateLimiter:
+    """
+    Sliding window counters shared by all workers through Redis.
+
+    The limits of a request live in different cluster slots, so each is
+    checked by its own script call, all sent in one pipeline. When any
+    limit rejects the request, the counts it added to the others are taken
+    back, so a rejected request is not counted anywhere.
+    """
+    PREFIX = 'ratelimit'
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def arguments(self, limits):
+        """(keys, args) of one script call per limit, and the time in milliseconds"""
+        now = int(time.time() * 1000)
+        calls = []
+        for limit in limits:
+            window = limit.window * 1000
+            index = now // window
+            # The hash tag keeps both windows of a key in one cluster slot
+            keys = [f'{self.PREFIX}:{{{limit.key}}}:{index}', f'{self.PREFIX}:{{{limit.key}}}:{index - 1}']
+            calls.append((keys, [now, limit.limit, window]))
+        return calls, now
+
+    def wait(self, limits, results, now):
+        """Seconds to wait for the longest rejecting limit, or None"""
+        waits = []
+        for limit, result in zip(limits, results):
+            rejected, current, previous = (int(value) for value in result)
+            if rejected:
+                elapsed = now / 1000 % limit.window
+                waits.append(retry_after(limit.limit, limit.window, current, previous, elapsed))
+        return max(waits) if waits else None
+
+    def counted(self, calls, results):
+        """Current window keys the request was counted in"""
+        return [keys[0] for (keys, _), result in zip(calls, results) if not int(result[0])]
+
+    def hit(self, limits):
+        calls, now = self.arguments(limits)
+        with self.redis.pipeline(transaction=False) as pipe:
+            for keys, args in calls:
+                self.script(keys=keys, args=args, client=pipe)
+            results = pipe.execute()
+        wait = self.wait(limits, results, now)
+        if wait is not None:
+            with self.redis.pipeline(transaction=False) as pipe:
+                for key in self.counted(calls, results):
+                    pipe.decr(key)
+                pipe.execute()
+        return wait
+
+    async def ahit(self, limits, client):
+        calls, now = self.arguments(limits)
+        script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        async with client.pipeline(transaction=False) as pipe:
+            for keys, args in calls:
+                await script(keys=keys, args=args, client=pipe)
+            results = await pipe.execute()
+        wait = self.wait(limits, results, now)
+        if wait is not None:
+            async with client.pipeline(transaction=False) as pipe:
+                for key in self.counted(calls, results):
+                    pipe.decr(key)
+                await pipe.execute()
+        return wait
+
+class MemoryRateLimiter:
+    """The same sliding window counters for a single process"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        # key -> [window index, current count, previous count]
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def counts(self, limit, now):
+        index = int(now // limit.window)
+        entry = self.windows.get(limit.key)
+        if entry is None or entry[0] < index - 1:
+            return index, 0, 0
+        if entry[0] == index - 1:
+            return index, 0, entry[1]
+        return index, entry[1], entry[2]
+
+    def hit(self, limits):
+        now = time.time()
+        with self.lock:
+            counts = []
+            for limit in limits:
+                index, current, previous = self.counts(limit, now)
+                elapsed = now % limit.window
+                if previous * (limit.window - elapsed) / limit.window + current + 1 > limit.limit:
+                    return retry_after(limit.limit, limit.window, current, previous, elapsed)
+                counts.append((limit, index, current, previous))
+            if len(self.windows) + len(limits) > self.max_keys:
+                self.windows.clear()
+            for limit, index, current, previous in counts:
+                self.windows[limit.key] = [index, current + 1, previous]
+        return None
+
+    async def ahit(self, limits, client=None):
+        return self.hit(limits)
+
+    def clear(self):
+        with self.lock:
+            self.windows.clear()
+
+class RateLimiter:
+    """
+    Uses Redis when the default cache is django_redis and falls back to the
+    in-process limiter while Redis is unreachable, retrying it after
+    FALLBACK_SECONDS. Limits then apply per worker instead of globally.
+    """
+    FALLBACK_SECONDS = 30
+
+    def __init__(self):
+        self.memory = MemoryRateLimiter()
+        self.redis = None
+        self.redis_down_until = 0
+
+    def backend(self):
+        if time.monotonic() < self.redis_down_until:
+            return self.memory
+        if self.redis is None:
+            redis = get_redis()
+            if redis is None:
+                return self.memory
+            self.redis = RedisRateLimiter(redis)
+        return self.redis
+
+    def fall_back(self):
+        logger.warning('Rate limiter cannot reach Redis, limiting per process', exc_info=True)
+        self.redis_down_until = time.monotonic() + self.FALLBACK_SECONDS
+
+    def hit(self, limits):
+        """Count one request against every limit; returns seconds to wait if any is exceeded"""
+        limits = [limit for limit in limits if limit is not None]
+        if not limits or not settings.RATE_LIMITING:
+            return None
+        backend = self.backend()
+        try:
+            return backend.hit(limits)
+        except Exception:
+            if backend is self.memory:
+                raise
+            self.fall_back()
+            return self.memory.hit(limits)
+
+    async def ahit(self, limits):
+        limits = [limit for limit in limits if limit is not None]
+        if not limits or not settings.RATE_LIMITING:
+            return None
+        backend = self.backend()
+        if backend is self.memory:
+            return self.memory.hit(limits)
+        try:
+            return await backend.ahit(limits, async_cache.redis())
+        except Exception:
+            self.fall_back()
+            return self.memory.hit(limits)
+
+limiter = RateLimiter()
+
+def get_ident(request):
+    """
+    The client IP: REMOTE_ADDR, or with NUM_PROXIES trusted proxies in front,
+    the address the outermost of them appended to X-Forwarded-For. Unlike
+    DRF, an unset NUM_PROXIES never trusts the client-supplied header.
+    """
+    num_proxies = api_settings.NUM_PROXIES or 0
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = forwarded.split(',')
+        return addresses[-min(num_proxies, len(addresses))].strip()
+    return request.META.get('REMOTE_ADDR')
+
+def redirect_limits(request, short_code):
+    # Checked once per request even when the fast path hands it on to the view
+    if getattr(request, 'redirect_rate_checked', False):
+        return []
+    request.redirect_rate_checked = True
+    return [get_limit('redirect_ip', get_ident(request)), get_limit('redirect_code', short_code)]
+
+def throttled_response(wait):
+    """The 429 response DRF gives for a throttled request, for views outside DRF"""
+    seconds = max(int(wait + 0.999), 1)
+    response = JsonResponse({'detail': f'Request was throttled. Expected available in {seconds} seconds.'}, status=429)
+    response['Retry-After'] = str(seconds)
+    return response
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Base DRF throttle on the shared limiter; subclasses return the limits of a request"""
+
+    def get_limits(self, request, view):
+        raise NotImplementedError
+
+    def get_ident(self, request):
+        return get_ident(request)
+
+    def allow_request(self, request, view):
+        self.wait_seconds = limiter.hit(self.get_limits(request, view))
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
+
+class APIRateThrottle(SlidingWindowThrottle):
+    """Per API key for authenticated calls, per client IP otherwise"""
+
+    def get_limits(self, request, view):
+        if request.auth is not None and hasattr(request.auth, 'key'):
+            return [get_limit('api_key', request.auth.key)]
+        if request.user and request.user.is_authenticated:
+            return [get_limit('api_user', request.user.pk)]
+        return [get_limit('api_anon', self.get_ident(request))]
+
+class RedirectRateThrottle(SlidingWindowThrottle):
+    """Per client IP and per short code"""
+
+    def get_limits(self, request, view):
+        return redirect_limits(request, view.kwargs.get('short_code', ''))
@@ -0,0 +1,13 @@
+from rest_framework.renderers import BaseRenderer
+
+class PrometheusRenderer(BaseRenderer):
+    """Passes pre-rendered Prometheus exposition text through unchanged"""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # Error responses such as 401/403 carry a dict
+        return '\n'.join(f'# {key}: {value}' for key, value in data.items()).encode(self.charset)
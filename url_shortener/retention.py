@@ -0,0 +1,160 @@
+import csv
+import gzip
+import io
+import json
+import re
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from django.db import connection, transaction
+from .models import URLAccess
+
+ARCHIVE_FIELDS = ['id', 'url_id', 'short_code', 'accessed_at', 'ip_address', 'user_agent']
+
+PARTITION_NAME = re.compile(r'_p(\d{4})(\d{2})$')
+
+def boundary_id(cutoff):
+    """
+    Id below which every URLAccess row is older than `cutoff`, found by a
+    binary search over primary key lookups instead of scanning accessed_at.
+
+    Relies on ids growing with accessed_at, which holds for rows written
+    by the click flusher up to its flush interval.
+    """
+    ids = URLAccess.objects.order_by('id').values_list('id', flat=True)
+    low = ids.first()
+    high = ids.last()
+    if low is None:
+        return None
+    high += 1
+    while low < high:
+        middle = (low + high) // 2
+        row = URLAccess.objects.filter(id__gte=middle).order_by('id').values_list('id', 'accessed_at').first()
+        if row is None or row[1] >= cutoff:
+            high = middle
+        else:
+            low = row[0] + 1
+    return low
+
+class Archive:
+    """Appends rows to gzip files partitioned by access date"""
+
+    def __init__(self, directory, format='ndjson'):
+        self.directory = Path(directory)
+        self.format = format
+        self.files = {}
+
+    def path_for(self, day):
+        return self.directory / f'{day:%Y}' / f'{day:%m}' / f'url_access-{day:%Y-%m-%d}.{self.format}.gz'
+
+    def open(self, day):
+        if day not in self.files:
+            path = self.path_for(day)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            is_new = not path.exists()
+            # Appending adds a new gzip member, which readers treat as one stream
+            stream = io.TextIOWrapper(gzip.open(path, 'ab'), encoding='utf-8', newline='')
+            writer = csv.writer(stream) if self.format == 'csv' else None
+            if writer and is_new:
+                writer.writerow(ARCHIVE_FIELDS)
+            self.files[day] = (stream, writer)
+        return self.files[day]
+
+    def write(self, rows):
+        for row in rows:
+            stream, writer = self.open(row[3].date())
+            values = list(row[:3]) + [row[3].isoformat()] + list(row[4:])
+            if writer:
+                writer.writerow(values)
+            else:
+                stream.write(json.dumps(dict(zip(ARCHIVE_FIELDS, values))) + '\n')
+        for stream, _ in self.files.values():
+            stream.flush()
+
+    def close(self):
+        for stream, _ in self.files.values():
+            stream.close()
+        self.files = {}
+
+ARCHIVE_COLUMNS = ['id', 'url_id', 'url__short_code', 'accessed_at', 'ip_address', 'agent__user_agent']
+
+def archive_range(archive, start, end, batch_size):
+    """Write every row accessed in [start, end) to the archive without deleting it"""
+    rows = URLAccess.objects.filter(accessed_at__gte=start, accessed_at__lt=end).order_by('id')
+    archive.write(rows.values_list(*ARCHIVE_COLUMNS).iterator(chunk_size=batch_size))
+
+def prune(cutoff, batch_size, archive=None, pause=0):
+    """
+    Archive and delete access logs older than `cutoff` in id ranges of
+    `batch_size`, one short transaction per range. Yields rows removed per batch.
+    """
+    end = boundary_id(cutoff)
+    if end is None:
+        return
+    start = URLAccess.objects.order_by('id').values_list('id', flat=True).first()
+    while start < end:
+        stop = min(start + batch_size, end)
+        with transaction.atomic():
+            batch = URLAccess.objects.filter(id__gte=start, id__lt=stop, accessed_at__lt=cutoff)
+            if archive is not None:
+                archive.write(batch.order_by('id').values_list(*ARCHIVE_COLUMNS))
+            deleted, _ = batch.delete()
+        yield deleted
+        start = stop
+        if pause:
+            time.sleep(pause)
+
+def is_partitioned():
+    """True when URLAccess is a PostgreSQL table partitioned by accessed_at"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+            [URLAccess._meta.db_table]
+        )
+        return cursor.fetchone() is not None
+
+def partition_name(year, month):
+    return f'{URLAccess._meta.db_table}_p{year:04d}{month:02d}'
+
+def create_partitions(start, months):
+    """Create monthly partitions from the month of `start` onwards if they do not exist"""
+    table = connection.ops.quote_name(URLAccess._meta.db_table)
+    year, month = start.year, start.month
+    with connection.cursor() as cursor:
+        for _ in range(months):
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(partition_name(year, month))} '
+                f'PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+                [f'{year:04d}-{month:02d}-01', f'{next_year:04d}-{next_month:02d}-01']
+            )
+            year, month = next_year, next_month
+
+def expired_partitions(cutoff):
+    """Monthly partitions whose whole range lies before `cutoff`"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s',
+            [URLAccess._meta.db_table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    expired = []
+    for name in sorted(names):
+        match = PARTITION_NAME.search(name)
+        if not match:
+            continue
+        year, month = int(match.group(1)), int(match.group(2))
+        month_end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+        if month_end <= cutoff:
+            expired.append((name, datetime(year, month, 1, tzinfo=dt_timezone.utc), month_end))
+    return expired
+
+def drop_partition(name):
+    table = connection.ops.quote_name(URLAccess._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {connection.ops.quote_name(name)}')
+        cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
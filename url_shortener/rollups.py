@@ -0,0 +1,90 @@
+from collections import Counter
+from datetime import datetime, time, timezone as dt_timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+from .models import ClickStatHourly, ClickStatDaily, URLAccess
+
+def start_of_day(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+def hour_bucket(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def _increment(model, bucket_field, counts):
+    for (url_id, bucket), count in counts.items():
+        lookup = {'url_id': url_id, bucket_field: bucket}
+        if model.objects.filter(**lookup).update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(count=count, **lookup)
+        except IntegrityError:
+            # Another flusher created the bucket first
+            model.objects.filter(**lookup).update(count=F('count') + count)
+
+def record_clicks(clicks):
+    """Add (url_id, accessed_at) pairs to the hourly and daily rollups"""
+    hourly = Counter()
+    daily = Counter()
+    for url_id, accessed_at in clicks:
+        hourly[url_id, hour_bucket(accessed_at)] += 1
+        daily[url_id, accessed_at.date()] += 1
+    _increment(ClickStatHourly, 'hour', hourly)
+    _increment(ClickStatDaily, 'date', daily)
+
+def rebuild(start, end, batch_size=1000):
+    """
+    Recompute the rollups for clicks in [start, end) from the access log.
+
+    start and end must fall on day boundaries so no daily bucket is only
+    partly rebuilt. Returns the number of hourly buckets written.
+    """
+    ClickStatHourly.objects.filter(hour__gte=start, hour__lt=end).delete()
+    ClickStatDaily.objects.filter(date__gte=start.date(), date__lt=end.date()).delete()
+
+    rows = (
+        URLAccess.objects.filter(accessed_at__gte=start, accessed_at__lt=end)
+        .annotate(bucket=TruncHour('accessed_at'))
+        .values_list('url_id', 'bucket')
+        .annotate(clicks=Count('id'))
+        .order_by()
+    )
+    hourly = []
+    daily = Counter()
+    written = 0
+    for url_id, bucket, clicks in rows.iterator(chunk_size=batch_size):
+        hourly.append(ClickStatHourly(url_id=url_id, hour=bucket, count=clicks))
+        daily[url_id, bucket.date()] += clicks
+        if len(hourly) >= batch_size:
+            ClickStatHourly.objects.bulk_create(hourly)
+            written += len(hourly)
+            hourly = []
+    ClickStatHourly.objects.bulk_create(hourly)
+    written += len(hourly)
+    ClickStatDaily.objects.bulk_create([
+        ClickStatDaily(url_id=url_id, date=date, count=clicks)
+        for (url_id, date), clicks in daily.items()
+    ], batch_size=batch_size)
+    return written
+
+def time_series(url, granularity, start, end):
+    """Clicks per bucket for one link; buckets without clicks are omitted"""
+    if granularity == 'hour':
+        rows = url.hourly_stats.filter(hour__gte=start, hour__lt=end).order_by('hour')
+        return [{'bucket': row.hour, 'clicks': row.count} for row in rows]
+    rows = url.daily_stats.filter(date__gte=start.date(), date__lt=end.date()).order_by('date')
+    return [{'bucket': row.date, 'clicks': row.count} for row in rows]
+
+def top_links(account, start, end, limit):
+    """The account's most clicked links between two dates, from the daily rollups"""
+    rows = (
+        ClickStatDaily.objects.filter(url__account=account, date__gte=start.date(), date__lt=end.date())
+        .values('url__short_code', 'url__original_url')
+        .annotate(clicks=Sum('count'))
+        .order_by('-clicks', 'url__short_code')[:limit]
+    )
+    return [
+        {'short_code': row['url__short_code'], 'original_url': row['url__original_url'], 'clicks': row['clicks']}
+        for row in rows
+    ]
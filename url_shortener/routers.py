@@ -0,0 +1,113 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+
+# True inside replica_reads(); reads anywhere else stay on the primary
+_use_replica = ContextVar('use_replica', default=False)
+# Set once the current request has written one of PINNING_MODELS to the primary
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+# The models behind replica reads. Writes to others, such as sessions or
+# quota counters, leave the user's reads on the replicas.
+PINNING_MODELS = {
+    'url_shortener.account',
+    'url_shortener.shortenedurl',
+    'url_shortener.urlaccess',
+    'url_shortener.useragent',
+}
+
+def replicas():
+    return settings.DATABASE_REPLICAS
+
+def pin_key(key):
+    return f'replica_pin_{key}'
+
+def pin(*keys):
+    """Keep reads for these keys on the primary while the replicas catch up"""
+    if replicas():
+        cache.set_many({pin_key(key): 1 for key in keys}, timeout=settings.REPLICA_PIN_SECONDS)
+
+def is_pinned(*keys):
+    if _wrote.get():
+        return True
+    return bool(keys) and bool(cache.get_many([pin_key(key) for key in keys]))
+
+def start_request():
+    """Reset the write flag at the start of a request; returns a token for end_request"""
+    return _wrote.set(False)
+
+def end_request(token):
+    """Returns whether the request wrote to the primary"""
+    wrote = _wrote.get()
+    _wrote.reset(token)
+    return wrote
+
+class ReplicaRouter:
+    """
+    Routes reads made inside replica_reads() to a random alias of
+    DATABASE_REPLICAS, and everything else, writes included, to the
+    primary. Without replicas every query goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            aliases = replicas()
+            if aliases:
+                return random.choice(aliases)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label_lower in PINNING_MODELS:
+            _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema through replication
+        return db not in replicas()
+
+@contextmanager
+def replica_reads(*keys):
+    """
+    Send reads inside the block to a replica, unless any of `keys` was
+    pinned to the primary by a recent write or this request wrote already.
+    """
+    use = bool(replicas()) and not is_pinned(*keys)
+    token = _use_replica.set(use)
+    try:
+        yield use
+    finally:
+        _use_replica.reset(token)
+
+def replica_first(queryset, *keys):
+    """
+    queryset.first() from a replica, repeated on the primary when the
+    replica has no row: a link created moments ago may not have replicated yet.
+    """
+    with replica_reads(*keys) as used:
+        row = queryset.first()
+    if row is None and used:
+        row = queryset.first()
+    return row
+
+async def areplica_first(queryset, *keys):
+    from .cache import async_cache
+    use = bool(replicas()) and not _wrote.get()
+    if use and keys:
+        use = not any([await async_cache.get(pin_key(key)) for key in keys])
+    if use:
+        token = _use_replica.set(True)
+        try:
+            row = await queryset.afirst()
+        finally:
+            _use_replica.reset(token)
+        if row is not None:
+            return row
+    return await queryset.afirst()
@@ -1,5 +1,7 @@
+from django.db import models
 from rest_framework import serializers
 from .models import Account, ShortenedURL, URLAccess
+from .counters import counters
 
 class AccountSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,13 +9,64 @@ class AccountSerializer(serializers.ModelSerializer):
         fields = ['id', 'api_key', 'daily_limit', 'created_at', 'updated_at']
         read_only_fields = ['api_key']
 
+class ShortenedURLListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # One lookup of pending clicks for the whole page
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.pending = counters.pending([item.pk for item in items if item.pk is not None])
+        try:
+            return super().to_representation(items)
+        finally:
+            self.child.pending = None
+
 class ShortenedURLSerializer(serializers.ModelSerializer):
+    """access_count and last_accessed include clicks not yet written back from the click counters"""
+    pending = None
+
     class Meta:
         model = ShortenedURL
         fields = ['id', 'original_url', 'short_code', 'created_at', 'last_accessed', 'access_count']
         read_only_fields = ['short_code', 'last_accessed', 'access_count']
+        list_serializer_class = ShortenedURLListSerializer
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.pk is None:
+            return data
+        pending = self.pending if self.pending is not None else counters.pending([instance.pk])
+        if instance.pk in pending:
+            count, last = pending[instance.pk]
+            data['access_count'] = instance.access_count + count
+            if instance.last_accessed is None or last > instance.last_accessed:
+                data['last_accessed'] = self.fields['last_accessed'].to_representation(last)
+        return data
 
 class URLAccessSerializer(serializers.ModelSerializer):
+    user_agent = serializers.CharField(source='agent.user_agent', read_only=True, allow_null=True)
+    browser = serializers.CharField(source='agent.browser', read_only=True, allow_null=True)
+    os = serializers.CharField(source='agent.os', read_only=True, allow_null=True)
+    device = serializers.CharField(source='agent.device', read_only=True, allow_null=True)
+
     class Meta:
         model = URLAccess
-        fields = ['id', 'accessed_at', 'ip_address', 'user_agent'] 
\ No newline at end of file
+        fields = ['id', 'accessed_at', 'ip_address', 'user_agent', 'browser', 'os', 'device']
+
+class ClickStatsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if 'start' in attrs and 'end' in attrs and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end')
+        return attrs
+
+class TimeSeriesQuerySerializer(ClickStatsQuerySerializer):
+    short_code = serializers.CharField()
+    granularity = serializers.ChoiceField(choices=['hour', 'day'], default='day')
+
+class TopLinksQuerySerializer(ClickStatsQuerySerializer):
+    limit = serializers.IntegerField(default=10, min_value=1, max_value=100)
+
+class ExportQuerySerializer(ClickStatsQuerySerializer):
+    # Not 'format', which DRF reserves for choosing a renderer
+    file_format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
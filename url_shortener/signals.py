@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import Account, ShortenedURL
+from .cache import invalidate_url
+from .bloom import short_codes
+from .routers import pin
+from .authentication import invalidate_tokens, invalidate_user_tokens
+
+@receiver(post_save, sender=ShortenedURL)
+@receiver(post_delete, sender=ShortenedURL)
+def invalidate_shortened_url(sender, instance, **kwargs):
+    # Also clears negative entries for codes that were probed before creation
+    invalidate_url(instance.short_code)
+    # Until replicas catch up a reload could cache the old row
+    pin(f'url:{instance.short_code}')
+
+@receiver(post_save, sender=ShortenedURL)
+def add_short_code(sender, instance, created, **kwargs):
+    if created:
+        short_codes.add_on_commit([instance.short_code])
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_owner_tokens(sender, instance, **kwargs):
+    # Cached tokens carry the user and account they were loaded with
+    invalidate_user_tokens(instance.pk if sender is User else instance.user_id)
@@ -0,0 +1,9 @@
+from django.conf import settings
+
+def apply_pragmas(sender, connection, **kwargs):
+    """connection_created receiver: run SQLITE_PRAGMAS on each new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        # On the raw connection, so query logging and metrics skip it
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,20 @@
+import threading
+
+def on_first_request(function):
+    """
+    A request_started receiver that calls `function` once per process, on
+    the first request, so nothing queries the database while apps load and
+    management commands never call it. Keep a reference to the receiver:
+    signals hold it weakly.
+    """
+    started = False
+    lock = threading.Lock()
+
+    def receiver(sender, **kwargs):
+        nonlocal started
+        with lock:
+            if started:
+                return
+            started = True
+        function()
+    return receiver
@@ -0,0 +1,60 @@
+import pytest
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import connections
+from url_shortener.cache import local_cache
+from url_shortener.ratelimit import limiter
+from url_shortener.agents import agent_ids
+from url_shortener.bloom import short_codes
+from url_shortener.counters import counters
+from url_shortener import routers
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix, tmp_path_factory):
+    # A second SQLite file stands in for a read replica; routing to it is
+    # only enabled by tests that set DATABASE_REPLICAS
+    replica = tmp_path_factory.mktemp('replica') / 'replica.sqlite3'
+    django_settings.DATABASES['replica'] = {
+        **django_settings.DATABASES['default'], 'NAME': str(replica), 'TEST': {'NAME': str(replica)}
+    }
+    connections.configure_settings(django_settings.DATABASES)
+
+@pytest.fixture
+def fake_redis_server():
+    # In-process Redis with Lua scripting, for the Redis-backed stores
+    fakeredis = pytest.importorskip('fakeredis')
+    return fakeredis.FakeServer()
+
+@pytest.fixture
+def fake_redis(fake_redis_server):
+    import fakeredis
+    return fakeredis.FakeRedis(server=fake_redis_server)
+
+@pytest.fixture
+def fake_async_redis(fake_redis_server):
+    import fakeredis
+    return fakeredis.FakeAsyncRedis(server=fake_redis_server)
+
+@pytest.fixture(autouse=True)
+def isolated_caches(settings):
+    # Tests run without a Redis server
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    # Write access logs inline so they are visible inside the test transaction
+    settings.CLICK_LOG = {**settings.CLICK_LOG, 'ASYNC': False}
+    cache.clear()
+    local_cache.clear()
+    limiter.memory.clear()
+    agent_ids.clear()
+    short_codes.reset()
+    counters.reset()
+    # Each test starts like a request that has not written yet
+    token = routers.start_request()
+    yield
+    routers.end_request(token)
+    counters.reset()
+    cache.clear()
+    local_cache.clear()
@@ -0,0 +1,98 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+from url_shortener.agents import intern_user_agents, parse_user_agent
+from url_shortener.clicks import ClickEvent, write_clicks
+from url_shortener.models import Account, ShortenedURL, URLAccess, UserAgent
+
+CHROME = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36'
+IPHONE = 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1'
+
+@pytest.mark.parametrize('user_agent, expected', [
+    (CHROME, {'browser': 'Chrome', 'os': 'Windows', 'device': 'desktop'}),
+    (IPHONE, {'browser': 'Safari', 'os': 'iOS', 'device': 'mobile'}),
+    ('Mozilla/5.0 (Linux; Android 14; SM-X710) AppleWebKit/537.36 Chrome/126.0 Safari/537.36',
+     {'browser': 'Chrome', 'os': 'Android', 'device': 'tablet'}),
+    ('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+     {'browser': 'Bot', 'os': 'Other', 'device': 'bot'}),
+    ('curl/8.5.0', {'browser': 'curl', 'os': 'Other', 'device': 'other'}),
+])
+def test_parse_user_agent(user_agent, expected):
+    assert parse_user_agent(user_agent) == expected
+
+@pytest.fixture
+def shortened():
+    account = Account.objects.create(user=User.objects.create_user(username='agentuser', password='testpass123'))
+    return ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='ua1')
+
+@pytest.mark.django_db
+class TestCompactAccessLog:
+    def test_user_agents_are_stored_once(self, shortened):
+        for _ in range(3):
+            URLAccess.objects.create(url=shortened, ip_address='127.0.0.1', user_agent=CHROME)
+        assert UserAgent.objects.count() == 1
+        access = URLAccess.objects.select_related('agent').first()
+        assert access.user_agent == CHROME
+        assert access.agent.browser == 'Chrome'
+
+    def test_empty_user_agent_has_no_row(self, shortened):
+        access = URLAccess.objects.create(url=shortened, user_agent='')
+        assert access.agent_id is None
+        assert UserAgent.objects.count() == 0
+
+    def test_intern_many_in_few_queries(self, django_assert_max_num_queries):
+        UserAgent.objects.create(hash='x' * 64, user_agent='unrelated', browser='Other', os='Other', device='other')
+        with django_assert_max_num_queries(3):
+            ids = intern_user_agents([CHROME, IPHONE, CHROME, None])
+        assert set(ids) == {CHROME, IPHONE}
+        assert intern_user_agents([IPHONE]) == {IPHONE: ids[IPHONE]}
+
+    @pytest.mark.parametrize('ip_address', ['127.0.0.1', '2001:db8::1'])
+    def test_ip_address_round_trip(self, shortened, ip_address):
+        URLAccess.objects.create(url=shortened, ip_address=ip_address)
+        assert URLAccess.objects.values_list('ip_address', flat=True).get() == ip_address
+        assert URLAccess.objects.filter(ip_address=ip_address).exists()
+
+    def test_invalid_ip_address_is_null(self, shortened):
+        access = URLAccess.objects.create(url=shortened, ip_address='unknown')
+        access.refresh_from_db()
+        assert access.ip_address is None
+
+    def test_write_clicks_interns_batch(self, shortened):
+        now = timezone.now()
+        write_clicks([ClickEvent(shortened.id, now, '10.0.0.1', agent) for agent in [CHROME, IPHONE, CHROME]])
+        assert UserAgent.objects.count() == 2
+        assert sorted(URLAccess.objects.values_list('agent__browser', flat=True)) == ['Chrome', 'Chrome', 'Safari']
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_converts_existing_rows():
+    executor = MigrationExecutor(connection)
+    before = [('url_shortener', '0008_shortenedurl_url_hash')]
+    after = [('url_shortener', '0011_remove_urlaccess_user_agent_ip_address')]
+    executor.migrate(before)
+    apps = executor.loader.project_state(before).apps
+    user = apps.get_model('auth', 'User').objects.create(username='migrated')
+    account = apps.get_model('url_shortener', 'Account').objects.create(user_id=user.id)
+    url = apps.get_model('url_shortener', 'ShortenedURL').objects.create(
+        account=account, original_url='https://example.com', short_code='mig1'
+    )
+    OldAccess = apps.get_model('url_shortener', 'URLAccess')
+    OldAccess.objects.create(url=url, ip_address='192.168.1.10', user_agent=IPHONE)
+    OldAccess.objects.create(url=url, ip_address='::1', user_agent=IPHONE)
+    OldAccess.objects.create(url=url, ip_address=None, user_agent='')
+
+    executor = MigrationExecutor(connection)
+    executor.migrate(after)
+    rows = list(URLAccess.objects.order_by('id').values_list('ip_address', 'agent__user_agent', 'agent__device'))
+    assert rows == [('192.168.1.10', IPHONE, 'mobile'), ('::1', IPHONE, 'mobile'), (None, None, None)]
+
+    executor = MigrationExecutor(connection)
+    executor.migrate(before)
+    apps = executor.loader.project_state(before).apps
+    restored = apps.get_model('url_shortener', 'URLAccess').objects.order_by('id').values_list('ip_address', 'user_agent')
+    assert list(restored) == [('192.168.1.10', IPHONE), ('::1', IPHONE), (None, None)]
+
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
@@ -0,0 +1,41 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncRequestFactory, Client
+from url_shortener.models import Account, ShortenedURL, URLAccess
+from url_shortener.views import async_redirect_to_original
+from url_shortener.cache import local_cache
+
+@pytest.fixture
+def shortened():
+    user = User.objects.create_user(username='asyncuser', password='testpass123')
+    account = Account.objects.create(user=user)
+    return ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='abc123')
+
+def get(short_code, method='get'):
+    request = getattr(AsyncRequestFactory(), method)(f'/{short_code}/', headers={'user-agent': 'test-agent'})
+    return async_to_sync(async_redirect_to_original)(request, short_code)
+
+@pytest.mark.django_db
+class TestAsyncRedirect:
+    def test_redirects_and_logs_click(self, shortened):
+        response = get('abc123')
+        assert response.status_code == 302
+        assert response['Location'] == 'https://example.com'
+        assert URLAccess.objects.get(url=shortened).user_agent == 'test-agent'
+        shortened.refresh_from_db()
+        assert shortened.access_count == 1
+
+    def test_fills_cache(self, shortened):
+        get('abc123')
+        assert local_cache.get('abc123') == (shortened.id, 'https://example.com')
+
+    def test_unknown_code_is_the_same_404_as_the_sync_view(self):
+        response = get('nope42')
+        assert response.status_code == 404
+        assert response['Content-Type'] == 'application/json'
+        assert json.loads(response.content) == Client().get('/nope42/').json()
+
+    def test_only_safe_methods(self, shortened):
+        assert get('abc123', method='post').status_code == 405
@@ -0,0 +1,75 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from url_shortener.authentication import CachedTokenAuthentication, token_cache_key
+from url_shortener.models import Account
+
+@pytest.fixture
+def token():
+    user = User.objects.create_user(username='tokenuser', password='testpass123')
+    Account.objects.create(user=user, daily_limit=5)
+    return Token.objects.create(user=user)
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    def test_second_lookup_needs_no_query(self, token):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(token.key)
+        with CaptureQueriesContext(connection) as queries:
+            user, cached = authentication.authenticate_credentials(token.key)
+            assert user.account.daily_limit == 5
+        assert len(queries) == 0
+        assert cached.key == token.key
+
+    def test_cache_holds_no_credentials(self, token):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(token.key)
+        entry = cache.get(token_cache_key(token.key))
+        assert entry['user'] == {
+            'id': token.user_id, 'username': 'tokenuser', 'is_active': True, 'is_staff': False, 'is_superuser': False
+        }
+        assert 'password' not in repr(entry) and token.user.password not in repr(entry)
+
+        user, _ = authentication.authenticate_credentials(token.key)
+        # Saving the partial user leaves the fields that were not cached alone
+        user.first_name = 'Cached'
+        user.save()
+        stored = User.objects.get(pk=token.user_id)
+        assert stored.check_password('testpass123')
+        assert stored.first_name == 'Cached'
+
+    def test_unknown_token(self):
+        with pytest.raises(AuthenticationFailed):
+            CachedTokenAuthentication().authenticate_credentials('missing')
+
+    def test_account_update_invalidates(self, token):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(token.key)
+        account = Account.objects.get(user=token.user)
+        account.daily_limit = 20
+        account.save()
+        user, _ = authentication.authenticate_credentials(token.key)
+        assert user.account.daily_limit == 20
+
+    def test_deactivated_user_is_rejected(self, token):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(token.key)
+        user = User.objects.get(pk=token.user_id)
+        user.is_active = False
+        user.save()
+        with pytest.raises(AuthenticationFailed):
+            authentication.authenticate_credentials(token.key)
+
+    def test_rotated_token_stops_working(self, token):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(token.key)
+        user = token.user
+        token.delete()
+        new_token = Token.objects.create(user=user)
+        with pytest.raises(AuthenticationFailed):
+            authentication.authenticate_credentials(token.key)
+        assert authentication.authenticate_credentials(new_token.key)[0] == user
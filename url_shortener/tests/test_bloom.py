@@ -0,0 +1,151 @@
+from io import StringIO
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from url_shortener.bloom import MemoryBloomFilter, RedisBloomFilter, optimal_size, positions, short_codes
+from url_shortener.bulk import shorten_many
+from url_shortener.cache import aresolve_short_code, get_cached_url, resolve_short_code
+from url_shortener.models import Account, ShortenedURL
+
+def test_optimal_size():
+    bits, hashes = optimal_size(1000000, 0.001)
+    assert 14000000 < bits < 14500000
+    assert hashes == 10
+
+def test_memory_filter_has_no_false_negatives():
+    bloom = MemoryBloomFilter(*optimal_size(1000, 0.01))
+    assert bloom.might_contain('anything')
+    codes = [f'code{index}' for index in range(1000)]
+    bloom.rebuild([codes[:500], codes[500:]])
+    assert all(bloom.might_contain(code) for code in codes)
+    false_positives = sum(bloom.might_contain(f'other{index}') for index in range(10000))
+    assert false_positives < 300
+
+class TestRedisBloomFilter:
+    def test_unbuilt_or_resized_filter_is_not_trusted(self, fake_redis):
+        bloom = RedisBloomFilter(fake_redis, 'test:codes', *optimal_size(1000, 0.01))
+        assert not bloom.ready()
+        assert bloom.might_contain('anything')
+        bloom.rebuild([['code1']])
+        assert bloom.ready()
+        assert not bloom.might_contain('anything')
+        resized = RedisBloomFilter(fake_redis, 'test:codes', *optimal_size(2000, 0.01))
+        assert not resized.ready()
+        assert resized.might_contain('anything')
+
+    def test_scripts_set_and_check_the_python_positions(self, fake_redis):
+        size = optimal_size(1000, 0.01)
+        bloom = RedisBloomFilter(fake_redis, 'test:codes', *size)
+        memory = MemoryBloomFilter(*size)
+        codes = [f'code{index}' for index in range(1000)]
+        bloom.rebuild([codes[:500], codes[500:]])
+        memory.rebuild([codes])
+        assert all(fake_redis.getbit(bloom.key, position) for position in positions('code7', *size))
+        assert bloom.bits_set() == memory.bits_set()
+        probes = codes + [f'other{index}' for index in range(2000)]
+        assert [bloom.might_contain(code) for code in probes] == [memory.might_contain(code) for code in probes]
+
+    def test_adds_during_a_rebuild_are_kept(self, fake_redis):
+        bloom = RedisBloomFilter(fake_redis, 'test:codes', *optimal_size(1000, 0.01))
+
+        def batches():
+            yield ['code1']
+            # Committed by another worker while the rebuild runs
+            bloom.add(['code2'])
+            yield ['code3']
+        bloom.rebuild(batches())
+        bloom.add(['code4'])
+        assert all(bloom.might_contain(code) for code in ['code1', 'code2', 'code3', 'code4'])
+        assert not fake_redis.exists(bloom.building_key)
+
+    def test_async_check(self, fake_redis, fake_async_redis, monkeypatch):
+        from url_shortener.cache import async_cache
+        monkeypatch.setattr(async_cache, 'redis', lambda: fake_async_redis)
+        bloom = RedisBloomFilter(fake_redis, 'test:codes', *optimal_size(1000, 0.01))
+        bloom.rebuild([['code1']])
+        assert async_to_sync(bloom.amight_contain)('code1')
+        assert not async_to_sync(bloom.amight_contain)('wp-login')
+
+@pytest.fixture
+def enabled(settings):
+    settings.SHORT_CODE_FILTER = {**settings.SHORT_CODE_FILTER, 'ENABLED': True, 'BACKEND': 'memory', 'CAPACITY': 1000}
+    short_codes.reset()
+
+@pytest.fixture
+def account():
+    return Account.objects.create(user=User.objects.create_user(username='bloomuser', password='testpass123'))
+
+@pytest.mark.django_db
+class TestShortCodeFilter:
+    def test_unbuilt_filter_lets_everything_through(self, enabled, account):
+        ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='bf1')
+        assert resolve_short_code('bf1') is not None
+
+    def test_rejects_unknown_codes_without_lookups(self, enabled, account, django_assert_num_queries):
+        shortened = ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='bf1')
+        short_codes.rebuild()
+        with django_assert_num_queries(0):
+            assert resolve_short_code('wp-login') is None
+        assert get_cached_url('wp-login') is None
+        assert async_to_sync(aresolve_short_code)('admin.php') is None
+        assert resolve_short_code('bf1') == (shortened.id, 'https://example.com')
+        assert short_codes.rejections == 2
+
+    def test_local_cache_hits_skip_the_filter(self, enabled, account):
+        ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='bf5')
+        short_codes.rebuild()
+        assert resolve_short_code('bf5') is not None
+        assert async_to_sync(aresolve_short_code)('bf5') is not None
+        assert resolve_short_code('bf5') is not None
+        assert short_codes.checks == 1
+
+    def test_new_codes_are_added_on_commit(self, enabled, account, django_capture_on_commit_callbacks):
+        short_codes.rebuild()
+        with django_capture_on_commit_callbacks(execute=True):
+            ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='bf2')
+            bulk = shorten_many(account, ['https://a.com', 'https://b.com'])
+        for short_code in ['bf2'] + [shortened.short_code for shortened in bulk]:
+            assert resolve_short_code(short_code) is not None
+
+    def test_fast_path_404(self, enabled):
+        short_codes.rebuild()
+        assert Client().get('/.env/').status_code == 404
+
+    def test_disabled(self, settings, account):
+        settings.SHORT_CODE_FILTER = {**settings.SHORT_CODE_FILTER, 'BACKEND': 'memory', 'CAPACITY': 1000}
+        short_codes.rebuild()
+        ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='bf3')
+        assert resolve_short_code('bf3') is not None
+
+    def test_redis_backend_without_redis_disables_the_filter(self, settings, account, caplog):
+        settings.SHORT_CODE_FILTER = {**settings.SHORT_CODE_FILTER, 'ENABLED': True, 'BACKEND': 'redis'}
+        short_codes.reset()
+        # Created behind the filter's back, as by another worker
+        ShortenedURL.objects.bulk_create([
+            ShortenedURL(account=account, original_url='https://example.com', short_code='bf6')
+        ])
+        assert resolve_short_code('bf6') is not None
+        assert not short_codes.enabled()
+        assert 'short code filter is disabled' in caplog.text
+
+    def test_redis_backend(self, settings, account, fake_redis, monkeypatch):
+        settings.SHORT_CODE_FILTER = {**settings.SHORT_CODE_FILTER, 'ENABLED': True, 'BACKEND': 'redis', 'CAPACITY': 1000}
+        monkeypatch.setattr('url_shortener.cache.get_redis', lambda: fake_redis)
+        short_codes.reset()
+        shortened = ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='bf7')
+        assert short_codes.rebuild() == 1
+        assert short_codes.stats()['backend'] == 'redis'
+        assert resolve_short_code('wp-login') is None
+        assert resolve_short_code('bf7') == (shortened.id, 'https://example.com')
+
+    def test_command_rebuilds_and_reports(self, enabled, account):
+        ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='bf4')
+        out = StringIO()
+        call_command('rebuild_short_code_filter', stdout=out)
+        output = out.getvalue()
+        assert 'Added 1 short codes' in output
+        assert 'ready: True' in output
+        assert 'memory_bytes: 1798' in output
+        assert short_codes.stats()['estimated_items'] == 1
@@ -0,0 +1,57 @@
+import json
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from url_shortener.models import Account, ShortenedURL
+from url_shortener import quota
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='bulkuser', password='testpass123')
+    return Account.objects.create(user=user, daily_limit=3)
+
+@pytest.fixture
+def client(account):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=account.user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+@pytest.mark.django_db
+class TestBulkShorten:
+    def test_json_array(self, client, account):
+        response = client.post(
+            reverse('shortenedurl-bulk'),
+            ['https://example1.com', {'original_url': 'example2.com'}],
+            format='json'
+        )
+        assert response.status_code == 201
+        body = response.json()
+        assert body['created'] == 2
+        assert body['results'][1]['original_url'] == 'https://example2.com'
+        codes = [result['short_code'] for result in body['results']]
+        assert ShortenedURL.objects.filter(account=account, short_code__in=codes).count() == 2
+        assert quota.used_today(account) == 2
+
+    def test_ndjson_stream(self, client):
+        payload = '\n'.join(json.dumps(url) for url in ['https://a.com', 'https://b.com']) + '\n'
+        response = client.post(
+            reverse('shortenedurl-bulk'), payload, content_type='application/x-ndjson'
+        )
+        assert response.status_code == 201
+        assert response.json()['created'] == 2
+
+    def test_reports_failures_per_item(self, client, account):
+        urls = ['https://a.com', 'not a url', 'https://b.com', 'https://c.com', 'https://d.com']
+        response = client.post(reverse('shortenedurl-bulk'), urls, format='json')
+        results = response.json()['results']
+        assert response.json()['created'] == 3
+        assert 'error' in results[1]
+        assert results[4]['error'] == 'Daily URL shortening limit exceeded'
+        assert ShortenedURL.objects.filter(account=account).count() == 3
+
+    def test_rejects_non_list(self, client):
+        response = client.post(reverse('shortenedurl-bulk'), {'original_url': 'https://a.com'}, format='json')
+        assert response.status_code == 400
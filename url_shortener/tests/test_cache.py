@@ -0,0 +1,143 @@
+import threading
+import time
+import pytest
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from url_shortener.models import Account, ShortenedURL
+from url_shortener.cache import (
+    resolve_short_code, get_cached_url, cache_url, local_cache, LocalCache, NOT_FOUND,
+    url_cache_key, lease_key, jittered
+)
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='cacheuser', password='testpass123')
+    return Account.objects.create(user=user)
+
+@pytest.fixture
+def shortened(account):
+    return ShortenedURL.objects.create(
+        account=account,
+        original_url='https://example.com',
+        short_code='abc123'
+    )
+
+@pytest.mark.django_db
+class TestResolveShortCode:
+    def test_hit_skips_database(self, shortened):
+        assert resolve_short_code('abc123') == (shortened.id, 'https://example.com')
+        with CaptureQueriesContext(connection) as queries:
+            assert resolve_short_code('abc123') == (shortened.id, 'https://example.com')
+        assert len(queries) == 0
+
+    def test_unknown_code_is_negatively_cached(self):
+        assert resolve_short_code('nope42') is None
+        assert get_cached_url('nope42') == NOT_FOUND
+        with CaptureQueriesContext(connection) as queries:
+            assert resolve_short_code('nope42') is None
+        assert len(queries) == 0
+
+    def test_create_clears_negative_entry(self, account):
+        assert resolve_short_code('new123') is None
+        created = ShortenedURL.objects.create(
+            account=account,
+            original_url='https://example.org',
+            short_code='new123'
+        )
+        assert resolve_short_code('new123') == (created.id, 'https://example.org')
+
+    def test_delete_through_api_invalidates(self, shortened, account):
+        resolve_short_code('abc123')
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=account.user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = client.delete(reverse('shortenedurl-detail', args=['abc123']))
+        assert response.status_code == 204
+        assert resolve_short_code('abc123') is None
+        assert client.get('/abc123/').status_code == 404
+
+class TestLocalCache:
+    def test_evicts_least_recently_used(self):
+        local = LocalCache(max_size=2, ttl=30)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        assert local.get('b') is None
+        assert local.get('a') == 1
+        assert local.get('c') == 3
+
+    def test_expired_entries_count_as_misses(self, monkeypatch):
+        local = LocalCache(max_size=10, ttl=30)
+        local.set('a', 1)
+        now = time.monotonic()
+        monkeypatch.setattr(time, 'monotonic', lambda: now + 31)
+        assert local.get('a') is None
+        assert local.stats() == {'hits': 0, 'misses': 1, 'size': 0, 'max_size': 10}
+
+@pytest.mark.django_db
+class TestTwoLevelResolution:
+    def test_local_tier_serves_repeat_lookups(self, shortened):
+        resolve_short_code('abc123')
+        hits = local_cache.hits
+        cache.clear()
+        assert resolve_short_code('abc123') == (shortened.id, 'https://example.com')
+        assert local_cache.hits == hits + 1
+
+    def test_delete_evicts_local_tier(self, shortened):
+        resolve_short_code('abc123')
+        shortened.delete()
+        assert local_cache.get('abc123') is None
+        assert resolve_short_code('abc123') is None
+
+@pytest.mark.django_db
+class TestStaleWhileRevalidate:
+    @pytest.fixture(autouse=True)
+    def shared_cache_only(self, settings):
+        settings.URL_LOCAL_CACHE = {**settings.URL_LOCAL_CACHE, 'ENABLED': False}
+
+    def expire(self, short_code, url_id, original_url):
+        cache.set(url_cache_key(short_code), (url_id, original_url, time.time() - 1), timeout=60)
+
+    def test_ttl_jitter(self, settings):
+        settings.URL_CACHE_TTL = 1000
+        settings.URL_CACHE_TTL_JITTER = 0.1
+        ttls = [jittered(1000) for _ in range(200)]
+        assert all(900 <= ttl <= 1000 for ttl in ttls)
+        assert len(set(ttls)) > 1
+
+    def test_stale_entry_is_refreshed_by_one_request(self, shortened):
+        self.expire('abc123', shortened.id, 'https://old.example.com')
+        assert resolve_short_code('abc123') == (shortened.id, 'https://example.com')
+        assert cache.get(url_cache_key('abc123'))[2] > time.time()
+        assert cache.get(lease_key('abc123')) is None
+
+    def test_stale_entry_is_served_while_lease_is_held(self, shortened):
+        self.expire('abc123', shortened.id, 'https://old.example.com')
+        cache.add(lease_key('abc123'), 1, timeout=5)
+        with CaptureQueriesContext(connection) as queries:
+            assert resolve_short_code('abc123') == (shortened.id, 'https://old.example.com')
+        assert len(queries) == 0
+
+    def test_miss_waits_for_lease_holder(self, settings, shortened):
+        settings.URL_CACHE_LEASE_WAIT = 1
+        cache.add(lease_key('abc123'), 1, timeout=5)
+        # Another worker finishes loading while this one waits
+        threading.Timer(0.05, cache_url, ['abc123', shortened.id, 'https://example.com']).start()
+        with CaptureQueriesContext(connection) as queries:
+            assert resolve_short_code('abc123') == (shortened.id, 'https://example.com')
+        assert len(queries) == 0
+
+    def test_miss_queries_when_lease_holder_is_gone(self, settings, shortened):
+        settings.URL_CACHE_LEASE_WAIT = 0.05
+        cache.add(lease_key('abc123'), 1, timeout=5)
+        assert resolve_short_code('abc123') == (shortened.id, 'https://example.com')
+
+    def test_entries_without_freshness_are_still_read(self, shortened):
+        cache.set(url_cache_key('abc123'), (shortened.id, 'https://example.com'))
+        assert get_cached_url('abc123') == (shortened.id, 'https://example.com')
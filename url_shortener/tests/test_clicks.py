@@ -0,0 +1,128 @@
+import json
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.utils import timezone
+from url_shortener.models import Account, ShortenedURL, URLAccess
+from url_shortener.clicks import ClickBuffer, ClickEvent, MemoryClickQueue, RedisClickQueue, write_clicks
+
+@pytest.fixture
+def shortened():
+    user = User.objects.create_user(username='clickuser', password='testpass123')
+    account = Account.objects.create(user=user)
+    return ShortenedURL.objects.create(
+        account=account,
+        original_url='https://example.com',
+        short_code='abc123'
+    )
+
+@pytest.mark.django_db
+class TestClickLogging:
+    def test_write_clicks_aggregates_counters(self, shortened):
+        now = timezone.now()
+        write_clicks([
+            ClickEvent(shortened.id, now - timedelta(seconds=5), '127.0.0.1', 'a'),
+            ClickEvent(shortened.id, now, '127.0.0.2', 'b'),
+            ClickEvent(shortened.id, now - timedelta(seconds=1), '127.0.0.3', 'c'),
+        ])
+        shortened.refresh_from_db()
+        assert shortened.access_count == 3
+        assert shortened.last_accessed == now
+        assert URLAccess.objects.filter(url=shortened).count() == 3
+
+    def test_write_clicks_skips_deleted_urls(self, shortened):
+        write_clicks([ClickEvent(shortened.id + 1000, timezone.now(), '127.0.0.1', 'a')])
+        assert URLAccess.objects.count() == 0
+
+    def test_flush_drains_queue_in_batches(self, shortened):
+        buffer = ClickBuffer(MemoryClickQueue(100), flush_size=2)
+        for _ in range(5):
+            buffer.queue.push(ClickEvent(shortened.id, timezone.now(), '127.0.0.1', 'a'))
+        assert buffer.flush() == 5
+        assert len(buffer.queue) == 0
+        shortened.refresh_from_db()
+        assert shortened.access_count == 5
+
+    def test_failed_flush_keeps_events(self, shortened, monkeypatch):
+        buffer = ClickBuffer(MemoryClickQueue(100), flush_size=2)
+        for _ in range(3):
+            buffer.queue.push(ClickEvent(shortened.id, timezone.now(), '127.0.0.1', 'a'))
+
+        def fail(events):
+            raise RuntimeError('database unavailable')
+
+        monkeypatch.setattr('url_shortener.clicks.write_clicks', fail)
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+        assert len(buffer.queue) == 3
+        monkeypatch.undo()
+        assert buffer.flush() == 3
+        shortened.refresh_from_db()
+        assert shortened.access_count == 3
+
+    def test_batch_that_keeps_failing_is_dead_lettered(self, shortened, monkeypatch):
+        buffer = ClickBuffer(MemoryClickQueue(100), flush_size=2, max_retries=2)
+        for _ in range(3):
+            buffer.queue.push(ClickEvent(shortened.id, timezone.now(), '127.0.0.1', 'a'))
+        write = write_clicks
+
+        def fail_first(events):
+            if events[0].user_agent == 'a':
+                raise RuntimeError('bad batch')
+            write(events)
+
+        monkeypatch.setattr('url_shortener.clicks.write_clicks', fail_first)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                buffer.flush()
+        assert len(buffer.queue) == 3
+        buffer.queue.push(ClickEvent(shortened.id, timezone.now(), '127.0.0.1', 'b'))
+        # The third failure gives up on the first batch; the second one fails
+        # too and is queued again, so later events are not blocked forever
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+        assert [event.user_agent for event in buffer.queue.events] == ['a', 'b']
+        buffer.queue.events[0] = buffer.queue.events[0]._replace(user_agent='c')
+        assert buffer.flush() == 2
+
+def test_requeue_into_a_full_queue_drops_the_oldest_events():
+    queue = MemoryClickQueue(3)
+    events = [ClickEvent(1, timezone.now(), '127.0.0.1', str(index)) for index in range(5)]
+    for event in events[:3]:
+        queue.push(event)
+    batch = queue.pop_many(2)
+    queue.push(events[3])
+    queue.push_back(batch)
+    assert [event.user_agent for event in queue.events] == ['1', '2', '3']
+    queue.push_back([events[4]])
+    assert [event.user_agent for event in queue.events] == ['1', '2', '3']
+
+class TestRedisClickQueue:
+    def test_round_trip(self, fake_redis):
+        queue = RedisClickQueue(fake_redis, 'test:clicks')
+        now = timezone.now()
+        events = [ClickEvent(1, now, '127.0.0.1', 'a'), ClickEvent(2, now, None, 'b', True)]
+        assert [queue.push(event) for event in events] == [1, 2]
+        # Items queued before the counted flag existed have four fields
+        fake_redis.rpush('test:clicks', json.dumps([3, now.isoformat(), '::1', 'c']))
+        assert len(queue) == 3
+        batch = queue.pop_many(2)
+        assert batch == events
+        queue.push_back(batch)
+        assert queue.pop_many(10) == events + [ClickEvent(3, now, '::1', 'c')]
+        assert queue.pop_many(10) == []
+
+    def test_dead_letters_keep_the_events(self, fake_redis):
+        queue = RedisClickQueue(fake_redis, 'test:clicks')
+        events = [ClickEvent(1, timezone.now(), '127.0.0.1', 'a')]
+        queue.dead_letter(events)
+        assert fake_redis.lrange('test:clicks:dead', 0, -1) == [queue.encode(events[0]).encode()]
+
+    @pytest.mark.django_db
+    def test_flush(self, fake_redis, shortened):
+        buffer = ClickBuffer(RedisClickQueue(fake_redis, 'test:clicks'), flush_size=2)
+        for _ in range(3):
+            buffer.put(ClickEvent(shortened.id, timezone.now(), '127.0.0.1', 'a'))
+        buffer.stop()
+        assert URLAccess.objects.filter(url=shortened).count() == 3
+        assert len(buffer.queue) == 0
@@ -0,0 +1,77 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from url_shortener.models import Account, ShortenedURL
+from url_shortener.codes import (
+    base62_encode, base62_decode, BlockCodeGenerator, RandomCodeGenerator,
+    SnowflakeCodeGenerator, save_with_short_code
+)
+from url_shortener.models import Sequence
+
+class TestBase62:
+    def test_round_trip(self):
+        for number in [0, 1, 61, 62, 3843, 56800235583]:
+            assert base62_decode(base62_encode(number)) == number
+
+    def test_padding(self):
+        assert base62_encode(1, 6) == '000001'
+
+class TestSnowflakeCodeGenerator:
+    def test_codes_are_unique_and_fit_the_column(self):
+        generator = SnowflakeCodeGenerator(worker_id=7)
+        codes = {generator.generate() for _ in range(3000)}
+        assert len(codes) == 3000
+        assert max(len(code) for code in codes) <= 10
+
+@pytest.mark.django_db
+class TestBlockCodeGenerator:
+    def test_blocks_do_not_overlap_between_workers(self):
+        first = BlockCodeGenerator(block_size=10)
+        second = BlockCodeGenerator(block_size=10)
+        codes = [first.generate() for _ in range(25)] + [second.generate() for _ in range(25)]
+        assert len(set(codes)) == 50
+        assert all(len(code) == 6 for code in codes)
+
+    def test_grows_past_the_code_space(self):
+        generator = BlockCodeGenerator(length=1, block_size=100)
+        codes = [generator.generate() for _ in range(100)]
+        assert len(set(codes)) == 100
+
+@pytest.mark.django_db
+class TestSaveWithShortCode:
+    @pytest.fixture
+    def account(self):
+        user = User.objects.create_user(username='codeuser', password='testpass123')
+        return Account.objects.create(user=user)
+
+    def test_retries_on_collision(self, account, monkeypatch):
+        ShortenedURL.objects.create(account=account, original_url='https://a.com', short_code='taken1')
+        codes = iter(['taken1', 'free01'])
+        monkeypatch.setattr('url_shortener.codes.generate_short_code', lambda: next(codes))
+        shortened = save_with_short_code(
+            ShortenedURL.objects.create, account=account, original_url='https://b.com'
+        )
+        assert shortened.short_code == 'free01'
+
+    def test_gives_up_after_max_attempts(self, account, monkeypatch, settings):
+        settings.SHORT_CODES = {**settings.SHORT_CODES, 'MAX_ATTEMPTS': 3}
+        ShortenedURL.objects.create(account=account, original_url='https://a.com', short_code='taken1')
+        monkeypatch.setattr('url_shortener.codes.generate_short_code', lambda: 'taken1')
+        with pytest.raises(IntegrityError):
+            save_with_short_code(ShortenedURL.objects.create, account=account, original_url='https://b.com')
+
+    def test_failed_save_keeps_the_block_reservation(self, account, monkeypatch):
+        generator = BlockCodeGenerator(block_size=1)
+        monkeypatch.setattr('url_shortener.codes.get_generator', lambda: generator)
+        used = []
+
+        def save(**kwargs):
+            used.append(kwargs['short_code'])
+            if len(used) == 1:
+                raise IntegrityError('duplicate short code')
+            return ShortenedURL.objects.create(**kwargs)
+
+        save_with_short_code(save, account=account, original_url='https://b.com')
+        # Both reserved blocks stay reserved, so no other worker is handed them
+        assert Sequence.objects.get(name='short_code').next_value == 3
+        assert BlockCodeGenerator(block_size=1).generate() not in used
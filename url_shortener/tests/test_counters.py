@@ -0,0 +1,180 @@
+from io import StringIO
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from url_shortener.clicks import ClickEvent, write_clicks
+from url_shortener import counters as counters_module
+from url_shortener.counters import FLUSH_SEQUENCE, MemoryCounterStore, RedisCounterStore, counters
+from url_shortener.models import Account, Sequence, ShortenedURL, URLAccess
+
+@pytest.fixture
+def memory_counters(settings):
+    settings.CLICK_COUNTERS = {**settings.CLICK_COUNTERS, 'BACKEND': 'memory', 'FLUSH_INTERVAL': None}
+    counters.reset()
+
+@pytest.fixture
+def redis_store(settings, fake_redis):
+    settings.CLICK_COUNTERS = {**settings.CLICK_COUNTERS, 'BACKEND': 'redis', 'FLUSH_INTERVAL': None}
+    counters.store = RedisCounterStore(fake_redis, 'test:clicks')
+    return counters.store
+
+@pytest.fixture
+def shortened():
+    account = Account.objects.create(user=User.objects.create_user(username='counteruser', password='testpass123'))
+    return ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='cnt1')
+
+def api_client(shortened):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=shortened.account.user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+class InterruptedStore(MemoryCounterStore):
+    """Redis-like store whose first write-back dies after committing"""
+    persistent = True
+    interrupted = False
+
+    def end_flush(self, batch):
+        if not self.interrupted:
+            self.interrupted = True
+            raise ConnectionError('lost the store after the UPDATE committed')
+        super().end_flush(batch)
+
+@pytest.mark.django_db
+class TestClickCounters:
+    def test_redirects_are_counted_outside_the_database(self, memory_counters, shortened):
+        for _ in range(3):
+            assert Client().get('/cnt1/').status_code == 302
+        shortened.refresh_from_db()
+        assert shortened.access_count == 0
+        assert URLAccess.objects.filter(url=shortened).count() == 3
+
+        client = api_client(shortened)
+        detail = client.get(reverse('shortenedurl-detail', args=['cnt1'])).json()
+        assert detail['access_count'] == 3
+        assert detail['last_accessed'] is not None
+        listed = client.get(reverse('shortenedurl-list')).json()
+        assert listed[0]['access_count'] == 3
+
+        assert counters.flush() == 1
+        shortened.refresh_from_db()
+        assert shortened.access_count == 3
+        assert shortened.last_accessed is not None
+        assert client.get(reverse('shortenedurl-detail', args=['cnt1'])).json()['access_count'] == 3
+
+    def test_interrupted_write_back_is_not_applied_twice(self, memory_counters, shortened):
+        counters.store = InterruptedStore()
+        counters.record(shortened.id, timezone.now())
+        counters.record(shortened.id, timezone.now())
+        with pytest.raises(ConnectionError):
+            counters.flush()
+        counters.record(shortened.id, timezone.now())
+        counters.flush()
+        shortened.refresh_from_db()
+        assert shortened.access_count == 3
+        assert counters.pending([shortened.id]) == {}
+
+    def test_counted_events_only_add_access_logs(self, shortened):
+        now = timezone.now()
+        write_clicks([
+            ClickEvent(shortened.id, now, '127.0.0.1', 'agent', True),
+            ClickEvent(shortened.id, now, '127.0.0.1', 'agent'),
+        ])
+        shortened.refresh_from_db()
+        assert shortened.access_count == 1
+        assert URLAccess.objects.filter(url=shortened).count() == 2
+
+    def test_without_a_store_clicks_are_counted_in_the_database(self, shortened):
+        Client().get('/cnt1/')
+        shortened.refresh_from_db()
+        assert shortened.access_count == 1
+        output = StringIO()
+        call_command('flush_click_counters', stdout=output)
+        assert 'nothing to write back' in output.getvalue()
+
+@pytest.mark.django_db
+class TestRedisCounterStore:
+    def record(self, shortened, times):
+        for _ in range(times):
+            counters.record(shortened.id, timezone.now())
+
+    def written_back(self, shortened):
+        shortened.refresh_from_db()
+        return shortened.access_count
+
+    def test_batches_are_numbered_from_the_sequence(self, redis_store, shortened):
+        self.record(shortened, 2)
+        assert counters.pending([shortened.id])[shortened.id][0] == 2
+        assert counters.flush() == 1
+        assert self.written_back(shortened) == 2
+        assert Sequence.objects.get(name=FLUSH_SEQUENCE).next_value == 2
+
+        # The batch number follows the database even if Redis lost its own
+        redis_store.redis.delete(redis_store.batch_key)
+        Sequence.objects.filter(name=FLUSH_SEQUENCE).update(next_value=7)
+        self.record(shortened, 1)
+        assert counters.flush() == 1
+        assert self.written_back(shortened) == 3
+        assert Sequence.objects.get(name=FLUSH_SEQUENCE).next_value == 8
+        assert int(redis_store.redis.get(redis_store.batch_key)) == 7
+        assert counters.pending([shortened.id]) == {}
+        assert not redis_store.redis.exists(redis_store.flushing_counts_key, redis_store.flushing_last_key)
+
+    def test_failure_before_commit_retries_the_batch(self, redis_store, shortened, monkeypatch):
+        self.record(shortened, 2)
+
+        def broken(clicks, batch_size):
+            raise ConnectionError('lost the database before the UPDATE committed')
+        monkeypatch.setattr(counters_module, 'write_back', broken)
+        with pytest.raises(ConnectionError):
+            counters.flush()
+        assert self.written_back(shortened) == 0
+        assert Sequence.objects.get(name=FLUSH_SEQUENCE).next_value == 1
+        # The batch stays aside and still counts as pending
+        assert counters.pending([shortened.id])[shortened.id][0] == 2
+
+        monkeypatch.undo()
+        self.record(shortened, 1)
+        assert counters.flush() == 2
+        assert self.written_back(shortened) == 3
+        assert counters.pending([shortened.id]) == {}
+
+    def test_failure_after_commit_is_not_applied_twice(self, redis_store, shortened, monkeypatch):
+        self.record(shortened, 2)
+        end_flush = redis_store.end_flush
+
+        def broken(batch):
+            raise ConnectionError('lost Redis after the UPDATE committed')
+        monkeypatch.setattr(redis_store, 'end_flush', broken)
+        with pytest.raises(ConnectionError):
+            counters.flush()
+        assert self.written_back(shortened) == 2
+        assert Sequence.objects.get(name=FLUSH_SEQUENCE).next_value == 2
+
+        # A restarted worker finds the same batch, skips its UPDATE and drops it
+        monkeypatch.setattr(redis_store, 'end_flush', end_flush)
+        self.record(shortened, 1)
+        assert counters.flush() == 1
+        assert self.written_back(shortened) == 3
+        assert counters.pending([shortened.id]) == {}
+
+    def test_clicks_during_a_write_back_go_to_the_next_batch(self, redis_store, shortened, monkeypatch):
+        self.record(shortened, 2)
+        write_back = counters_module.write_back
+
+        def with_clicks(clicks, batch_size):
+            # HINCRBY on the live hash while the renamed one is written back
+            self.record(shortened, 3)
+            assert counters.pending([shortened.id])[shortened.id][0] == 5
+            monkeypatch.setattr(counters_module, 'write_back', write_back)
+            write_back(clicks, batch_size)
+        monkeypatch.setattr(counters_module, 'write_back', with_clicks)
+        counters.flush()
+        assert self.written_back(shortened) == 5
+        assert Sequence.objects.get(name=FLUSH_SEQUENCE).next_value == 3
+        assert counters.pending([shortened.id]) == {}
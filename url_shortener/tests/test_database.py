@@ -0,0 +1,69 @@
+import pytest
+from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from shortenit.database import database_settings
+from url_shortener.sqlite import apply_pragmas
+
+BASE_DIR = Path('/srv/shortenit')
+
+def test_development_sqlite_is_unchanged():
+    databases, pragmas = database_settings({}, BASE_DIR)
+    assert databases == {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': '/srv/shortenit/db.sqlite3'}}
+    assert pragmas == {}
+
+def test_production_sqlite():
+    databases, pragmas = database_settings({
+        'SHORTENIT_DB_PROFILE': 'production', 'SHORTENIT_SQLITE_BUSY_TIMEOUT': '2000',
+    }, BASE_DIR)
+    default = databases['default']
+    assert default['CONN_MAX_AGE'] == 60
+    assert default['OPTIONS'] == {'timeout': 2.0, 'transaction_mode': 'IMMEDIATE'}
+    assert pragmas['journal_mode'] == 'WAL'
+    assert pragmas['synchronous'] == 'NORMAL'
+    assert pragmas['busy_timeout'] == 2000
+
+def test_production_postgresql_pool():
+    databases, pragmas = database_settings({
+        'SHORTENIT_DB_ENGINE': 'postgresql', 'SHORTENIT_DB_PROFILE': 'production',
+        'SHORTENIT_DB_HOST': 'db', 'SHORTENIT_DB_POOL_MAX_SIZE': '40',
+        'SHORTENIT_DB_REPLICA_HOSTS': 'replica-a, replica-b',
+    }, BASE_DIR)
+    default = databases['default']
+    assert default['ENGINE'] == 'django.db.backends.postgresql'
+    assert default['OPTIONS']['pool']['max_size'] == 40
+    assert 'CONN_MAX_AGE' not in default
+    assert pragmas == {}
+    assert databases['replica2']['HOST'] == 'replica-b'
+    assert databases['replica1']['TEST'] == {'MIRROR': 'default'}
+
+def test_production_postgresql_persistent_connections():
+    databases, _ = database_settings({
+        'SHORTENIT_DB_ENGINE': 'postgresql', 'SHORTENIT_DB_PROFILE': 'production', 'SHORTENIT_DB_POOL': '0',
+    }, BASE_DIR)
+    assert databases['default']['CONN_MAX_AGE'] == 60
+    assert databases['default']['CONN_HEALTH_CHECKS'] is True
+    assert 'OPTIONS' not in databases['default']
+
+@pytest.mark.parametrize('environ', [{'SHORTENIT_DB_PROFILE': 'fast'}, {'SHORTENIT_DB_ENGINE': 'mysql'}])
+def test_invalid_settings(environ):
+    with pytest.raises(ImproperlyConfigured):
+        database_settings(environ, BASE_DIR)
+
+def test_pragmas_applied_to_new_connections(settings, tmp_path, django_db_blocker):
+    databases, settings.SQLITE_PRAGMAS = database_settings({
+        'SHORTENIT_DB_PROFILE': 'production', 'SHORTENIT_DB_NAME': str(tmp_path / 'tuned.sqlite3'),
+    }, BASE_DIR)
+    tuned = connections.configure_settings({'default': databases['default']})['default']
+    connection = DatabaseWrapper(tuned, alias='tuned')
+    with django_db_blocker.unblock():
+        connection.ensure_connection()
+        try:
+            apply_pragmas(sender=DatabaseWrapper, connection=connection)
+            raw = connection.connection
+            assert raw.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            assert raw.execute('PRAGMA synchronous').fetchone()[0] == 1
+            assert raw.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+        finally:
+            connection.close()
@@ -0,0 +1,80 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from url_shortener.bulk import shorten_many
+from url_shortener.models import Account, ShortenedURL
+from url_shortener.normalize import normalize_url, url_hash
+from url_shortener import quota
+
+@pytest.fixture
+def dedup(settings):
+    settings.URL_SHORTENER_SETTINGS = {**settings.URL_SHORTENER_SETTINGS, 'DEDUPLICATE': True}
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='dedupuser', password='testpass123')
+    return Account.objects.create(user=user, daily_limit=5)
+
+@pytest.fixture
+def client(account):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=account.user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+@pytest.mark.parametrize('url, expected', [
+    ('example.com', 'https://example.com/'),
+    ('HTTPS://Example.COM:443/Path?b=2&a=1#top', 'https://example.com/Path?b=2&a=1'),
+    ('http://example.com:8080', 'http://example.com:8080/'),
+    ('https://user:pw@Example.com./x', 'https://user:pw@example.com/x'),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+def test_url_hash_ignores_cosmetic_differences():
+    assert url_hash('example.com') == url_hash('https://EXAMPLE.com/#section')
+    assert url_hash('https://example.com/a') != url_hash('https://example.com/A')
+
+@pytest.mark.django_db
+class TestDeduplication:
+    def test_save_fills_url_hash(self, account):
+        shortened = ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='h1')
+        assert shortened.url_hash == url_hash('https://example.com')
+
+    def test_disabled_creates_duplicates(self, client, account):
+        for _ in range(2):
+            assert client.post(reverse('shortenedurl-list'), {'original_url': 'https://example.com'}).status_code == 201
+        assert ShortenedURL.objects.filter(account=account).count() == 2
+
+    def test_api_returns_existing_link(self, dedup, client, account):
+        first = client.post(reverse('shortenedurl-list'), {'original_url': 'https://example.com'})
+        second = client.post(reverse('shortenedurl-list'), {'original_url': 'https://EXAMPLE.com/'})
+        assert first.status_code == 201
+        assert second.status_code == 200
+        assert second.json()['short_code'] == first.json()['short_code']
+        assert ShortenedURL.objects.filter(account=account).count() == 1
+        assert quota.used_today(account) == 1
+
+    def test_other_accounts_get_their_own_link(self, dedup, client, account):
+        other = Account.objects.create(user=User.objects.create_user(username='other', password='testpass123'))
+        ShortenedURL.objects.create(account=other, original_url='https://example.com', short_code='o1')
+        assert client.post(reverse('shortenedurl-list'), {'original_url': 'https://example.com'}).status_code == 201
+
+    def test_form_reuses_link(self, dedup, account):
+        ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='f1')
+        client = APIClient()
+        client.login(username='dedupuser', password='testpass123')
+        client.post(reverse('shorten_url'), {'original_url': 'example.com'})
+        assert ShortenedURL.objects.filter(account=account).count() == 1
+        assert quota.used_today(account) == 0
+
+    def test_bulk_reuses_existing_and_repeated_urls(self, dedup, account):
+        existing = ShortenedURL.objects.create(account=account, original_url='https://a.com', short_code='b1')
+        created = shorten_many(account, ['https://a.com', 'https://b.com', 'https://B.com/', 'https://c.com'])
+        assert created[0] == existing
+        assert created[1] == created[2]
+        assert len({shortened.pk for shortened in created}) == 3
+        assert created[1].url_hash == url_hash('https://b.com')
+        assert quota.used_today(account) == 2
@@ -0,0 +1,76 @@
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from url_shortener.models import Account, ShortenedURL, URLAccess
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='exportuser', password='testpass123')
+    return Account.objects.create(user=user)
+
+@pytest.fixture
+def client(account):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=account.user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+@pytest.fixture
+def clicks(account):
+    shortened = ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='exp1')
+    now = timezone.now()
+    for days in [0, 1, 10]:
+        access = URLAccess.objects.create(url=shortened, ip_address='127.0.0.1', user_agent='agent, "quoted"')
+        URLAccess.objects.filter(pk=access.pk).update(accessed_at=now - timedelta(days=days))
+    other = Account.objects.create(user=User.objects.create_user(username='other', password='testpass123'))
+    foreign = ShortenedURL.objects.create(account=other, original_url='https://other.com', short_code='exp2')
+    URLAccess.objects.create(url=foreign)
+    return shortened
+
+def read(response):
+    return b''.join(response.streaming_content)
+
+@pytest.mark.django_db
+class TestExport:
+    def test_links_csv(self, client, clicks):
+        response = client.get('/api/export/links/')
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        assert response['Content-Disposition'].startswith('attachment; filename="links-')
+        rows = list(csv.reader(io.StringIO(read(response).decode())))
+        assert rows[0] == ['short_code', 'original_url', 'created_at', 'last_accessed', 'access_count']
+        assert [row[0] for row in rows[1:]] == ['exp1']
+
+    def test_clicks_ndjson_only_for_own_account(self, client, clicks):
+        response = client.get('/api/export/clicks/', {'file_format': 'ndjson'})
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = [json.loads(line) for line in read(response).decode().splitlines()]
+        assert len(rows) == 3
+        assert {row['short_code'] for row in rows} == {'exp1'}
+        assert rows[0]['user_agent'] == 'agent, "quoted"'
+        assert rows[0]['ip_address'] == '127.0.0.1'
+        assert rows[0]['device'] == 'other'
+
+    def test_date_range(self, client, clicks):
+        start = (timezone.now() - timedelta(days=2)).date().isoformat()
+        response = client.get('/api/export/clicks/', {'file_format': 'ndjson', 'start': start})
+        assert len(read(response).decode().splitlines()) == 2
+
+    def test_gzip(self, client, clicks):
+        response = client.get('/api/export/clicks/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert response['Content-Encoding'] == 'gzip'
+        rows = list(csv.reader(io.StringIO(gzip.decompress(read(response)).decode())))
+        assert len(rows) == 4
+
+    def test_csv_accept_header(self, client, clicks):
+        assert client.get('/api/export/links/', HTTP_ACCEPT='text/csv').status_code == 200
+
+    def test_invalid_format(self, client):
+        assert client.get('/api/export/links/', {'file_format': 'xml'}).status_code == 400
@@ -0,0 +1,37 @@
+import pytest
+from types import SimpleNamespace
+from django.contrib.auth.models import User
+from django.db import connection
+from url_shortener.models import Account, ShortenedURL, URLAccess
+from url_shortener.pagination import get_page_size
+from url_shortener.views import URLAccessViewSet
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='Query plans are asserted in SQLite EXPLAIN format'
+)
+
+@pytest.fixture
+def shortened():
+    user = User.objects.create_user(username='indexuser', password='testpass123')
+    account = Account.objects.create(user=user)
+    return ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='abc123')
+
+@pytest.mark.django_db
+class TestQueryPlans:
+    def test_url_list_uses_account_created_index(self, shortened):
+        plan = ShortenedURL.objects.filter(account=shortened.account).order_by('-created_at').explain()
+        assert 'url_account_created_idx' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    def test_url_access_log_uses_url_accessed_index(self, shortened):
+        plan = URLAccess.objects.filter(url=shortened).order_by('-accessed_at').explain()
+        assert 'access_url_accessed_idx' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    def test_analytics_page_uses_account_accessed_index(self, shortened):
+        view = URLAccessViewSet(request=SimpleNamespace(user=shortened.account.user))
+        # The first page exactly as URLAccessPagination fetches it
+        queryset = view.get_queryset().order_by('-accessed_at', '-id')[:get_page_size(None) + 1]
+        plan = queryset.explain()
+        assert 'access_account_accessed_idx' in plan
+        assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,71 @@
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from url_shortener.models import Account, ShortenedURL
+from url_shortener import metrics
+
+@pytest.fixture
+def metrics_enabled(settings):
+    settings.METRICS = {'ENABLED': True, 'SERVER_TIMING': True}
+    metrics.registry.clear()
+    yield
+    metrics.registry.clear()
+
+@pytest.fixture
+def shortened():
+    user = User.objects.create_user(username='metricsuser', password='testpass123')
+    account = Account.objects.create(user=user)
+    return ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='abc123')
+
+@pytest.mark.django_db
+class TestMetricsMiddleware:
+    def test_disabled_adds_nothing(self, shortened):
+        response = APIClient().get('/abc123/')
+        assert 'Server-Timing' not in response
+        assert metrics.registry.views == {}
+
+    def test_server_timing_header(self, metrics_enabled, shortened):
+        response = APIClient().get('/abc123/')
+        assert response.status_code == 302
+        timing = response['Server-Timing']
+        assert timing.startswith('db;dur=')
+        assert 'cache;desc="0 hits, 1 misses"' in timing
+        assert 'total;dur=' in timing
+
+    def test_counts_queries_and_cache_per_view(self, metrics_enabled, shortened):
+        client = APIClient()
+        client.get('/abc123/')
+        client.get('/abc123/')
+        stats = metrics.registry.views['redirect']
+        assert stats.requests == 2
+        assert stats.cache_hits == 1
+        assert stats.cache_misses == 1
+        # Lookup on the miss plus the inline click writes of the test settings
+        assert stats.queries >= 1
+
+        client.get('/nope42/')
+        assert 'redirect' in metrics.registry.views
+        assert metrics.registry.views['redirect'].requests == 3
+
+    def test_endpoint_requires_admin(self, metrics_enabled, shortened):
+        client = APIClient()
+        assert client.get('/api/metrics/').status_code == 401
+
+        token = Token.objects.create(user=shortened.account.user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert client.get('/api/metrics/').status_code == 403
+
+    def test_endpoint_renders_prometheus_text(self, metrics_enabled, shortened):
+        admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        client = APIClient()
+        client.get('/abc123/')
+        client.force_login(admin)
+        response = client.get('/api/metrics/')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.content.decode()
+        assert '# TYPE shortenit_requests_total counter' in body
+        assert 'shortenit_requests_total{view="redirect"} 1' in body
+        assert 'shortenit_cache_requests_total{view="redirect",result="miss"} 1' in body
+        assert 'shortenit_request_duration_seconds_bucket{view="redirect",le="+Inf"} 1' in body
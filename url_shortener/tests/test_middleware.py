@@ -0,0 +1,53 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from rest_framework.test import APIClient
+from url_shortener.models import Account, ShortenedURL, URLAccess
+from url_shortener.middleware import RedirectFastPathMiddleware, reserved_segments
+
+@pytest.fixture
+def shortened():
+    user = User.objects.create_user(username='fastuser', password='testpass123')
+    account = Account.objects.create(user=user)
+    return ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='abc123')
+
+@pytest.mark.django_db
+class TestRedirectFastPath:
+    def test_redirect_skips_the_rest_of_the_stack(self, shortened):
+        response = APIClient().get('/abc123/')
+        assert response.status_code == 302
+        assert response['Location'] == 'https://example.com'
+        # Added by XFrameOptionsMiddleware to every response that reaches it
+        assert 'X-Frame-Options' not in response
+        assert URLAccess.objects.filter(url=shortened).exists()
+
+    def test_cache_hit_needs_no_query(self, shortened):
+        client = APIClient()
+        client.get('/abc123/')
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get('/abc123/').status_code == 302
+        # Only the inline click write of the test settings
+        assert all('url_shortener_shortenedurl"."short_code' not in query['sql'] for query in queries)
+
+    def test_unknown_code_keeps_drf_404(self):
+        response = APIClient().get('/nope42/')
+        assert response.status_code == 404
+        assert response.json() == {'detail': 'Not found.'}
+
+    def test_other_routes_and_methods_fall_through(self, shortened):
+        client = APIClient()
+        assert client.get('/login/').status_code == 200
+        assert client.post('/abc123/').status_code == 405
+
+    def test_reserved_segments(self):
+        assert reserved_segments(get_resolver().url_patterns) == {
+            'admin', 'api', 'urls', 'shorten', 'login', 'register', 'logout'
+        }
+
+    def test_can_be_disabled(self, settings):
+        settings.URL_SHORTENER_SETTINGS = {**settings.URL_SHORTENER_SETTINGS, 'REDIRECT_FAST_PATH': False}
+        with pytest.raises(MiddlewareNotUsed):
+            RedirectFastPathMiddleware(lambda request: None)
@@ -0,0 +1,126 @@
+import re
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from url_shortener.models import Account, ShortenedURL, URLAccess
+from url_shortener.pagination import KeysetPaginator
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='pageuser', password='testpass123')
+    return Account.objects.create(user=user)
+
+@pytest.fixture
+def urls(account):
+    # Pairs of rows share a timestamp so the id tie-breaker is exercised
+    start = timezone.now()
+    created = []
+    for index in range(7):
+        shortened = ShortenedURL.objects.create(
+            account=account, original_url=f'https://example{index}.com', short_code=f'code{index}'
+        )
+        created.append(shortened)
+    for index, shortened in enumerate(created):
+        ShortenedURL.objects.filter(pk=shortened.pk).update(created_at=start + timedelta(seconds=index // 2))
+    return list(ShortenedURL.objects.order_by('-created_at', '-id'))
+
+def next_link(response):
+    match = re.search(r'<([^>]+)>; rel="next"', response.get('Link', ''))
+    return match and match.group(1)
+
+@pytest.mark.django_db
+class TestKeysetPaginator:
+    def test_walks_forward_and_back(self, urls):
+        paginator = KeysetPaginator('created_at', 3)
+        queryset = ShortenedURL.objects.all()
+
+        first, next_cursor, previous_cursor = paginator.page(queryset)
+        assert first == urls[:3] and previous_cursor is None
+        second, next_cursor, previous_cursor = paginator.page(queryset, next_cursor)
+        assert second == urls[3:6]
+        third, last_cursor, _ = paginator.page(queryset, next_cursor)
+        assert third == urls[6:] and last_cursor is None
+
+        back, _, newer_cursor = paginator.page(queryset, previous_cursor)
+        assert back == urls[:3] and newer_cursor is None
+
+    def test_pages_are_stable_under_inserts(self, urls, account):
+        paginator = KeysetPaginator('created_at', 3)
+        _, next_cursor, _ = paginator.page(ShortenedURL.objects.all())
+        newest = ShortenedURL.objects.create(account=account, original_url='https://new.com', short_code='newest')
+        ShortenedURL.objects.filter(pk=newest.pk).update(created_at=timezone.now() + timedelta(hours=1))
+        second, _, _ = paginator.page(ShortenedURL.objects.all(), next_cursor)
+        assert second == urls[3:6]
+
+@pytest.mark.django_db
+class TestListPagination:
+    def test_api_list_uses_link_header(self, urls, account):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=account.user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        codes = []
+        url = reverse('shortenedurl-list') + '?page_size=3'
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            codes += [item['short_code'] for item in response.json()]
+            url = next_link(response)
+        assert codes == [shortened.short_code for shortened in urls]
+
+    def test_invalid_cursor_is_404(self, urls, account):
+        client = APIClient()
+        client.force_login(account.user)
+        assert client.get(reverse('shortenedurl-list') + '?cursor=garbage').status_code == 404
+        assert client.get(reverse('url_list') + '?cursor=garbage').status_code == 404
+
+    def test_url_list_template_pages(self, urls, account, settings):
+        settings.URL_SHORTENER_SETTINGS = {**settings.URL_SHORTENER_SETTINGS, 'PAGE_SIZE': 5}
+        client = APIClient()
+        client.force_login(account.user)
+        response = client.get(reverse('url_list'))
+        assert len(response.context['urls']) == 5
+        response = client.get(reverse('url_list') + f"?cursor={response.context['next_cursor']}")
+        assert [url.short_code for url in response.context['urls']] == [url.short_code for url in urls[5:]]
+
+    def test_url_list_links_keep_page_size(self, urls, account):
+        client = APIClient()
+        client.force_login(account.user)
+        response = client.get(reverse('url_list') + '?page_size=3')
+        assert f"?cursor={response.context['next_cursor']}&amp;page_size=3" in response.content.decode()
+        response = client.get(reverse('url_list') + f"?cursor={response.context['next_cursor']}&page_size=3")
+        assert [url.short_code for url in response.context['urls']] == [url.short_code for url in urls[3:6]]
+
+    @pytest.mark.skipif(connection.vendor != 'sqlite', reason='Query plans are asserted in SQLite EXPLAIN format')
+    def test_analytics_pages_are_one_index_range(self, urls, account):
+        for shortened in urls[:3]:
+            for _ in range(3):
+                URLAccess.objects.create(url=shortened, ip_address='127.0.0.1')
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=account.user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        ids = []
+        url = reverse('urlaccess-list') + '?page_size=4'
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = client.get(url)
+                ids += [item['id'] for item in response.json()]
+                url = next_link(response)
+        assert ids == list(URLAccess.objects.order_by('-accessed_at', '-id').values_list('id', flat=True))
+
+        pages = [query['sql'] for query in queries if 'FROM "url_shortener_urlaccess"' in query['sql']]
+        assert len(pages) == 3
+        for sql in pages:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            # Deep cursors included: no page reads and sorts the account's whole history
+            assert 'access_account_accessed_idx' in plan
+            assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,52 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from url_shortener.models import Account, DailyUsage
+from url_shortener import quota
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='quotauser', password='testpass123')
+    return Account.objects.create(user=user, daily_limit=2)
+
+@pytest.mark.django_db
+class TestQuota:
+    def test_reserve_stops_at_daily_limit(self, account):
+        assert quota.reserve(account)
+        assert quota.reserve(account)
+        assert not quota.reserve(account)
+        assert quota.used_today(account) == 2
+        assert quota.remaining(account) == 0
+
+    def test_reserve_is_a_single_update_once_the_row_exists(self, account):
+        quota.reserve(account)
+        with CaptureQueriesContext(connection) as queries:
+            quota.reserve(account)
+        assert len(queries) == 1
+
+    def test_release_returns_quota(self, account):
+        quota.reserve(account, 2)
+        quota.release(account)
+        assert quota.remaining(account) == 1
+        assert not quota.reserve(account, 2)
+
+    def test_release_never_goes_negative(self, account):
+        quota.reserve(account)
+        quota.release(account, 5)
+        assert DailyUsage.objects.get(account=account).count == 0
+
+    def test_api_delete_frees_quota(self, account):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=account.user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = reverse('shortenedurl-list')
+        first = client.post(url, {'original_url': 'https://example1.com'})
+        client.post(url, {'original_url': 'https://example2.com'})
+        assert client.post(url, {'original_url': 'https://example3.com'}).status_code == 400
+
+        client.delete(reverse('shortenedurl-detail', args=[first.json()['short_code']]))
+        assert client.post(url, {'original_url': 'https://example3.com'}).status_code == 201
@@ -0,0 +1,153 @@
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from url_shortener.models import Account, ShortenedURL
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+from url_shortener.ratelimit import Limit, MemoryRateLimiter, RateLimiter, RedisRateLimiter, get_ident, parse_rate, retry_after
+
+@pytest.fixture
+def rates(settings):
+    def set_rates(**rates):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+        }
+    return set_rates
+
+@pytest.fixture
+def shortened():
+    user = User.objects.create_user(username='limituser', password='testpass123')
+    account = Account.objects.create(user=user)
+    return ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='abc123')
+
+def test_parse_rate():
+    assert parse_rate('300/minute') == (300, 60)
+    assert parse_rate('5/s') == (5, 1)
+    assert parse_rate(None) is None
+
+def test_retry_after_waits_for_previous_window_to_decay():
+    # 10 requests in the previous minute, none yet in this one, limit 10
+    assert retry_after(10, 60, 0, 10, 0) == pytest.approx(6)
+    assert retry_after(10, 60, 10, 0, 15) == 45
+
+def test_ident_ignores_forwarded_for_without_proxies(settings):
+    request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4, 5.6.7.8')
+    assert get_ident(request) == '10.0.0.1'
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+    assert get_ident(request) == '5.6.7.8'
+
+class TestMemoryRateLimiter:
+    def test_limits_per_key(self):
+        limiter = MemoryRateLimiter()
+        limit = Limit('redirect_ip:1.2.3.4', 3, 60)
+        assert [limiter.hit([limit]) for _ in range(3)] == [None, None, None]
+        assert limiter.hit([limit]) > 0
+        assert limiter.hit([Limit('redirect_ip:5.6.7.8', 3, 60)]) is None
+
+    def test_rejected_request_is_not_counted_anywhere(self):
+        limiter = MemoryRateLimiter()
+        tight = Limit('redirect_code:abc', 1, 60)
+        loose = Limit('redirect_ip:1.2.3.4', 10, 60)
+        assert limiter.hit([loose, tight]) is None
+        assert limiter.hit([loose, tight]) is not None
+        assert limiter.windows['redirect_ip:1.2.3.4'][1] == 1
+
+class TestRedisRateLimiter:
+    def count(self, limiter, limit):
+        calls, _ = limiter.arguments([limit])
+        return int(limiter.redis.get(calls[0][0][0]) or 0)
+
+    def test_limits_per_key(self, fake_redis):
+        limiter = RedisRateLimiter(fake_redis)
+        limit = Limit('redirect_ip:1.2.3.4', 3, 60)
+        assert [limiter.hit([limit]) for _ in range(3)] == [None, None, None]
+        assert 0 < limiter.hit([limit]) <= 60
+        assert self.count(limiter, limit) == 3
+        assert limiter.hit([Limit('redirect_ip:5.6.7.8', 3, 60)]) is None
+
+    def test_rejected_request_is_not_counted_anywhere(self, fake_redis):
+        limiter = RedisRateLimiter(fake_redis)
+        tight = Limit('redirect_code:abc', 1, 60)
+        loose = Limit('redirect_ip:1.2.3.4', 10, 60)
+        assert limiter.hit([loose, tight]) is None
+        assert limiter.hit([loose, tight]) is not None
+        assert self.count(limiter, loose) == 1
+        assert self.count(limiter, tight) == 1
+
+    def test_previous_window_counts(self, fake_redis, monkeypatch):
+        limiter = RedisRateLimiter(fake_redis)
+        limit = Limit('api_key:abc', 10, 60)
+        # The start of a minute, with 10 requests in the one before
+        monkeypatch.setattr('url_shortener.ratelimit.time.time', lambda: 120.0)
+        calls, _ = limiter.arguments([limit])
+        fake_redis.set(calls[0][0][1], 10)
+        assert limiter.hit([limit]) == pytest.approx(6)
+        assert self.count(limiter, limit) == 0
+
+    def test_async_checks_share_the_counters(self, fake_redis, fake_async_redis):
+        limiter = RedisRateLimiter(fake_redis)
+        tight = Limit('redirect_code:abc', 2, 60)
+        loose = Limit('redirect_ip:1.2.3.4', 10, 60)
+        assert limiter.hit([loose, tight]) is None
+        assert async_to_sync(limiter.ahit)([loose, tight], fake_async_redis) is None
+        assert async_to_sync(limiter.ahit)([loose, tight], fake_async_redis) is not None
+        assert self.count(limiter, loose) == 2
+
+class TestRateLimiterFallback:
+    def test_falls_back_to_memory_when_redis_fails(self):
+        class BrokenRedis:
+            def hit(self, limits):
+                raise ConnectionError('redis down')
+
+        limiter = RateLimiter()
+        limiter.redis = BrokenRedis()
+        limit = Limit('api_key:abc', 1, 60)
+        assert limiter.hit([limit]) is None
+        assert limiter.backend() is limiter.memory
+        assert limiter.hit([limit]) is not None
+
+@pytest.mark.django_db
+class TestRedirectRateLimit:
+    def test_ip_limit_returns_429(self, rates, shortened):
+        rates(redirect_ip='2/minute')
+        client = APIClient()
+        assert client.get('/abc123/').status_code == 302
+        assert client.get('/abc123/').status_code == 302
+        response = client.get('/abc123/')
+        assert response.status_code == 429
+        assert int(response['Retry-After']) >= 1
+        assert shortened.access_logs.count() == 2
+
+    def test_forwarded_for_does_not_reset_the_ip_limit(self, rates, shortened):
+        rates(redirect_ip='1/minute')
+        client = APIClient()
+        assert client.get('/abc123/', HTTP_X_FORWARDED_FOR='1.1.1.1').status_code == 302
+        assert client.get('/abc123/', HTTP_X_FORWARDED_FOR='2.2.2.2').status_code == 429
+
+    def test_unknown_codes_are_counted_once(self, rates):
+        rates(redirect_ip='2/minute')
+        client = APIClient()
+        assert client.get('/nope01/').status_code == 404
+        assert client.get('/nope02/').status_code == 404
+        assert client.get('/nope03/').status_code == 429
+
+    def test_view_throttles_without_fast_path(self, rates, settings, shortened):
+        settings.URL_SHORTENER_SETTINGS = {**settings.URL_SHORTENER_SETTINGS, 'REDIRECT_FAST_PATH': False}
+        rates(redirect_code='1/minute')
+        client = APIClient()
+        assert client.get('/abc123/').status_code == 302
+        response = client.get('/abc123/')
+        assert response.status_code == 429
+        assert 'Retry-After' in response
+
+@pytest.mark.django_db
+def test_api_key_limit(rates, shortened):
+    rates(api_key='2/minute')
+    token = Token.objects.create(user=shortened.account.user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    assert client.get('/api/urls/').status_code == 200
+    assert client.get('/api/urls/').status_code == 200
+    assert client.get('/api/urls/').status_code == 429
@@ -0,0 +1,53 @@
+import gzip
+import json
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from url_shortener.models import Account, ShortenedURL, URLAccess
+from url_shortener.retention import boundary_id
+
+@pytest.fixture
+def accesses():
+    user = User.objects.create_user(username='retentionuser', password='testpass123')
+    account = Account.objects.create(user=user)
+    shortened = ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='abc123')
+    now = timezone.now()
+    rows = []
+    for days_ago in [200, 150, 120, 100, 30, 1]:
+        access = URLAccess.objects.create(url=shortened, ip_address='127.0.0.1', user_agent='test-agent')
+        URLAccess.objects.filter(pk=access.pk).update(accessed_at=now - timedelta(days=days_ago))
+        rows.append(access)
+    return rows
+
+@pytest.mark.django_db
+class TestPruneAccessLogs:
+    def test_boundary_id(self, accesses):
+        cutoff = timezone.now() - timedelta(days=90)
+        assert boundary_id(cutoff) == accesses[4].id
+
+    def test_deletes_old_rows_in_batches(self, accesses):
+        call_command('prune_access_logs', '--days', '90', '--batch-size', '2', '--pause', '0', stdout=StringIO())
+        assert list(URLAccess.objects.order_by('id').values_list('id', flat=True)) == [a.id for a in accesses[4:]]
+
+    def test_archives_before_deleting(self, accesses, tmp_path):
+        call_command(
+            'prune_access_logs', '--days', '90', '--archive-dir', str(tmp_path), '--pause', '0',
+            stdout=StringIO()
+        )
+        files = sorted(tmp_path.rglob('*.ndjson.gz'))
+        assert len(files) == 4
+        with gzip.open(files[0], 'rt') as archive:
+            record = json.loads(archive.readline())
+        assert record['id'] == accesses[0].id
+        assert record['short_code'] == 'abc123'
+
+    def test_csv_archive_has_header(self, accesses, tmp_path):
+        call_command(
+            'prune_access_logs', '--days', '90', '--archive-dir', str(tmp_path), '--format', 'csv',
+            '--pause', '0', stdout=StringIO()
+        )
+        with gzip.open(sorted(tmp_path.rglob('*.csv.gz'))[0], 'rt') as archive:
+            assert archive.readline().strip() == 'id,url_id,short_code,accessed_at,ip_address,user_agent'
@@ -0,0 +1,87 @@
+import pytest
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from url_shortener.models import Account, ShortenedURL, URLAccess, ClickStatHourly, ClickStatDaily
+from url_shortener.clicks import ClickEvent, write_clicks
+
+NOON = datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc)
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='statsuser', password='testpass123')
+    return Account.objects.create(user=user)
+
+@pytest.fixture
+def links(account):
+    return [
+        ShortenedURL.objects.create(account=account, original_url=f'https://example{i}.com', short_code=f'stat{i}')
+        for i in range(3)
+    ]
+
+@pytest.fixture
+def client(account):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=account.user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+def click(url, at):
+    return ClickEvent(url.id, at, '127.0.0.1', 'test-agent')
+
+@pytest.mark.django_db
+class TestRollups:
+    def test_click_batches_update_rollups(self, links):
+        write_clicks([click(links[0], NOON), click(links[0], NOON + timedelta(minutes=10))])
+        write_clicks([click(links[0], NOON + timedelta(hours=1))])
+        hourly = dict(ClickStatHourly.objects.filter(url=links[0]).values_list('hour', 'count'))
+        assert hourly == {NOON.replace(minute=0): 2, NOON.replace(minute=0) + timedelta(hours=1): 1}
+        assert ClickStatDaily.objects.get(url=links[0]).count == 3
+
+    def test_backfill_matches_access_log(self, links):
+        for offset in range(5):
+            access = URLAccess.objects.create(url=links[offset % 2])
+            URLAccess.objects.filter(pk=access.pk).update(accessed_at=NOON + timedelta(hours=offset * 6))
+        ClickStatDaily.objects.create(url=links[0], date=NOON.date(), count=99)
+
+        call_command('backfill_click_stats', '--since', '2024-05-01', '--until', '2024-05-04', stdout=StringIO())
+
+        daily = {(row.url_id, row.date): row.count for row in ClickStatDaily.objects.all()}
+        assert daily == {
+            (links[0].id, NOON.date()): 1,
+            (links[1].id, NOON.date()): 1,
+            (links[0].id, NOON.date() + timedelta(days=1)): 2,
+            (links[1].id, NOON.date() + timedelta(days=1)): 1,
+        }
+        assert ClickStatHourly.objects.count() == 5
+
+@pytest.mark.django_db
+class TestClickStatsAPI:
+    def test_timeseries(self, client, links):
+        write_clicks([click(links[0], NOON), click(links[0], NOON + timedelta(days=1))])
+        response = client.get(reverse('clickstats-timeseries'), {
+            'short_code': 'stat0', 'start': '2024-05-01', 'end': '2024-05-02'
+        })
+        assert response.status_code == 200
+        assert response.json()['series'] == [
+            {'bucket': '2024-05-01', 'clicks': 1},
+            {'bucket': '2024-05-02', 'clicks': 1},
+        ]
+
+    def test_timeseries_hidden_for_other_accounts(self, client):
+        other = Account.objects.create(user=User.objects.create_user(username='other', password='x'))
+        ShortenedURL.objects.create(account=other, original_url='https://other.com', short_code='theirs')
+        response = client.get(reverse('clickstats-timeseries'), {'short_code': 'theirs'})
+        assert response.status_code == 404
+
+    def test_top_links(self, client, links):
+        write_clicks([click(links[2], NOON)] * 3 + [click(links[1], NOON)])
+        response = client.get(reverse('clickstats-top'), {'start': '2024-04-01', 'end': '2024-05-31', 'limit': 2})
+        assert response.json() == [
+            {'short_code': 'stat2', 'original_url': 'https://example2.com', 'clicks': 3},
+            {'short_code': 'stat1', 'original_url': 'https://example1.com', 'clicks': 1},
+        ]
@@ -0,0 +1,103 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from url_shortener.cache import aresolve_short_code, resolve_short_code
+from url_shortener.models import Account, DailyUsage, ShortenedURL, URLAccess
+from url_shortener.routers import ReplicaRouter, end_request, is_pinned, pin_key, replica_reads, start_request
+
+pytestmark = pytest.mark.django_db(databases=['default', 'replica'])
+
+@pytest.fixture
+def replica(settings):
+    settings.DATABASE_REPLICAS = ['replica']
+
+@pytest.fixture
+def account():
+    user = User.objects.create_user(username='replicauser', password='testpass123')
+    return Account.objects.create(user=user)
+
+@pytest.fixture
+def mirrored(account):
+    """Copy the account to the replica, as replication would (without signals)"""
+    User.objects.using('replica').bulk_create([account.user])
+    Account.objects.using('replica').bulk_create([account])
+    return account
+
+def replicate(obj):
+    type(obj).objects.using('replica').bulk_create([obj])
+    return obj
+
+@pytest.fixture
+def client(mirrored):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=mirrored.user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+def test_routing(replica):
+    router = ReplicaRouter()
+    assert router.db_for_read(ShortenedURL) == 'default'
+    with replica_reads():
+        assert router.db_for_read(ShortenedURL) == 'replica'
+        assert router.db_for_write(ShortenedURL) == 'default'
+    assert not router.allow_migrate('replica', 'url_shortener')
+
+def test_without_replicas_reads_stay_on_primary():
+    with replica_reads() as used:
+        assert not used
+        assert ReplicaRouter().db_for_read(ShortenedURL) == 'default'
+
+def test_redirect_reads_replica(replica, mirrored):
+    replicate(ShortenedURL(id=1, account=mirrored, original_url='https://replica.example.com', short_code='rep1'))
+    # A request of its own: this test's setup wrote to the primary
+    response = Client().get('/rep1/')
+    assert response['Location'] == 'https://replica.example.com'
+
+def test_new_link_falls_back_to_primary(replica, account):
+    shortened = ShortenedURL.objects.create(account=account, original_url='https://example.com', short_code='rep2')
+    assert resolve_short_code('rep2') == (shortened.id, 'https://example.com')
+    assert async_to_sync(aresolve_short_code)('rep2') == (shortened.id, 'https://example.com')
+
+def test_updated_link_is_pinned_to_primary(replica, mirrored):
+    shortened = ShortenedURL.objects.create(account=mirrored, original_url='https://new.example.com', short_code='rep3')
+    replicate(ShortenedURL(id=shortened.id, account=mirrored, original_url='https://old.example.com', short_code='rep3'))
+    assert Client().get('/rep3/')['Location'] == 'https://new.example.com'
+
+def test_analytics_reads_replica(replica, client, mirrored):
+    shortened = replicate(ShortenedURL(id=1, account=mirrored, original_url='https://example.com', short_code='rep4'))
+    replicate(URLAccess(url=shortened, account=mirrored, ip_address='127.0.0.1'))
+    response = client.get('/api/analytics/')
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert not URLAccess.objects.exists()
+
+def test_user_reads_own_writes(replica, client, mirrored):
+    browser = APIClient()
+    browser.force_login(mirrored.user)
+    assert b'https://example.com' not in browser.get('/urls/').content
+    assert client.post('/api/urls/', {'original_url': 'https://example.com'}).status_code == 201
+    # The replica has not seen the new link, but its creator reads the primary for a while
+    assert not ShortenedURL.objects.using('replica').exists()
+    assert b'https://example.com' in browser.get('/urls/').content
+
+def test_only_writes_to_replicated_models_pin(replica):
+    router = ReplicaRouter()
+    token = start_request()
+    router.db_for_write(Session)
+    router.db_for_write(DailyUsage)
+    assert not is_pinned()
+    router.db_for_write(ShortenedURL)
+    assert is_pinned()
+    end_request(token)
+
+def test_home_page_visits_do_not_pin(replica, mirrored):
+    browser = Client()
+    browser.force_login(mirrored.user)
+    # home() stores the daily limit in the session on every visit
+    assert browser.get('/').status_code == 200
+    assert cache.get(pin_key(f'user:{mirrored.user.pk}')) is None
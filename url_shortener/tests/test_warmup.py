@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from url_shortener.cache import AsyncSingleFlight, SingleFlight, get_cached_url, local_cache, resolve_short_code
+from url_shortener.models import Account, ClickStatDaily, ShortenedURL
+from url_shortener.startup import on_first_request
+from url_shortener.warmup import hot_urls, warm
+
+@pytest.fixture
+def links():
+    account = Account.objects.create(user=User.objects.create_user(username='warmuser', password='testpass123'))
+    now = timezone.now()
+    return [
+        ShortenedURL.objects.create(
+            account=account, original_url=f'https://example.com/{index}', short_code=f'warm{index}',
+            access_count=index, last_accessed=now - timedelta(hours=index)
+        )
+        for index in range(5)
+    ]
+
+@pytest.mark.django_db
+class TestWarmup:
+    def test_hot_urls_by_access_count(self, links):
+        assert [row[0] for row in hot_urls(2)] == ['warm4', 'warm3']
+
+    def test_hot_urls_by_last_accessed(self, links):
+        assert [row[0] for row in hot_urls(2, 'last_accessed')] == ['warm0', 'warm1']
+
+    def test_hot_urls_by_rollups(self, links):
+        today = timezone.now().date()
+        ClickStatDaily.objects.create(url=links[1], date=today, count=3)
+        ClickStatDaily.objects.create(url=links[1], date=today - timedelta(days=1), count=3)
+        ClickStatDaily.objects.create(url=links[2], date=today, count=5)
+        ClickStatDaily.objects.create(url=links[3], date=today - timedelta(days=30), count=50)
+        assert list(hot_urls(5, 'rollups')) == [
+            ('warm1', links[1].id, 'https://example.com/1'),
+            ('warm2', links[2].id, 'https://example.com/2'),
+        ]
+
+    def test_warm_fills_both_tiers(self, links):
+        assert warm(3, batch_size=2) == 3
+        assert get_cached_url('warm4') == (links[4].id, 'https://example.com/4')
+        assert local_cache.get('warm2') == (links[2].id, 'https://example.com/2')
+        assert get_cached_url('warm1') is None
+        with CaptureQueriesContext(connection) as queries:
+            resolve_short_code('warm3')
+        assert len(queries) == 0
+
+    def test_command(self, links):
+        out = StringIO()
+        call_command('warm_url_cache', '--limit', '2', '--source', 'last_accessed', stdout=out)
+        assert 'Loaded 2 short codes' in out.getvalue()
+        assert get_cached_url('warm0') is not None
+
+def test_on_first_request_runs_once():
+    calls = []
+    receiver = on_first_request(lambda: calls.append(1))
+    threads = [threading.Thread(target=receiver, args=(None,)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    receiver(None)
+    assert calls == [1]
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'value'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', load)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=lambda: results.append(flight.do('key', load))) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        # Let the followers reach the wait before the leader finishes
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        assert results == ['value'] * 4
+        assert len(calls) == 1
+        assert flight.calls == {}
+
+    def test_errors_reach_the_caller(self):
+        flight = SingleFlight()
+        with pytest.raises(ValueError):
+            flight.do('key', lambda: int('x'))
+        assert flight.do('key', lambda: 1) == 1
+
+    def test_async_tasks_share_one_call(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        async def main():
+            return await asyncio.gather(*(flight.do('key', load) for _ in range(5)))
+
+        assert asyncio.run(main()) == ['value'] * 5
+        assert len(calls) == 1
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -7,11 +8,14 @@ router = DefaultRouter()
 router.register(r'accounts', views.AccountViewSet, basename='account')
 router.register(r'urls', views.ShortenedURLViewSet, basename='shortenedurl')
 router.register(r'analytics', views.URLAccessViewSet, basename='urlaccess')
+router.register(r'stats', views.ClickStatsViewSet, basename='clickstats')
+router.register(r'export', views.ExportViewSet, basename='export')
 
 # API URLs
 api_urlpatterns = [
     path('', include(router.urls)),
     path('token/', views.obtain_auth_token, name='api_token'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
 
 # Frontend URLs
@@ -24,9 +28,14 @@ frontend_urlpatterns = [
     path('logout/', views.user_logout, name='logout'),
 ]
 
-# URL Shortener redirect pattern
+# URL Shortener redirect pattern; ASGI deployments use the native async view
+if settings.ASYNC_REDIRECT:
+    redirect_view = views.async_redirect_to_original
+else:
+    redirect_view = views.redirect_to_original
+
 redirect_urlpatterns = [
-    path('<str:short_code>/', views.redirect_to_original, name='redirect'),
+    path('<str:short_code>/', redirect_view, name='redirect'),
 ]
 
 urlpatterns = frontend_urlpatterns 
\ No newline at end of file
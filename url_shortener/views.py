@@ -1,11 +1,17 @@
-from rest_framework import viewsets, status, serializers
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework import exceptions, viewsets, status, serializers
+from rest_framework.decorators import (
+    api_view, permission_classes, authentication_classes, renderer_classes, throttle_classes, action
+)
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.authtoken.models import Token
 from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
 from django.utils import timezone
+from datetime import timedelta
 from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
@@ -14,36 +20,58 @@ from django.contrib import messages
 from django.urls import reverse
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-import string
-import random
 from .models import Account, ShortenedURL, URLAccess
-from .serializers import AccountSerializer, ShortenedURLSerializer, URLAccessSerializer
-from django.core.cache import cache
+from .serializers import (
+    AccountSerializer, ShortenedURLSerializer, URLAccessSerializer,
+    TimeSeriesQuerySerializer, TopLinksQuerySerializer, ExportQuerySerializer
+)
+from .cache import resolve_short_code, aresolve_short_code
+from .clicks import log_click, alog_click
+from .counters import add_pending
+from .codes import save_with_short_code
+from . import quota
+from .bulk import shorten_many, find_existing, deduplicating
+from .normalize import validate_and_format_url
+from .rollups import start_of_day, time_series, top_links
+from .parsers import NDJSONParser
+from . import export
+from .renderers import PrometheusRenderer
+from .authentication import CachedTokenAuthentication
+from .routers import replica_reads
+from .ratelimit import RedirectRateThrottle, limiter, redirect_limits, throttled_response
+from . import metrics
+from .pagination import (
+    KeysetPaginator, InvalidCursor, ShortenedURLPagination, URLAccessPagination, get_page_size
+)
 
 # Frontend Views
 def home(request):
     context = {}
     if request.user.is_authenticated:
         account = Account.objects.get(user=request.user)
-        today_count = ShortenedURL.objects.filter(
-            account=account,
-            created_at__date=timezone.now().date()
-        ).count()
-        remaining_limit = account.daily_limit - today_count
+        remaining_limit = quota.remaining(account)
         request.session['daily_limit'] = remaining_limit
         context['daily_limit'] = remaining_limit
     return render(request, 'url_shortener/home.html', context)
 
 @login_required
 def url_list(request):
-    urls = ShortenedURL.objects.filter(account__user=request.user).order_by('-created_at')
-    return render(request, 'url_shortener/url_list.html', {'urls': urls})
-
-def validate_and_format_url(url):
-    """Add https:// prefix if not present and validate URL format"""
-    if not url.startswith(('http://', 'https://')):
-        url = f'https://{url}'
-    return url
+    paginator = KeysetPaginator('created_at', get_page_size(request.GET.get('page_size')))
+    with replica_reads(f'user:{request.user.pk}'):
+        try:
+            urls, next_cursor, previous_cursor = paginator.page(
+                ShortenedURL.objects.filter(account__user=request.user),
+                request.GET.get('cursor')
+            )
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return render(request, 'url_shortener/url_list.html', {
+            'urls': add_pending(urls),
+            'next_cursor': next_cursor,
+            'previous_cursor': previous_cursor,
+            # Kept in the cursor links so later pages have the same size
+            'page_size': paginator.page_size if 'page_size' in request.GET else None,
+        })
 
 @login_required
 def shorten_url(request):
@@ -53,34 +81,38 @@ def shorten_url(request):
             # Format and validate URL
             original_url = validate_and_format_url(original_url)
             
-            # Check daily limit
-            today_count = ShortenedURL.objects.filter(
-                account=request.user.account,
-                created_at__date=timezone.now().date()
-            ).count()
+            account = request.user.account
+
+            # Reuse the account's existing link to the same URL
+            existing = find_existing(account, original_url) if deduplicating() else None
+            if existing is not None:
+                shortened_url_path = request.build_absolute_uri(f'/{existing.short_code}/')
+                messages.success(request, f'You have already shortened this URL: {shortened_url_path}')
+                return redirect('home')
 
-            if today_count >= request.user.account.daily_limit:
+            # Check daily limit
+            if not quota.reserve(account):
                 messages.error(request, 'Daily URL shortening limit exceeded')
                 return redirect('home')
 
             # Create shortened URL
-            short_code = generate_short_code()
-            shortened_url = ShortenedURL.objects.create(
-                account=request.user.account,
-                original_url=original_url,
-                short_code=short_code
-            )
+            try:
+                shortened_url = save_with_short_code(
+                    ShortenedURL.objects.create,
+                    account=account,
+                    original_url=original_url
+                )
+            except Exception:
+                quota.release(account)
+                raise
+            short_code = shortened_url.short_code
 
             # Get the full shortened URL
             shortened_url_path = request.build_absolute_uri(f'/{short_code}/')
             messages.success(request, f'URL shortened successfully! Your shortened URL is: {shortened_url_path}')
             
             # Update daily limit in session
-            today_count = ShortenedURL.objects.filter(
-                account=request.user.account,
-                created_at__date=timezone.now().date()
-            ).count()
-            request.session['daily_limit'] = request.user.account.daily_limit - today_count
+            request.session['daily_limit'] = quota.remaining(account)
             
             return redirect('home')
 
@@ -189,13 +221,6 @@ def obtain_auth_token(request):
         'daily_limit': account.daily_limit
     })
 
-def generate_short_code(length=6):
-    chars = string.ascii_letters + string.digits
-    while True:
-        code = ''.join(random.choices(chars, k=length))
-        if not ShortenedURL.objects.filter(short_code=code).exists():
-            return code
-
 class AccountViewSet(viewsets.ModelViewSet):
     """
     Account yönetimi için API endpoint'leri.
@@ -225,7 +250,7 @@ class AccountViewSet(viewsets.ModelViewSet):
     queryset = Account.objects.all()
     serializer_class = AccountSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     @swagger_auto_schema(
         operation_description="Kullanıcının hesap bilgilerini listeler",
@@ -322,7 +347,8 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ShortenedURLSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    pagination_class = ShortenedURLPagination
     lookup_field = 'short_code'
 
     @swagger_auto_schema(
@@ -349,13 +375,17 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
             },
         ),
         responses={
+            200: "URL daha önce kısaltılmış, mevcut kısa kod döndürüldü (tekilleştirme açıkken)",
             201: ShortenedURLSerializer,
             400: "Geçersiz URL veya günlük limit aşıldı",
             401: "Yetkilendirme hatası"
         }
     )
     def create(self, request, *args, **kwargs):
-        return super().create(request, *args, **kwargs)
+        response = super().create(request, *args, **kwargs)
+        if getattr(self, 'deduplicated', False):
+            response.status_code = status.HTTP_200_OK
+        return response
 
     @swagger_auto_schema(
         operation_description="Belirli bir kısaltılmış URL'nin detaylarını döndürür",
@@ -386,33 +416,92 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         account = self.request.user.account
+
+        # Return the account's existing link to the same URL without using quota
+        if deduplicating():
+            existing = find_existing(account, serializer.validated_data['original_url'])
+            if existing is not None:
+                serializer.instance = existing
+                self.deduplicated = True
+                return
         
         # Check daily limit
-        today_count = ShortenedURL.objects.filter(
-            account=account,
-            created_at__date=timezone.now().date()
-        ).count()
-        
-        if today_count >= account.daily_limit:
+        if not quota.reserve(account):
             raise serializers.ValidationError(
                 {"error": "Daily URL shortening limit exceeded"}
             )
         
-        # Generate short code
-        short_code = generate_short_code()
-        serializer.save(account=account, short_code=short_code)
+        try:
+            save_with_short_code(serializer.save, account=account)
+        except Exception:
+            quota.release(account)
+            raise
+
+    def perform_destroy(self, instance):
+        # URLs removed on the day they were made no longer count against the quota
+        created_on = instance.created_at.date()
+        instance.delete()
+        if created_on == quota.today():
+            quota.release(instance.account, date=created_on)
 
     def validate_original_url(self, value):
         """Validate and format the URL before saving"""
         return validate_and_format_url(value)
 
-def get_cached_url(short_code):
-    cache_key = f'url_{short_code}'
-    return cache.get(cache_key)
-
-def cache_url(short_code, original_url):
-    cache_key = f'url_{short_code}'
-    cache.set(cache_key, original_url, timeout=settings.URL_CACHE_TTL)
+    @swagger_auto_schema(
+        operation_description="Birden fazla URL'yi tek istekte kısaltır (JSON dizisi veya NDJSON)",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_URI,
+                description='Kısaltılacak orijinal URL'
+            ),
+        ),
+        responses={
+            201: "Her URL için kısa kod veya hata",
+            400: "Geçersiz istek, hiçbir URL kısaltılamadı",
+            401: "Yetkilendirme hatası"
+        }
+    )
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        items = request.data
+        max_items = settings.URL_SHORTENER_SETTINGS['BULK_MAX_ITEMS']
+        if not isinstance(items, list):
+            raise serializers.ValidationError({"error": "Expected a list of URLs"})
+        if len(items) > max_items:
+            raise serializers.ValidationError({"error": f"At most {max_items} URLs per request"})
+
+        url_field = self.get_serializer().fields['original_url']
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            original_url = item.get('original_url') if isinstance(item, dict) else item
+            try:
+                if not isinstance(original_url, str):
+                    raise serializers.ValidationError('Expected a URL string')
+                original_url = url_field.run_validation(validate_and_format_url(original_url))
+            except serializers.ValidationError as exc:
+                results.append({'index': index, 'error': ' '.join(exc.detail)})
+                continue
+            results.append({'index': index, 'original_url': original_url})
+            valid.append(results[-1])
+
+        created = shorten_many(request.user.account, [result['original_url'] for result in valid])
+        for result, shortened in zip(valid, created):
+            if shortened is None:
+                result['error'] = 'Daily URL shortening limit exceeded'
+            else:
+                result['short_code'] = shortened.short_code
+                result['short_url'] = request.build_absolute_uri(f'/{shortened.short_code}/')
+
+        created_count = sum(1 for shortened in created if shortened is not None)
+        return Response({
+            'created': created_count,
+            'failed': len(items) - created_count,
+            'results': results,
+        }, status=status.HTTP_201_CREATED if created_count else status.HTTP_400_BAD_REQUEST)
 
 @swagger_auto_schema(
     method='get',
@@ -428,27 +517,53 @@ def cache_url(short_code, original_url):
     ],
     responses={
         302: "Orijinal URL'ye yönlendirme",
-        404: "URL bulunamadı"
+        404: "URL bulunamadı",
+        429: "İstek sınırı aşıldı"
     }
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@throttle_classes([RedirectRateThrottle])
 def redirect_to_original(request, short_code):
-    shortened_url = get_object_or_404(ShortenedURL, short_code=short_code)
-    
-    # Log access
-    URLAccess.objects.create(
-        url=shortened_url,
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
-    )
+    resolved = resolve_short_code(short_code)
+    if resolved is None:
+        raise Http404
+    url_id, original_url = resolved
     
-    # Update access count and last accessed time
-    shortened_url.access_count += 1
-    shortened_url.last_accessed = timezone.now()
-    shortened_url.save()
+    # Log access; the access log and counters are written in batches
+    log_click(url_id, request.META.get('REMOTE_ADDR'), request.META.get('HTTP_USER_AGENT', ''))
     
-    return redirect(shortened_url.original_url)
+    return redirect(original_url)
+
+def not_found_response():
+    """The 404 response DRF gives for Http404, for views outside DRF"""
+    return JsonResponse({'detail': str(exceptions.NotFound.default_detail)}, status=status.HTTP_404_NOT_FOUND)
+
+@require_safe
+async def async_redirect_to_original(request, short_code):
+    """Native async variant of redirect_to_original, served under ASGI without DRF"""
+    wait = await limiter.ahit(redirect_limits(request, short_code))
+    if wait is not None:
+        return throttled_response(wait)
+    resolved = await aresolve_short_code(short_code)
+    if resolved is None:
+        # Same body as redirect_to_original under WSGI
+        return not_found_response()
+    url_id, original_url = resolved
+    await alog_click(url_id, request.META.get('REMOTE_ADDR'), request.META.get('HTTP_USER_AGENT', ''))
+    return HttpResponseRedirect(original_url)
+
+@swagger_auto_schema(method='get', auto_schema=None)
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication, SessionAuthentication])
+@permission_classes([IsAdminUser])
+@renderer_classes([PrometheusRenderer])
+def metrics_view(request):
+    """Per-view request metrics of this worker in Prometheus text format"""
+    return Response(
+        metrics.registry.render(),
+        content_type=f'{PrometheusRenderer.media_type}; version=0.0.4; charset=utf-8'
+    )
 
 class URLAccessViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -462,13 +577,17 @@ class URLAccessViewSet(viewsets.ReadOnlyModelViewSet):
             - accessed_at: Erişim tarihi
             - ip_address: Erişim yapan IP adresi
             - user_agent: Erişim yapan tarayıcı bilgisi
+            - browser: Tarayıcı ailesi
+            - os: İşletim sistemi
+            - device: Cihaz türü (desktop, mobile, tablet, bot, other)
     
     retrieve:
         Belirli bir erişim kaydının detaylarını döndürür.
     """
     serializer_class = URLAccessSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    pagination_class = URLAccessPagination
 
     @swagger_auto_schema(
         operation_description="Tüm URL erişim kayıtlarını listeler",
@@ -478,7 +597,8 @@ class URLAccessViewSet(viewsets.ReadOnlyModelViewSet):
         }
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        with replica_reads(f'user:{request.user.pk}'):
+            return super().list(request, *args, **kwargs)
 
     @swagger_auto_schema(
         operation_description="Belirli bir erişim kaydının detaylarını döndürür",
@@ -489,9 +609,142 @@ class URLAccessViewSet(viewsets.ReadOnlyModelViewSet):
         }
     )
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        with replica_reads(f'user:{request.user.pk}'):
+            return super().retrieve(request, *args, **kwargs)
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return URLAccess.objects.none()
-        return URLAccess.objects.filter(url__account__user=self.request.user)
+        return URLAccess.objects.filter(account__user=self.request.user).select_related('agent').order_by('-accessed_at')
+
+class ClickStatsViewSet(viewsets.ViewSet):
+    """
+    Önceden toplanmış tıklama istatistikleri için API endpoint'leri.
+    
+    timeseries:
+        Bir kısa URL için saatlik veya günlük tıklama sayılarını döndürür.
+    
+    top:
+        Hesabın en çok tıklanan URL'lerini döndürür.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def get_range(self, params, default_days):
+        """Turn inclusive start/end dates into a [start, end) datetime range"""
+        end = params.get('end', timezone.now().date())
+        start = params.get('start', end - timedelta(days=default_days - 1))
+        return start_of_day(start), start_of_day(end + timedelta(days=1))
+
+    @swagger_auto_schema(
+        operation_description="Bir kısa URL için tıklama zaman serisini döndürür",
+        query_serializer=TimeSeriesQuerySerializer,
+        responses={
+            200: "Zaman dilimi başına tıklama sayıları",
+            400: "Geçersiz parametre",
+            401: "Yetkilendirme hatası",
+            404: "URL bulunamadı"
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        params = TimeSeriesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        shortened_url = get_object_or_404(
+            ShortenedURL, account__user=request.user, short_code=params.validated_data['short_code']
+        )
+        granularity = params.validated_data['granularity']
+        start, end = self.get_range(params.validated_data, 2 if granularity == 'hour' else 30)
+        return Response({
+            'short_code': shortened_url.short_code,
+            'granularity': granularity,
+            'series': time_series(shortened_url, granularity, start, end),
+        })
+
+    @swagger_auto_schema(
+        operation_description="En çok tıklanan URL'leri döndürür",
+        query_serializer=TopLinksQuerySerializer,
+        responses={
+            200: "Tıklama sayısına göre sıralı URL'ler",
+            400: "Geçersiz parametre",
+            401: "Yetkilendirme hatası"
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        params = TopLinksQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = self.get_range(params.validated_data, 30)
+        return Response(top_links(request.user.account, start, end, params.validated_data['limit']))
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Hesap verilerini dosya olarak dışa aktarmak için API endpoint'leri.
+    
+    links:
+        Hesabın tüm kısaltılmış URL'lerini CSV veya NDJSON olarak akış halinde döndürür.
+    
+    clicks:
+        Hesabın tüm erişim kayıtlarını CSV veya NDJSON olarak akış halinde döndürür.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Accept: text/csv is fine here; errors still fall back to JSON
+        return super().perform_content_negotiation(request, force=True)
+
+    def stream(self, request, name, columns, get_rows):
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start = params.validated_data.get('start')
+        end = params.validated_data.get('end')
+        rows = get_rows(
+            request.user.account,
+            start_of_day(start) if start else None,
+            start_of_day(end + timedelta(days=1)) if end else None
+        )
+
+        file_format = params.validated_data['file_format']
+        compress = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response = StreamingHttpResponse(
+            export.stream(
+                columns, rows, file_format,
+                chunk_size=settings.URL_SHORTENER_SETTINGS['EXPORT_CHUNK_SIZE'],
+                compress=compress
+            ),
+            content_type=export.CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{name}-{timezone.now():%Y-%m-%d}.{file_format}"'
+        )
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+    @swagger_auto_schema(
+        operation_description="Kısaltılmış URL'leri CSV veya NDJSON olarak dışa aktarır (gzip destekli)",
+        query_serializer=ExportQuerySerializer,
+        responses={
+            200: "CSV veya NDJSON dosyası",
+            400: "Geçersiz parametre",
+            401: "Yetkilendirme hatası"
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def links(self, request):
+        return self.stream(request, 'links', export.LINK_COLUMNS, export.link_rows)
+
+    @swagger_auto_schema(
+        operation_description="Erişim kayıtlarını CSV veya NDJSON olarak dışa aktarır (gzip destekli)",
+        query_serializer=ExportQuerySerializer,
+        responses={
+            200: "CSV veya NDJSON dosyası",
+            400: "Geçersiz parametre",
+            401: "Yetkilendirme hatası"
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def clicks(self, request):
+        return self.stream(request, 'clicks', export.CLICK_COLUMNS, export.click_rows)
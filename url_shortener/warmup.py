@@ -0,0 +1,81 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import ClickStatDaily, ShortenedURL
+from .cache import local_cache, local_cache_enabled, url_cache_key, url_entry
+from .startup import on_first_request
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ['access_count', 'last_accessed', 'rollups']
+
+def hot_urls(limit, source='access_count', days=7):
+    """(short_code, id, original_url) of the `limit` hottest links by the given measure"""
+    if source == 'rollups':
+        since = timezone.now().date() - timedelta(days=days - 1)
+        return (
+            ClickStatDaily.objects.filter(date__gte=since)
+            .values('url_id')
+            .annotate(clicks=Sum('count'))
+            .order_by('-clicks')
+            .values_list('url__short_code', 'url_id', 'url__original_url')[:limit]
+        )
+    if source == 'last_accessed':
+        ordering = F('last_accessed').desc(nulls_last=True)
+    else:
+        ordering = '-access_count'
+    return ShortenedURL.objects.order_by(ordering).values_list('short_code', 'id', 'original_url')[:limit]
+
+def warm(limit, source='access_count', days=7, batch_size=500):
+    """
+    Load the hottest links into the shared cache, batch_size keys per
+    set_many call (one pipeline with django_redis), and into this worker's
+    local cache. Returns the number of links loaded.
+    """
+    use_local = local_cache_enabled()
+    loaded = 0
+    batch = {}
+    for short_code, url_id, original_url in hot_urls(limit, source, days).iterator(chunk_size=batch_size):
+        batch[short_code] = (url_id, original_url)
+        if len(batch) >= batch_size:
+            loaded += _store(batch, use_local)
+            batch = {}
+    if batch:
+        loaded += _store(batch, use_local)
+    return loaded
+
+def _store(batch, use_local):
+    # Freshness is jittered per entry; the batch shares the longest possible lifetime
+    cache.set_many(
+        {url_cache_key(short_code): url_entry(*value) for short_code, value in batch.items()},
+        timeout=settings.URL_CACHE_TTL + settings.URL_CACHE_STALE_TTL
+    )
+    if use_local:
+        for short_code, value in batch.items():
+            local_cache.set(short_code, value)
+    return len(batch)
+
+def warm_in_background():
+    """Warm the caches from a daemon thread so a starting worker can serve meanwhile"""
+    config = settings.URL_CACHE_WARMUP
+
+    def run():
+        try:
+            loaded = warm(config['LIMIT'], config['SOURCE'], config['DAYS'], config['BATCH_SIZE'])
+            logger.info('Preloaded %d short codes into the URL cache', loaded)
+        except Exception:
+            logger.exception('URL cache warm-up failed')
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name='url-cache-warmup', daemon=True)
+    thread.start()
+    return thread
+
+# request_started receiver: warm once per process
+warm_on_first_request = on_first_request(warm_in_background)